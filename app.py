@@ -1,24 +1,52 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
-import requests
-import plotly.graph_objects as go
-import os
-import json
 import time
-import re
-from openai import OpenAI
-from bs4 import BeautifulSoup
-from fake_useragent import UserAgent
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-
-# ==================== CONFIGURATION ====================
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except ImportError:
-    pass
+
+import indicators
+import metrics
+from engine import (
+    DEFAULT_FETCH_MODE,
+    DEFAULT_HEDGE_DELAY,
+    DEFAULT_AI_MODE,
+    DEFAULT_AI_STREAM,
+    DEFAULT_HISTORY_RANGE,
+    DEFAULT_HISTORY_PERIOD,
+    DEFAULT_HISTORY_INTERVAL,
+    HISTORY_RANGES,
+    CHART_MAX_BARS,
+    FUNDAMENTALS_TIMEOUT,
+    LOCAL_FALLBACK,
+    MACRO_REFRESH_INTERVAL,
+    MACRO_SYMBOLS,
+    PERSONAS,
+    UNIVERSES,
+    SCREENER_WORKERS,
+    CompactHistory,
+    analyze_all_personas,
+    analyze_personas_concurrently,
+    decimation_groups,
+    fetch_stock_data as engine_fetch_stock_data,
+    fetch_watchlist as engine_fetch_watchlist,
+    get_cache_warmer,
+    get_http_session,
+    get_macro_snapshot,
+    get_openai_api_key,
+    get_openai_client,
+    get_provider_health,
+    get_quote_cache,
+    get_rate_limiter,
+    get_screener_runs,
+    get_verdict_cache,
+    local_verdicts,
+    merge_fundamentals,
+    parse_tickers,
+    parse_universe_csv,
+    prefetch_fundamentals,
+    quote_cache_key,
+    start_metrics_export,
+    stream_persona_verdicts,
+    summarize_watchlist,
+)
 
 st.set_page_config(page_title="AI Hunter V24 Armored", page_icon="🦅", layout="wide")
 
@@ -40,392 +68,397 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# ==================== SESSION HTTP ROBUSTE ====================
+# ==================== DONNÉES (CACHE DU MOTEUR) ====================
+# Cache compact du moteur plutôt que st.cache_data: une lecture renvoie l'objet partagé
+# (pas de pickle ni de copie du DataFrame à chaque rerun)
+
+def _streamlit_status(level, message):
+    getattr(st, level)(message)
 
-def create_robust_session():
+
+def fetch_stock_data(ticker_symbol, mode=DEFAULT_FETCH_MODE, hedge_delay=DEFAULT_HEDGE_DELAY,
+                     period=DEFAULT_HISTORY_PERIOD, interval=DEFAULT_HISTORY_INTERVAL):
     """
-    Crée une session HTTP résistante avec:
-    - Headers complets pour éviter la détection bot
-    - Retry automatique (3 tentatives)
-    - Backoff exponentiel
+    Prix et historique d'un ticker (QuoteSnapshot) en cache 30 min par fenêtre, progression affichée
+    si téléchargement. Les fondamentaux (cache journalier) sont chargés à part par render_stock_view
     """
-    session = requests.Session()
-    
-    # Headers réalistes pour contourner la détection
-    session.headers.update({
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.9,fr;q=0.8',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1',
-        'Sec-Fetch-Dest': 'document',
-        'Sec-Fetch-Mode': 'navigate',
-        'Sec-Fetch-Site': 'none',
-        'Cache-Control': 'max-age=0',
-        'DNT': '1',
-    })
-    
-    # Strategy de retry: 3 tentatives avec délai croissant
-    retry_strategy = Retry(
-        total=3,
-        backoff_factor=1,  # 1s, 2s, 4s
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods=["GET", "POST"]
+    return get_quote_cache().get_or_fetch(
+        quote_cache_key(ticker_symbol, period, interval),
+        lambda: engine_fetch_stock_data(ticker_symbol, mode, hedge_delay, on_status=_streamlit_status,
+                                        period=period, interval=interval, with_fundamentals=False)
     )
-    
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
-    
-    return session
 
-# ==================== MÉTHODE 1: YFINANCE DOWNLOAD ====================
 
-def fetch_via_yf_download(ticker_symbol):
-    """
-    Méthode 1: yfinance.download (généralement la plus fiable)
-    Retourne None en cas d'échec
-    """
-    try:
-        # Téléchargement des données historiques
-        df = yf.download(
-            ticker_symbol, 
-            period="6mo", 
-            progress=False,
-            timeout=10,
-            threads=False  # Évite les problèmes de concurrence
-        )
-        
-        if df.empty:
-            return None
-        
-        # Récupération des infos fondamentales
-        session = create_robust_session()
-        stock = yf.Ticker(ticker_symbol, session=session)
-        
-        time.sleep(0.5)  # Anti-rate limiting
-        
-        try:
-            info = stock.info
-        except:
-            info = {}
-        
-        # Extraction du prix (gestion multi-index)
-        close_col = df['Close']
-        if isinstance(close_col, pd.DataFrame):
-            close_col = close_col.iloc[:, 0]
-        
-        price_today = float(close_col.iloc[-1])
-        price_6m_ago = float(close_col.iloc[0])
-        
-        if price_today <= 0:
-            return None
-        
-        trend_6m = ((price_today - price_6m_ago) / price_6m_ago) * 100
-        
-        return {
-            'ticker': ticker_symbol,
-            'name': info.get('longName', ticker_symbol),
-            'current_price': price_today,
-            'history': df,
-            'trend_6m': trend_6m,
-            'market_cap': info.get('marketCap', 0),
-            'trailing_pe': info.get('trailingPE', 0),
-            'debt': info.get('totalDebt', 0),
-            'revenue_growth': info.get('revenueGrowth', 0),
-            'source': 'API YFINANCE (download)'
-        }
-        
-    except Exception as e:
-        return None
+def fetch_watchlist(tickers, with_info=True):
+    """Watchlist {ticker: QuoteSnapshot}: seuls les tickers absents du cache sont téléchargés (en lot)"""
+    cache = get_quote_cache()
+    results = {ticker: cache.get(('watchlist', ticker, with_info)) for ticker in tickers}
+    missing = [ticker for ticker, data in results.items() if data is None]
+    if missing:
+        for ticker, data in engine_fetch_watchlist(missing, with_info).items():
+            results[ticker] = cache.put(('watchlist', ticker, with_info), data)
+    return {ticker: data for ticker, data in results.items() if data is not None}
 
-# ==================== MÉTHODE 2: YFINANCE TICKER.HISTORY ====================
 
-def fetch_via_yf_ticker(ticker_symbol):
-    """
-    Méthode 2: yfinance.Ticker().history (alternative)
-    Parfois fonctionne quand download échoue
-    """
-    try:
-        session = create_robust_session()
-        stock = yf.Ticker(ticker_symbol, session=session)
-        
-        time.sleep(0.5)
-        df = stock.history(period="6mo")
-        
-        if df.empty or df['Close'].iloc[-1] <= 0:
-            return None
-        
-        price_today = float(df['Close'].iloc[-1])
-        price_6m_ago = float(df['Close'].iloc[0])
-        trend_6m = ((price_today - price_6m_ago) / price_6m_ago) * 100
-        
-        # Tentative d'obtenir les infos (peut échouer)
+# ==================== INTERFACE UTILISATEUR ====================
+
+def render_stock_view(data, ai_mode=DEFAULT_AI_MODE, history_range=DEFAULT_HISTORY_RANGE, ai_stream=DEFAULT_AI_STREAM):
+    """Affiche la fiche complète d'un ticker: prix, source, graphique, métriques, analyse IA"""
+    # Fondamentaux en parallèle: prix et graphique s'affichent sans les attendre
+    fundamentals = prefetch_fundamentals(data['ticker'])
+    
+    # Header
+    title = st.empty()
+    title.markdown(f"## {data['ticker']} - {data['name']}")
+    st.markdown(f"# ${data['current_price']:.2f}")
+    
+    # Source badge
+    source_color = "#00ff41" if "YFINANCE" in data['source'] else "#ffa500"
+    st.markdown(
+        f"<div style='color:{source_color}; padding:5px; border:1px solid {source_color}; border-radius:5px; display:inline-block;'>📡 Source: {data['source']}</div>",
+        unsafe_allow_html=True
+    )
+    
+    # Rapport de récupération: source gagnante et durée par source
+    report = data.get('fetch_report')
+    if report:
+        with st.expander(f"⏱️ Récupération ({report['mode']}) - gagnant: {report['winner']}"):
+            st.dataframe(
+                pd.DataFrame([
+                    {'Source': name, 'Statut': t['status'], 'Durée (s)': round(t['elapsed'], 2)}
+                    for name, t in report['timings'].items()
+                ]),
+                hide_index=True,
+                use_container_width=True
+            )
+    
+    # Warning si mode dégradé
+    if "SCRAPING" in data['source'] or data['history'].empty:
+        st.warning("⚠️ Mode dégradé: Graphique historique non disponible, mais prix en temps réel OK")
+    
+    st.markdown("---")
+    
+    # === GRAPHIQUE (si disponible) ===
+    if not data['history'].empty:
         try:
-            info = stock.info
-            name = info.get('longName', ticker_symbol)
-            pe = info.get('trailingPE', 0)
-            mcap = info.get('marketCap', 0)
-        except:
-            name = ticker_symbol
-            pe = 0
-            mcap = 0
-        
-        return {
-            'ticker': ticker_symbol,
-            'name': name,
-            'current_price': price_today,
-            'history': df,
-            'trend_6m': trend_6m,
-            'market_cap': mcap,
-            'trailing_pe': pe,
-            'debt': 0,
-            'revenue_growth': 0,
-            'source': 'API YFINANCE (Ticker.history)'
-        }
+            render_chart(data, history_range)
+        except Exception as e:
+            st.warning(f"Impossible d'afficher le graphique: {str(e)}")
+    
+    # === MÉTRIQUES FONDAMENTALES ===
+    st.markdown("### 📊 Métriques")
+    c1, c2, c3, c4 = st.columns(4)
+    cards = [c1.empty(), c2.empty(), c3.empty()]
+    for card, label in zip(cards, ("PE Ratio", "Market Cap", "Dette")):
+        card.metric(label, "⏳")
+    
+    with c4:
+        trend = data.get('trend_6m', 0)
+        c4.metric("Trend 6M", f"{trend:.1f}%", delta=f"{trend:.1f}%")
+    
+    # Indicateurs techniques (dernière barre)
+    ind = data.get('indicators') or {}
+    if ind:
+        t1, t2, t3, t4 = st.columns(4)
+        t1.metric("RSI 14", f"{ind['rsi_14']:.0f}" if 'rsi_14' in ind else "N/A")
+        t2.metric("MACD hist.", f"{ind['macd_hist']:+.2f}" if 'macd_hist' in ind else "N/A")
+        t3.metric("Volatilité 20j", f"{ind['volatility_20']:.0f}%" if 'volatility_20' in ind else "N/A")
+        t4.metric("Max Drawdown", f"{ind['max_drawdown']:.1f}%" if 'max_drawdown' in ind else "N/A")
+    
+    # Les cartes se remplissent à l'arrivée des fondamentaux (aussi transmis à l'analyse IA)
+    try:
+        data = merge_fundamentals(data, fundamentals.result(timeout=FUNDAMENTALS_TIMEOUT))
+    except Exception:
+        pass
+    title.markdown(f"## {data['ticker']} - {data['name']}")
+    render_fundamentals(cards, data)
+    
+    # === ANALYSE IA ===
+    st.markdown("---")
+    st.markdown("### 🤖 Analyse IA Multi-Persona")
+    
+    # Vérification clé OpenAI
+    api_key = get_openai_api_key()
+    
+    if ai_mode == "local":
+        render_local_verdicts(data)
+    elif not api_key:
+        st.warning("⚠️ Clé OpenAI manquante - Analyse IA désactivée")
+        st.info("Ajoutez `OPENAI_API_KEY` dans les secrets Streamlit pour activer l'analyse IA")
+        if LOCAL_FALLBACK:
+            render_local_verdicts(data)
+    else:
+        client = get_openai_client(api_key)
+        cols = st.columns(3)
+        slots = {}
+        for i, persona in enumerate(PERSONAS):
+            slots[persona] = cols[i].empty()
+            slots[persona].info(f"🧠 {persona}...")
+        
+        # Streaming: verdict et score dès qu'ils sont générés, thèse affichée au fil de l'eau
+        if ai_stream:
+            for persona, analysis, done in stream_persona_verdicts(data, PERSONAS, client, ai_mode):
+                with slots[persona].container():
+                    render_verdict(persona, analysis, streaming=not done)
+        else:
+            # Chaque colonne se remplit dès que son verdict arrive
+            if ai_mode == "single":
+                results = analyze_all_personas(data, PERSONAS, client).items()
+            else:
+                results = analyze_personas_concurrently(data, PERSONAS, client)
+            
+            for persona, analysis in results:
+                with slots[persona].container():
+                    render_verdict(persona, analysis)
         
-    except Exception as e:
-        return None
+        stats = get_verdict_cache().snapshot_stats()
+        st.caption(f"🗃️ Cache verdicts: {stats['hits']} hits ({stats['disk_hits']} disque) / {stats['misses']} misses")
 
-# ==================== MÉTHODE 3: SCRAPING YAHOO ====================
 
-def fetch_via_scraping(ticker_symbol):
-    """
-    Méthode 3: Scraping direct du HTML Yahoo Finance
-    3 techniques de fallback pour extraire le prix
-    """
-    try:
-        session = create_robust_session()
-        url = f"https://finance.yahoo.com/quote/{ticker_symbol}"
-        
-        time.sleep(1)  # Important: éviter le rate limiting
-        response = session.get(url, timeout=10)
-        
-        if response.status_code != 200:
-            return None
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        price = None
-        change = 0
-        
-        # === TECHNIQUE 1: Balise fin-streamer (principale) ===
-        price_tag = soup.find('fin-streamer', {'data-field': 'regularMarketPrice'})
-        if price_tag and price_tag.get('value'):
-            try:
-                price = float(price_tag['value'])
-            except:
-                pass
-        
-        # === TECHNIQUE 2: Fallback sur data-symbol ===
-        if not price:
-            price_tag = soup.find('fin-streamer', {'data-symbol': ticker_symbol})
-            if price_tag and price_tag.get('value'):
-                try:
-                    price = float(price_tag['value'])
-                except:
-                    pass
-        
-        # === TECHNIQUE 3: Regex dans le JSON embarqué ===
-        if not price:
-            # Yahoo inclut souvent les données dans un script JSON
-            pattern = r'"regularMarketPrice":\s*\{\s*"raw"\s*:\s*([\d.]+)'
-            match = re.search(pattern, response.text)
-            if match:
-                try:
-                    price = float(match.group(1))
-                except:
-                    pass
-        
-        # Vérification finale
-        if not price or price <= 0:
-            return None
-        
-        # Variation (optionnel)
-        change_tag = soup.find('fin-streamer', {'data-field': 'regularMarketChangePercent'})
-        if change_tag and change_tag.get('value'):
-            try:
-                change = float(change_tag['value'])
-            except:
-                change = 0
-        
-        return {
-            'ticker': ticker_symbol,
-            'name': ticker_symbol,  # Nom difficile à extraire en scraping
-            'current_price': price,
-            'history': pd.DataFrame(),  # Pas d'historique en scraping
-            'trend_6m': change * 10,  # Estimation approximative
-            'market_cap': 0,
-            'trailing_pe': 0,
-            'debt': 0,
-            'revenue_growth': 0,
-            'source': 'SCRAPING WEB (Mode Survie)'
-        }
-        
-    except Exception as e:
-        return None
+def render_fundamentals(cards, data):
+    """Cartes PE / Market Cap / Dette (N/A si la valeur est inconnue)"""
+    pe_card, mcap_card, debt_card = cards
+    
+    pe = data.get('trailing_pe', 0)
+    pe_card.metric("PE Ratio", f"{pe:.1f}" if pe and pe > 0 else "N/A")
+    
+    mcap = data.get('market_cap', 0)
+    mcap_card.metric("Market Cap", f"${mcap/1e9:.1f}B" if mcap > 0 else "N/A")
+    
+    debt = data.get('debt', 0)
+    debt_card.metric("Dette", f"${debt/1e9:.1f}B" if debt > 0 else "N/A")
 
-# ==================== MÉTHODE 4: ALPHA VANTAGE (BACKUP) ====================
 
-def fetch_via_alphavantage(ticker_symbol):
+def render_chart(data, history_range):
     """
-    Méthode 4: API Alpha Vantage (gratuit, 5 req/min)
-    Nécessite une clé API gratuite: https://www.alphavantage.co/support/#api-key
+    Chandeliers + moyennes mobiles / Bollinger, décimés à CHART_MAX_BARS bougies
+    Les indicateurs sont calculés sur l'historique complet; le zoom n'envoie au navigateur
+    les barres en pleine résolution que pour la fenêtre choisie
     """
-    api_key = os.getenv("ALPHA_VANTAGE_KEY") or st.secrets.get("ALPHA_VANTAGE_KEY", None)
+    history = data['history']
+    if not isinstance(history, CompactHistory):
+        history = CompactHistory.from_frame(history)
     
-    if not api_key:
-        return None
+    lo, hi = 0, len(history)
+    if len(history) > CHART_MAX_BARS:
+        # Dates (journalier) ou date + heure (intraday) pour le curseur
+        index = history.index()
+        first, last = [ts.date() if history.unit == 'D' else ts.to_pydatetime() for ts in (index[0], index[-1])]
+        zoom = st.slider("🔍 Zoom", first, last, value=(first, last), key=f"zoom_{data['ticker']}_{history_range}")
+        lo, hi = history.bounds(*zoom)
     
-    try:
-        url = f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={ticker_symbol}&apikey={api_key}"
-        response = requests.get(url, timeout=10)
-        data = response.json()
-        
-        quote = data.get('Global Quote', {})
-        
-        if not quote:
-            return None
-        
-        price = float(quote.get('05. price', 0))
-        
-        if price <= 0:
-            return None
-        
-        # Extraction du change percent
-        change_str = quote.get('10. change percent', '0%').replace('%', '')
-        try:
-            change_pct = float(change_str)
-        except:
-            change_pct = 0
-        
-        return {
-            'ticker': ticker_symbol,
-            'name': ticker_symbol,
-            'current_price': price,
-            'history': pd.DataFrame(),
-            'trend_6m': change_pct,
-            'market_cap': 0,
-            'trailing_pe': 0,
-            'debt': 0,
-            'revenue_growth': 0,
-            'source': 'ALPHA VANTAGE API'
-        }
+    with metrics.span('chart_render'):
+        import plotly.graph_objects as go
+        
+        visible = history.rows(lo, hi)
+        shown = visible.decimate(CHART_MAX_BARS)
+        df_hist = shown.to_frame()
+        
+        fig = go.Figure(data=[go.Candlestick(
+            x=df_hist.index,
+            open=df_hist['Open'],
+            high=df_hist['High'],
+            low=df_hist['Low'],
+            close=df_hist['Close'],
+            increasing_line_color='#00ff41',
+            decreasing_line_color='#ff0000',
+            name='Prix'
+        )])
+        
+        # Overlays: moyennes mobiles et bandes de Bollinger (valeur en fin de paquet de barres)
+        series = indicators.compute_indicators(indicators.to_panel({'_': history.to_frame()}))
+        _, last_rows = decimation_groups(len(visible), CHART_MAX_BARS)
+        for name, label, style in [
+            ('sma_20', 'SMA 20', {'color': '#ffa500', 'width': 1}),
+            ('sma_50', 'SMA 50', {'color': '#00bfff', 'width': 1}),
+            ('bb_upper', 'Bollinger +2σ', {'color': '#888888', 'width': 1, 'dash': 'dot'}),
+            ('bb_lower', 'Bollinger -2σ', {'color': '#888888', 'width': 1, 'dash': 'dot'}),
+        ]:
+            values = series[name]['_'].to_numpy()[lo:hi][last_rows]
+            fig.add_trace(go.Scatter(x=df_hist.index, y=values, name=label, line=style, mode='lines'))
+        
+        fig.update_layout(
+            paper_bgcolor='#1a1f3a',
+            plot_bgcolor='#1a1f3a',
+            font={'color': '#00ff41'},
+            height=400,
+            xaxis_rangeslider_visible=False,
+            title=f"{data['ticker']} - {history_range}",
+            xaxis_title="Date",
+            yaxis_title="Prix ($)"
+        )
         
-    except Exception as e:
-        return None
+        st.plotly_chart(fig, use_container_width=True)
+    
+    if len(shown) < len(visible):
+        st.caption(
+            f"📉 {len(visible)} barres regroupées en {len(shown)} bougies "
+            f"({-(-len(visible) // CHART_MAX_BARS)} barres par bougie) - zoomez pour la pleine résolution"
+        )
 
-# ==================== ORCHESTRATEUR PRINCIPAL ====================
 
-@st.cache_data(ttl=1800, show_spinner=False)
-def fetch_stock_data(ticker_symbol):
-    """
-    Orchestrateur intelligent avec 4 méthodes de fallback
-    Retourne les données ou None
-    """
-    methods = [
-        ("📊 YFinance Download", fetch_via_yf_download),
-        ("📈 YFinance Ticker", fetch_via_yf_ticker),
-        ("🌐 Web Scraping", fetch_via_scraping),
-        ("🔑 Alpha Vantage", fetch_via_alphavantage),
-    ]
-    
-    for i, (method_name, method_func) in enumerate(methods, 1):
-        st.info(f"Tentative {i}/{len(methods)}: {method_name}...")
-        
-        result = method_func(ticker_symbol)
-        
-        if result and result.get('current_price', 0) > 0:
-            st.success(f"✅ {method_name} - Succès!")
-            return result
-        else:
-            st.warning(f"⚠️ {method_name} - Échec")
+def render_local_verdicts(data):
+    """Verdicts des personas calculés localement (instantanés, sans appel IA)"""
+    verdicts = local_verdicts({data['ticker']: data}, PERSONAS)[data['ticker']]
+    cols = st.columns(3)
+    for i, persona in enumerate(PERSONAS):
+        with cols[i]:
+            render_verdict(persona, verdicts[persona])
+
+
+def render_verdict(persona, analysis, streaming=False):
+    """Carte verdict d'un persona (`streaming`: verdict partiel, champs encore absents)"""
+    if streaming and 'verdict' not in analysis:
+        st.info(f"🧠 {persona}...")
+        return
+    
+    verdict = analysis.get('verdict', 'N/A')
+    score = analysis.get('score', '…' if streaming else 0)
+    thesis = analysis.get('thesis', '' if streaming else 'Analyse indisponible')
+    risk = analysis.get('risk', '…' if streaming else 'UNKNOWN')
+    if streaming:
+        thesis += " ▌"
+    
+    # Couleur selon verdict
+    if "BUY" in str(verdict):
+        color = "#00ff41"
+    elif "SELL" in str(verdict):
+        color = "#ff4136"
+    else:
+        color = "#ffa500"
+    
+    # Affichage
+    st.markdown(
+        f'<div class="verdict-box" style="color:{color}; border-color:{color}">'
+        f'{verdict} ({score}/100)'
+        f'</div>',
+        unsafe_allow_html=True
+    )
     
-    # Toutes les méthodes ont échoué
-    return None
+    st.markdown(f"**{persona} Buffett/Wood/Cramer:**")
+    st.info(thesis)
+    st.caption(f"Risque: {risk}")
+    if analysis.get('source') == 'local':
+        reason = analysis.get('fallback')
+        st.caption(f"⚙️ Score local (sans IA){' - ' + reason if reason else ''}")
 
-# ==================== CERVEAU IA ====================
 
-def analyze_with_ai(persona, data):
-    """
-    Analyse IA via OpenAI GPT
-    Retourne: {verdict, score, thesis, risk}
-    """
-    try:
-        api_key = os.getenv("OPENAI_API_KEY") or st.secrets.get("OPENAI_API_KEY", None)
-        
-        if not api_key:
-            return {
-                'verdict': 'ERROR',
-                'score': 0,
-                'thesis': 'Clé OpenAI manquante (OPENAI_API_KEY)',
-                'risk': 'HIGH'
-            }
-        
-        client = OpenAI(api_key=api_key)
-        
-        # Instructions selon le persona
-        logic = "Score < 45 = SELL, 46-65 = HOLD, > 66 = BUY."
-        prompts = {
-            "Warren": f"Tu es Warren Buffett. Analyse value investing. {logic}",
-            "Cathie": f"Tu es Cathie Wood. Focus croissance disruptive. {logic}",
-            "Jim": f"Tu es Jim Cramer. Analyse momentum court terme. {logic}"
-        }
-        
-        # Message adapté selon la source de données
-        source_quality = "(Données limitées)" if "SCRAPING" in data['source'] or "ALPHA" in data['source'] else "(Données complètes)"
-        
-        user_message = f"""
-        ANALYSE: {data['ticker']} {source_quality}
-        Prix actuel: ${data['current_price']:.2f}
-        Tendance 6 mois: {data.get('trend_6m', 0):.1f}%
-        PE Ratio: {data.get('trailing_pe', 'N/A')}
-        Market Cap: ${data.get('market_cap', 0)/1e9:.1f}B
-        
-        Donne ton verdict en JSON strict: {{"verdict": "BUY/HOLD/SELL", "score": 0-100, "thesis": "explication courte", "risk": "LOW/MEDIUM/HIGH"}}
-        """
-        
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": prompts.get(persona, prompts["Warren"])},
-                {"role": "user", "content": user_message}
-            ],
-            temperature=0.3,
-            max_tokens=200,
-            response_format={"type": "json_object"}
+def render_screener():
+    """Mode screener: classement d'un univers complet, mis à jour au fil de l'eau"""
+    source = st.radio("Univers", list(UNIVERSES) + ["📄 CSV"], horizontal=True)
+    if source == "📄 CSV":
+        upload = st.file_uploader("CSV de tickers (colonne 'ticker' ou 'symbol')", type=["csv"])
+        tickers = parse_universe_csv(upload) if upload else []
+    else:
+        tickers = UNIVERSES[source]
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.caption(f"{len(tickers)} tickers - {SCREENER_WORKERS} workers en parallèle")
+    with col2:
+        start = st.button("🔭 SCREEN", type="primary", use_container_width=True, disabled=not tickers)
+    
+    runs = get_screener_runs()
+    if start:
+        # Un criblage identique encore en cours est repris plutôt que relancé
+        st.session_state['screener_run_id'] = runs.start(tickers)
+    
+    run = runs.get(st.session_state.get('screener_run_id'))
+    if run is None:
+        st.info("👆 Choisissez un univers et cliquez sur SCREEN")
+        return
+    
+    progress_slot = st.empty()
+    table_slot = st.empty()
+    
+    # Rafraîchissement jusqu'à la fin (un rerun interrompt la boucle, pas le criblage)
+    while True:
+        progress = run.progress()
+        finished = progress['done'] + progress['failed']
+        progress_slot.progress(
+            finished / progress['total'],
+            text=f"{finished}/{progress['total']} tickers - {progress['running']} en cours - "
+                 f"{progress['failed']} échecs - {progress['elapsed']:.0f}s"
         )
-        
-        result = json.loads(response.choices[0].message.content)
-        return result
-        
-    except Exception as e:
-        return {
-            'verdict': 'ERROR',
-            'score': 0,
-            'thesis': f"Erreur IA: {str(e)[:50]}",
-            'risk': 'HIGH'
-        }
+        table_slot.dataframe(run.ranking(), use_container_width=True)
+        if run.done:
+            break
+        time.sleep(0.5)
+    
+    failures = run.failures()
+    if failures:
+        with st.expander(f"⚠️ {len(failures)} tickers en échec"):
+            st.dataframe(
+                pd.DataFrame([{'Ticker': t, 'Erreur': e} for t, e in failures.items()]),
+                hide_index=True,
+                use_container_width=True
+            )
+
+
+def render_watchlist(ai_mode=DEFAULT_AI_MODE, ai_stream=DEFAULT_AI_STREAM):
+    """Mode watchlist: scan groupé d'une liste de tickers + tableau récapitulatif triable"""
+    tickers_text = st.text_area(
+        "Tickers (séparés par virgules, espaces ou retours à la ligne)",
+        "AAPL, MSFT, NVDA, GOOGL, AMZN, META, TSLA",
+        height=100
+    )
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        with_info = st.checkbox("Inclure PE / Market Cap (une requête par ticker, plus lent)", value=True)
+    with col2:
+        scan = st.button("📋 SCAN", type="primary", use_container_width=True)
+    
+    if scan:
+        tickers = parse_tickers(tickers_text)
+        if not tickers:
+            st.error("⚠️ Veuillez entrer au moins un ticker")
+            return
+        st.session_state['trace_start'] = time.time()
+        with st.spinner(f"🔍 Téléchargement groupé de {len(tickers)} tickers..."):
+            results = fetch_watchlist(tickers, with_info)
+        # Réutilisés par la vue ticker unique
+        st.session_state['watchlist_results'] = results
+        missing = [t for t in tickers if t not in results]
+        if missing:
+            st.warning(f"⚠️ Aucune donnée pour: {', '.join(missing)}")
+    
+    results = st.session_state.get('watchlist_results')
+    if not results:
+        st.info("👆 Entrez vos tickers et cliquez sur SCAN")
+        return
+    
+    st.markdown(f"### 📋 Watchlist ({len(results)} tickers)")
+    st.dataframe(summarize_watchlist(results), hide_index=True, use_container_width=True)
+    
+    selected = st.selectbox("🔎 Voir le détail", [""] + list(results))
+    if selected:
+        st.markdown("---")
+        render_stock_view(results[selected], ai_mode, ai_stream=ai_stream)
 
-# ==================== INTERFACE UTILISATEUR ====================
 
 def main():
+    # Export Prometheus (AI_HUNTER_METRICS_FILE / AI_HUNTER_METRICS_PORT), démarré une fois par process
+    start_metrics_export()
+    # Préchauffage des tickers populaires (AI_HUNTER_WARM_TICKERS), idem
+    warmer = get_cache_warmer()
+    
     st.title("🦅 AI HUNTER V24 ARMORED")
     st.markdown("*Multi-Layer Data Engine - Enhanced Edition*")
     
     # Banner macro
-    st.markdown(
-        '<div class="macro-banner">📈 MARKET | S&P500: +0.4% | BTC: $98k | VIX: 13.5</div>',
-        unsafe_allow_html=True
-    )
+    render_macro_banner()
+    
+    mode = st.radio("Mode", ["🎯 Ticker unique", "📋 Watchlist", "🔭 Screener"], horizontal=True)
     
     # Input ticker
-    col1, col2 = st.columns([3, 1])
-    with col1:
-        ticker = st.text_input("Ticker Symbol", "NVDA", help="Ex: AAPL, TSLA, MSFT").upper().strip()
-    with col2:
-        btn = st.button("🚀 ANALYZE", type="primary", use_container_width=True)
+    if mode == "🎯 Ticker unique":
+        col1, col2, col3 = st.columns([3, 1, 1])
+        with col1:
+            ticker = st.text_input("Ticker Symbol", "NVDA", help="Ex: AAPL, TSLA, MSFT").upper().strip()
+        with col2:
+            history_range = st.selectbox("Période", list(HISTORY_RANGES), index=list(HISTORY_RANGES).index(DEFAULT_HISTORY_RANGE))
+        with col3:
+            btn = st.button("🚀 ANALYZE", type="primary", use_container_width=True)
     
     # Aide configuration
     with st.expander("⚙️ Configuration (optionnel)"):
@@ -438,8 +471,67 @@ def main():
         
         Sans ces clés, l'app fonctionne en mode dégradé (pas d'IA, 3 méthodes sur 4).
         """)
+        
+        fetch_mode = st.radio(
+            "Mode de récupération",
+            ["sequential", "race"],
+            index=1 if DEFAULT_FETCH_MODE == "race" else 0,
+            format_func=lambda m: "Séquentiel (fallback)" if m == "sequential" else "Course (sources en parallèle)",
+            horizontal=True
+        )
+        hedge_delay = st.slider(
+            "Délai de hedge (s)", 0.0, 10.0, DEFAULT_HEDGE_DELAY, 0.5,
+            help="Mode course: attente avant de lancer la source suivante (0 = toutes en même temps)",
+            disabled=fetch_mode != "race"
+        )
+        ai_modes = {
+            "parallel": "Un appel par persona (parallèle)",
+            "single": "Appel unique (3 verdicts en un JSON)",
+            "local": "Scores locaux (sans IA, instantané)",
+        }
+        ai_mode = st.radio(
+            "Analyse IA",
+            list(ai_modes),
+            index=list(ai_modes).index(DEFAULT_AI_MODE) if DEFAULT_AI_MODE in ai_modes else 0,
+            format_func=ai_modes.get,
+            horizontal=True
+        )
+        ai_stream = st.checkbox(
+            "Verdicts en streaming (affichage progressif)", value=DEFAULT_AI_STREAM,
+            help="Verdict et score affichés dès leur génération, thèse au fil de l'eau"
+        )
+        
+        st.markdown("**🩺 Santé des sources**")
+        health_rows = get_provider_health().snapshot()
+        if health_rows:
+            st.dataframe(pd.DataFrame(health_rows), hide_index=True, use_container_width=True)
+        else:
+            st.caption("Aucun appel enregistré pour l'instant")
+        
+        st.markdown("**🚦 Limiteurs de débit**")
+        st.dataframe(pd.DataFrame(get_rate_limiter().snapshot()), hide_index=True, use_container_width=True)
+        
+        st.markdown("**🔌 Pool HTTP partagé**")
+        st.dataframe(pd.DataFrame(get_http_session().pool_stats()), hide_index=True, use_container_width=True)
+        
+        if warmer is not None:
+            st.markdown("**🔥 Préchauffage du cache**")
+            st.dataframe(pd.DataFrame(warmer.snapshot()), hide_index=True, use_container_width=True)
+    
+    if mode == "📋 Watchlist":
+        render_watchlist(ai_mode, ai_stream)
+        render_footer()
+        return
+    
+    if mode == "🔭 Screener":
+        render_screener()
+        render_footer()
+        return
     
-    if not btn:
+    # Ticker analysé gardé entre les reruns (changement de période, zoom du graphique)
+    if btn:
+        st.session_state['analyzed_ticker'] = ticker
+    elif st.session_state.get('analyzed_ticker') != ticker:
         st.info("👆 Entrez un ticker et cliquez sur ANALYZE")
         return
     
@@ -448,8 +540,16 @@ def main():
         return
     
     # === RÉCUPÉRATION DES DONNÉES ===
-    with st.spinner(f"🔍 Extraction multi-sources pour {ticker}..."):
-        data = fetch_stock_data(ticker)
+    # Déjà récupéré par un scan watchlist (fenêtre par défaut): pas de nouvel appel réseau
+    if btn:
+        st.session_state['trace_start'] = time.time()
+    period, interval = HISTORY_RANGES[history_range]
+    data = None
+    if (period, interval) == (DEFAULT_HISTORY_PERIOD, DEFAULT_HISTORY_INTERVAL):
+        data = st.session_state.get('watchlist_results', {}).get(ticker)
+    if data is None:
+        with st.spinner(f"🔍 Extraction multi-sources pour {ticker}..."):
+            data = fetch_stock_data(ticker, fetch_mode, hedge_delay, period, interval)
     
     # Vérification échec total
     if not data or data.get('current_price', 0) <= 0:
@@ -467,131 +567,116 @@ def main():
         """)
         return
     
-    # === AFFICHAGE DES RÉSULTATS ===
-    
-    # Header
-    st.markdown(f"## {data['ticker']} - {data['name']}")
-    st.markdown(f"# ${data['current_price']:.2f}")
-    
-    # Source badge
-    source_color = "#00ff41" if "YFINANCE" in data['source'] else "#ffa500"
-    st.markdown(
-        f"<div style='color:{source_color}; padding:5px; border:1px solid {source_color}; border-radius:5px; display:inline-block;'>📡 Source: {data['source']}</div>",
-        unsafe_allow_html=True
-    )
-    
-    # Warning si mode dégradé
-    if "SCRAPING" in data['source'] or data['history'].empty:
-        st.warning("⚠️ Mode dégradé: Graphique historique non disponible, mais prix en temps réel OK")
-    
-    st.markdown("---")
-    
-    # === GRAPHIQUE (si disponible) ===
-    if not data['history'].empty:
-        try:
-            df_hist = data['history']
-            
-            # Gestion des colonnes multi-index
-            if isinstance(df_hist.columns, pd.MultiIndex):
-                df_hist.columns = df_hist.columns.get_level_values(0)
-            
-            fig = go.Figure(data=[go.Candlestick(
-                x=df_hist.index,
-                open=df_hist['Open'],
-                high=df_hist['High'],
-                low=df_hist['Low'],
-                close=df_hist['Close'],
-                increasing_line_color='#00ff41',
-                decreasing_line_color='#ff0000'
-            )])
-            
-            fig.update_layout(
-                paper_bgcolor='#1a1f3a',
-                plot_bgcolor='#1a1f3a',
-                font={'color': '#00ff41'},
-                height=400,
-                xaxis_rangeslider_visible=False,
-                title=f"{ticker} - 6 Mois",
-                xaxis_title="Date",
-                yaxis_title="Prix ($)"
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
-        except Exception as e:
-            st.warning(f"Impossible d'afficher le graphique: {str(e)}")
-    
-    # === MÉTRIQUES FONDAMENTALES ===
-    st.markdown("### 📊 Métriques")
-    c1, c2, c3, c4 = st.columns(4)
-    
-    with c1:
-        pe = data.get('trailing_pe', 0)
-        pe_display = f"{pe:.1f}" if pe and pe > 0 else "N/A"
-        c1.metric("PE Ratio", pe_display)
-    
-    with c2:
-        mcap = data.get('market_cap', 0)
-        mcap_display = f"${mcap/1e9:.1f}B" if mcap > 0 else "N/A"
-        c2.metric("Market Cap", mcap_display)
-    
-    with c3:
-        debt = data.get('debt', 0)
-        debt_display = f"${debt/1e9:.1f}B" if debt > 0 else "N/A"
-        c3.metric("Dette", debt_display)
-    
-    with c4:
-        trend = data.get('trend_6m', 0)
-        c4.metric("Trend 6M", f"{trend:.1f}%", delta=f"{trend:.1f}%")
-    
-    # === ANALYSE IA ===
-    st.markdown("---")
-    st.markdown("### 🤖 Analyse IA Multi-Persona")
-    
-    # Vérification clé OpenAI
-    api_key = os.getenv("OPENAI_API_KEY") or st.secrets.get("OPENAI_API_KEY", None)
-    
-    if not api_key:
-        st.warning("⚠️ Clé OpenAI manquante - Analyse IA désactivée")
-        st.info("Ajoutez `OPENAI_API_KEY` dans les secrets Streamlit pour activer l'analyse IA")
+    render_stock_view(data, ai_mode, history_range, ai_stream)
+    render_footer()
+
+
+def format_macro_value(symbol, value):
+    """Prix lisible selon l'instrument (+ variation sur la dernière séance)"""
+    price = value['price']
+    if symbol == 'BTC-USD':
+        text = f"${price / 1000:.0f}k" if price >= 10000 else f"${price:,.0f}"
+    elif symbol == '^VIX':
+        text = f"{price:.1f}"
     else:
-        cols = st.columns(3)
-        personas = ["Warren", "Cathie", "Jim"]
-        
-        for i, persona in enumerate(personas):
-            with cols[i]:
-                with st.spinner(f"🧠 {persona}..."):
-                    analysis = analyze_with_ai(persona, data)
-                
-                verdict = analysis.get('verdict', 'N/A')
-                score = analysis.get('score', 0)
-                thesis = analysis.get('thesis', 'Analyse indisponible')
-                risk = analysis.get('risk', 'UNKNOWN')
-                
-                # Couleur selon verdict
-                if "BUY" in str(verdict):
-                    color = "#00ff41"
-                elif "SELL" in str(verdict):
-                    color = "#ff4136"
-                else:
-                    color = "#ffa500"
-                
-                # Affichage
-                st.markdown(
-                    f'<div class="verdict-box" style="color:{color}; border-color:{color}">'
-                    f'{verdict} ({score}/100)'
-                    f'</div>',
-                    unsafe_allow_html=True
-                )
-                
-                st.markdown(f"**{persona} Buffett/Wood/Cramer:**")
-                st.info(thesis)
-                st.caption(f"Risque: {risk}")
-    
-    # Footer
+        text = f"{price:,.0f}"
+    if value.get('change_pct') is not None:
+        text += f" ({value['change_pct']:+.1f}%)"
+    return text
+
+
+def format_age(seconds):
+    if seconds < 60:
+        return f"{seconds:.0f} s"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+@st.fragment(run_every=MACRO_REFRESH_INTERVAL)
+def render_macro_banner():
+    """
+    Bandeau macro lu dans le snapshot partagé du process (jamais de téléchargement ici)
+    Fragment: réaffiché seul à chaque période de rafraîchissement, sans rerun de la page
+    """
+    snapshot = get_macro_snapshot().snapshot()
+    values = snapshot['values']
+    if not values:
+        status = "⚠️ indisponible" if snapshot['error'] else "⏳ chargement..."
+        content = f"📈 MARKET | {status}"
+    else:
+        content = "📈 MARKET | " + " | ".join(
+            f"{label}: {format_macro_value(symbol, values[symbol]) if symbol in values else 'N/A'}"
+            for symbol, label in MACRO_SYMBOLS.items()
+        )
+        age = format_age(snapshot['age'])
+        if snapshot['stale']:
+            content += f" | <span style='color:#ffa500'>⚠️ valeurs d'il y a {age}</span>"
+        else:
+            content += f" | <span style='opacity:0.6'>🕒 {age}</span>"
+    st.markdown(f'<div class="macro-banner">{content}</div>', unsafe_allow_html=True)
+
+
+def render_footer():
     st.markdown("---")
     st.caption("🦅 AI Hunter V24 Armored - Enhanced Multi-Source Edition")
 
+
+def render_debug_panel():
+    """Latences par étape, compteurs et spans de la dernière action (métriques du process)"""
+    with st.expander("🐞 Debug: latences & métriques"):
+        trace_start = st.session_state.get('trace_start')
+        spans = metrics.REGISTRY.recent_spans(since=trace_start) if trace_start else []
+        if spans:
+            st.markdown("**⏱️ Dernière action (spans terminés)**")
+            st.dataframe(
+                pd.DataFrame([
+                    {
+                        'Début (ms)': round(1000 * (span['started_at'] - trace_start)),
+                        'Durée (ms)': round(1000 * span['elapsed'], 1),
+                        'Étape': span['name'],
+                        'Détail': ", ".join(f"{k}={v}" for k, v in span['labels'].items()),
+                        'Résultat': span['outcome'],
+                        'Thread': span['thread'],
+                    }
+                    for span in sorted(spans, key=lambda s: s['started_at'])
+                ]),
+                hide_index=True,
+                use_container_width=True
+            )
+            st.caption("Spans de tout le process: d'autres sessions actives peuvent apparaître")
+        
+        st.markdown("**📊 Latences par étape**")
+        summary = metrics.REGISTRY.summary()
+        if summary:
+            st.dataframe(pd.DataFrame(summary), hide_index=True, use_container_width=True)
+        else:
+            st.caption("Aucune mesure pour l'instant")
+        
+        cache_stats = get_quote_cache().snapshot_stats()
+        if cache_stats['entries']:
+            st.markdown(
+                f"**💾 Cache des cotations** - {cache_stats['entries']} entrées, "
+                f"{cache_stats['compact_bytes'] / 1024:.0f} Ko en mémoire "
+                f"(DataFrames d'origine: {cache_stats['original_bytes'] / 1024:.0f} Ko) - "
+                f"{cache_stats['hits']} lectures, {cache_stats['misses']} manquées"
+            )
+            st.dataframe(pd.DataFrame(get_quote_cache().memory_report()), hide_index=True, use_container_width=True)
+        
+        counters = metrics.REGISTRY.counters()
+        if counters:
+            st.markdown("**🔢 Compteurs**")
+            st.dataframe(pd.DataFrame(counters), hide_index=True, use_container_width=True)
+        
+        st.download_button(
+            "⬇️ Export Prometheus",
+            metrics.REGISTRY.to_prometheus(),
+            file_name="ai_hunter.prom",
+            mime="text/plain"
+        )
+
 # ==================== POINT D'ENTRÉE ====================
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
+    render_debug_panel()
\ No newline at end of file
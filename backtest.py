@@ -0,0 +1,288 @@
+"""
+Backtest vectorisé des verdicts personas (NumPy / pandas)
+
+Rejoue des historiques stockés (prix, indicateurs, fondamentaux tels que connus à la
+date T) à travers le pipeline de verdicts - scorer local vectorisé, ou verdicts IA
+fournis par une fonction (cache / archive) - puis mesure rendements à terme, taux de
+réussite et courbes de capital par persona.
+À chaque date T, les features sont celles que le direct calculerait sur la même fenêtre
+calendaire (`lookback` d'historique, défaut 6 mois = DEFAULT_HISTORY_PERIOD du moteur):
+chaque indicateur est calculé une fois sur tout le panel (dates x tickers) en version
+fenêtrée (indicators.window_snapshots, indicators.window_trend), puis lu aux dates de
+rééquilibrage. Scorer, rendements et courbes portent sur ces panels et sur la table longue
+(date, ticker), sans accès réseau (voir engine.run_backtest).
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import indicators
+import scoring
+
+# Horizon des rendements à terme (barres: ~1 mois de bourse)
+DEFAULT_HORIZON = 21
+# Fenêtre d'historique vue à chaque date (= période chargée en direct, "6mo")
+DEFAULT_LOOKBACK = pd.DateOffset(months=6)
+VERDICTS = ('BUY', 'HOLD', 'SELL')
+FUNDAMENTAL_FIELDS = ('trailing_pe', 'market_cap', 'debt', 'revenue_growth')
+
+
+# ==================== FEATURES AS-OF ====================
+
+def as_of(frame, index, columns):
+    """Dernière valeur connue à chaque date de `index` (jamais de valeur future)"""
+    if frame is None or frame.empty:
+        return pd.DataFrame(np.nan, index=index, columns=columns)
+    frame = frame.reindex(columns=columns)
+    return frame.reindex(frame.index.union(index)).ffill().reindex(index)
+
+
+def lookup(frame, index):
+    """Valeurs d'un DataFrame large (dates x tickers) aux couples (date, ticker) de `index`, NaN si absents"""
+    dates, tickers = index.get_level_values(0), index.get_level_values(1)
+    frame = frame.reindex(index=dates.unique(), columns=tickers.unique())
+    values = frame.to_numpy(dtype=float)[frame.index.get_indexer(dates), frame.columns.get_indexer(tickers)]
+    return pd.Series(values, index=index)
+
+
+def feature_panels(panel, fundamentals=None, lookback=DEFAULT_LOOKBACK):
+    """
+    Features de chaque date T et de chaque ticker: {feature: DataFrame large}
+    Identiques à build_stock_data sur l'historique [T - lookback, T] (calendriers alignés)
+    `fundamentals`: {champ: DataFrame (jour d'archivage x tickers)}, lu en "as of"
+    """
+    close = panel['Close']
+    features = {
+        'current_price': close,
+        'trend_6m': indicators.window_trend(close, lookback),
+    }
+    features.update(indicators.window_snapshots(panel, lookback))
+    for field in FUNDAMENTAL_FIELDS:
+        features[field] = as_of((fundamentals or {}).get(field), close.index, close.columns)
+    return features
+
+
+def feature_frame(panel, dates, fundamentals=None, lookback=DEFAULT_LOOKBACK):
+    """Table longue des features aux dates `dates` (index (date, ticker), tickers cotés à chaque date)"""
+    panels = feature_panels(panel, fundamentals, lookback)
+    close = panel['Close'].loc[dates]
+    rows, columns = np.nonzero(close.notna().to_numpy())
+    index = pd.MultiIndex.from_arrays([dates[rows], close.columns[columns]], names=['date', 'ticker'])
+    return pd.DataFrame({
+        name: frame.loc[dates].to_numpy(dtype=float)[rows, columns] for name, frame in panels.items()
+    }, index=index)
+
+
+def forward_returns(close, horizon=DEFAULT_HORIZON):
+    """Rendement (%) entre la clôture de chaque date et celle `horizon` barres plus tard"""
+    return (close.shift(-horizon) / close - 1) * 100
+
+
+# ==================== VERDICTS ====================
+
+def local_verdict_frame(features, personas=None):
+    """Scorer local sur toute la table longue: (verdicts, scores), colonnes = personas"""
+    scores = scoring.persona_scores(scoring.component_scores(features), personas)
+    return scoring.verdict_labels(scores), scores
+
+
+def to_data(ticker, row):
+    """
+    Ligne de features -> dict de données au format du moteur (voir build_market_summary)
+    Prompt identique au direct pour les mêmes barres et fondamentaux, aux différences près:
+    nom = ticker, prix = clôture de T (pas un cours intra-séance), source complète
+    """
+    def known(field):
+        value = row.get(field)
+        return value if value is not None and not np.isnan(value) else 0
+
+    return {
+        'ticker': ticker,
+        'name': ticker,
+        'current_price': row['current_price'],
+        'trend_6m': known('trend_6m'),
+        'trailing_pe': known('trailing_pe'),
+        'market_cap': known('market_cap'),
+        'debt': known('debt'),
+        'revenue_growth': known('revenue_growth'),
+        'source': 'API YFINANCE (backtest)',
+        'indicators': {
+            field: row[field] for field in indicators.SNAPSHOT_FIELDS
+            if field in row and not np.isnan(row[field])
+        },
+    }
+
+
+def verdict_frame_from(features, personas, verdict_fn, miss_fn=None, workers=1, max_calls=None):
+    """
+    Verdicts fournis par `verdict_fn(persona, data)` -> dict ou None (ligne ignorée)
+    `miss_fn`: source lente (ex: appel OpenAI) pour les lignes sans verdict, appelée sur
+    `workers` threads et au plus `max_calls` fois (None = sans limite); le reste est ignoré
+    Boucle Python (une consultation par ligne et persona): réservé aux sources non vectorisables
+    Retourne (verdicts, scores, nombre d'appels à `miss_fn`)
+    """
+    personas = list(personas)
+    labels = np.full((len(features), len(personas)), '', dtype=object)
+    scores = np.full((len(features), len(personas)), np.nan)
+    columns = list(features.columns)
+
+    def record(i, j, verdict):
+        if verdict and verdict.get('verdict') in VERDICTS:
+            labels[i, j] = verdict['verdict']
+            scores[i, j] = verdict.get('score', np.nan)
+
+    misses = []
+    for i, (values, (_, ticker)) in enumerate(zip(features.to_numpy().tolist(), features.index)):
+        data = to_data(ticker, dict(zip(columns, values)))
+        for j, persona in enumerate(personas):
+            verdict = verdict_fn(persona, data)
+            if verdict is None and miss_fn is not None:
+                misses.append((i, j, persona, data))
+            record(i, j, verdict)
+
+    misses = misses[:max_calls]
+    if misses:
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="backtest-ai") as executor:
+            results = executor.map(lambda miss: miss_fn(miss[2], miss[3]), misses)
+            for (i, j, _, _), verdict in zip(misses, results):
+                record(i, j, verdict)
+    return (pd.DataFrame(labels, index=features.index, columns=personas),
+            pd.DataFrame(scores, index=features.index, columns=personas),
+            len(misses))
+
+
+# ==================== ÉVALUATION ====================
+
+def _mean_where(mask, values):
+    count = mask.sum(axis=0)
+    total = np.where(mask, values, 0.0).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 0, total / count, np.nan)
+
+
+def hit_rates(verdicts, forward):
+    """
+    Par persona: nombre de verdicts, taux de réussite (BUY suivi d'une hausse, SELL d'une baisse)
+    et rendement moyen à terme par verdict. Une seule passe sur (lignes x personas)
+    """
+    labels = verdicts.to_numpy()
+    returns = forward.to_numpy(dtype=float)[:, None]
+    known = ~np.isnan(returns)
+    buy = (labels == 'BUY') & known
+    hold = (labels == 'HOLD') & known
+    sell = (labels == 'SELL') & known
+    decided = buy | sell
+    hits = (buy & (returns > 0)) | (sell & (returns < 0))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        table = pd.DataFrame({
+            'BUY': buy.sum(axis=0),
+            'HOLD': hold.sum(axis=0),
+            'SELL': sell.sum(axis=0),
+            'Couverture (%)': 100 * (buy | hold | sell).sum(axis=0) / max(known.sum(), 1),
+            'Réussite (%)': 100 * hits.sum(axis=0) / decided.sum(axis=0),
+            'Réussite BUY (%)': 100 * (hits & buy).sum(axis=0) / buy.sum(axis=0),
+            'Réussite SELL (%)': 100 * (hits & sell).sum(axis=0) / sell.sum(axis=0),
+            'Rdt moyen BUY (%)': _mean_where(buy, returns),
+            'Rdt moyen HOLD (%)': _mean_where(hold, returns),
+            'Rdt moyen SELL (%)': _mean_where(sell, returns),
+        }, index=verdicts.columns)
+    table['Écart BUY-SELL (pts)'] = table['Rdt moyen BUY (%)'] - table['Rdt moyen SELL (%)']
+    table['Rdt moyen tous (%)'] = float(np.nanmean(forward)) if known.any() else np.nan
+    table.index.name = 'Persona'
+    return table.round(2)
+
+
+def _portfolio_equity(held, daily_returns):
+    """Capital d'un portefeuille équipondéré: `held` (dates x tickers, 1 = détenu) décalé d'une barre"""
+    weights = held.shift(1).fillna(0.0).to_numpy()
+    returns = daily_returns.to_numpy()
+    active = (weights > 0) & ~np.isnan(returns)
+    count = active.sum(axis=1)
+    total = np.where(active, returns, 0.0).sum(axis=1)
+    # Aucun titre détenu: capital en cash (rendement nul)
+    portfolio = np.where(count > 0, total / np.maximum(count, 1), 0.0)
+    return np.cumprod(1 + portfolio)
+
+
+def equity_curves(close, verdicts, dates):
+    """
+    Par persona: portefeuille équipondéré des tickers en BUY, rééquilibré à chaque date de `dates`
+    (position prise à la clôture du signal) + référence équipondérée de tous les tickers cotés
+    """
+    daily_returns = close.pct_change(fill_method=None)
+
+    def held_between(signal):
+        # Signal aux dates de rééquilibrage -> détention quotidienne jusqu'au suivant
+        signal = signal.reindex(index=dates, columns=close.columns).fillna(False).astype(float)
+        return signal.reindex(close.index).ffill().fillna(0.0)
+
+    curves = {
+        persona: _portfolio_equity(held_between((verdicts[persona] == 'BUY').unstack('ticker')), daily_returns)
+        for persona in verdicts.columns
+    }
+    curves['Référence (équipondérée)'] = _portfolio_equity(held_between(close.loc[dates].notna()), daily_returns)
+    return pd.DataFrame(curves, index=close.index).loc[dates[0]:]
+
+
+def performance(equity):
+    """Rendement total et annualisé, volatilité, Sharpe (taux sans risque nul), drawdown max"""
+    returns = equity.pct_change().iloc[1:]
+    years = max(len(returns) / indicators.TRADING_DAYS, 1e-9)
+    total = equity.iloc[-1] / equity.iloc[0] - 1
+    volatility = returns.std() * np.sqrt(indicators.TRADING_DAYS)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        table = pd.DataFrame({
+            'Rendement total (%)': 100 * total,
+            'Annualisé (%)': 100 * ((1 + total) ** (1 / years) - 1),
+            'Volatilité (%)': 100 * volatility,
+            'Sharpe': returns.mean() * indicators.TRADING_DAYS / volatility.where(volatility > 0),
+            'Max DD (%)': 100 * (equity / equity.cummax() - 1).min(),
+        })
+    table.index.name = 'Portefeuille'
+    return table.round(2)
+
+
+# ==================== BACKTEST ====================
+
+def rebalance_dates(close, horizon=DEFAULT_HORIZON, step=None, lookback=DEFAULT_LOOKBACK):
+    """Dates de rééquilibrage: toutes les `step` barres (défaut: `horizon`), dès que `lookback` d'historique existe"""
+    if close.empty:
+        return close.index
+    return close.index[close.index >= close.index[0] + lookback][::step or horizon]
+
+
+def run(panel, fundamentals=None, personas=None, horizon=DEFAULT_HORIZON, step=None, lookback=DEFAULT_LOOKBACK,
+        verdict_fn=None, miss_fn=None, workers=1, max_calls=None):
+    """
+    Backtest complet d'un panel (voir indicators.to_panel)
+    - verdicts aux dates de rééquilibrage (voir rebalance_dates), features sur `lookback` d'historique
+    - `verdict_fn(persona, data)`: autre source de verdicts (ex: archive IA), sinon scorer local
+    - `miss_fn`, `workers`, `max_calls`: source lente des verdicts manquants (voir verdict_frame_from)
+    Retourne {'hit_rates', 'performance', 'equity', 'verdicts', 'dates', 'calls'} ou None si l'historique est trop court
+    """
+    close = panel['Close']
+    personas = list(personas or scoring.PERSONA_WEIGHTS)
+    dates = rebalance_dates(close, horizon, step, lookback)
+    if len(dates) == 0:
+        return None
+
+    features = scoring.mark_unknown(feature_frame(panel, dates, fundamentals, lookback))
+    forward = lookup(forward_returns(close, horizon), features.index)
+
+    calls = 0
+    if verdict_fn is None:
+        verdicts, scores = local_verdict_frame(features, personas)
+    else:
+        verdicts, scores, calls = verdict_frame_from(features, personas, verdict_fn, miss_fn, workers, max_calls)
+
+    equity = equity_curves(close, verdicts, dates)
+    return {
+        'hit_rates': hit_rates(verdicts, forward),
+        'performance': performance(equity),
+        'equity': equity,
+        'verdicts': verdicts.join(scores, rsuffix=' score').assign(**{'Rdt à terme (%)': forward}),
+        'dates': dates,
+        'calls': calls,
+    }
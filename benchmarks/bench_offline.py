@@ -0,0 +1,241 @@
+"""
+Benchmark hors ligne: moteur et application complète contre des stubs locaux
+(Yahoo Finance, Alpha Vantage, OpenAI - voir benchmarks/stubs.py)
+
+Scénarios, chacun à plusieurs niveaux de concurrence:
+    fetch   engine.fetch_stock_data (orchestrateur complet, stockage local vierge)
+    ai      engine.analyze_with_ai (cache des verdicts froid: un prompt différent par appel)
+    app     app.py via streamlit AppTest: saisie d'un ticker + clic ANALYZE
+
+Rapport: p50/p95/p99 (ms), débit (appels/s), erreurs, pic de RSS (Mo), requêtes reçues
+par les stubs (dont 429 et 5xx injectés).
+
+Usage:
+    python benchmarks/bench_offline.py
+    python benchmarks/bench_offline.py --scenarios fetch,ai --concurrency 1,8,32 --requests 64
+    python benchmarks/bench_offline.py --latency-ms 80 --error-rate 0.05 --burst-every 40 --burst-length 4
+    python benchmarks/bench_offline.py --json results.json   # résultats machine (comparaison entre commits)
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+SCENARIOS = ('fetch', 'ai', 'app')
+
+
+# ==================== MESURES ====================
+
+def current_rss():
+    """RSS du process en octets (/proc sous Linux, sinon pic getrusage)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class RSSSampler:
+    """Échantillonne la RSS pendant un scénario (pic propre au scénario, pas celui du process)"""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    return statistics.quantiles(sorted_values, n=100, method='inclusive')[q - 1]
+
+
+def run_level(call, requests_count, concurrency):
+    """`requests_count` appels de `call(index)` sur `concurrency` threads -> mesures"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def timed(index):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            ok = call(index)
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            errors += 0 if ok else 1
+
+    with RSSSampler() as rss:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench") as executor:
+            list(executor.map(timed, range(requests_count)))
+        wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': requests_count,
+        'errors': errors,
+        'p50_ms': 1000 * percentile(latencies, 50),
+        'p95_ms': 1000 * percentile(latencies, 95),
+        'p99_ms': 1000 * percentile(latencies, 99),
+        'throughput': requests_count / wall if wall else 0.0,
+        'wall_s': wall,
+        'peak_rss_mb': rss.peak / 2 ** 20,
+    }
+
+
+# ==================== SCÉNARIOS ====================
+
+def make_scenario(name, args, engine, run_id):
+    """Fonction call(index) -> succès (bool) pour un scénario"""
+    if name == 'fetch':
+        def call(index):
+            data = engine.fetch_stock_data(f"F{run_id}X{index}", args.fetch_mode, args.hedge_delay)
+            return data is not None and data.get('current_price', 0) > 0
+        return call
+
+    if name == 'ai':
+        def call(index):
+            data = {
+                'ticker': f"A{run_id}X{index}", 'name': 'Bench', 'source': 'API YFINANCE (bench)',
+                'current_price': 100.0 + index, 'trend_6m': 5.0, 'trailing_pe': 20.0,
+                'market_cap': 1e11, 'indicators': {'rsi_14': 55.0},
+            }
+            return engine.analyze_with_ai(engine.PERSONAS[index % len(engine.PERSONAS)], data)['verdict'] != 'ERROR'
+        return call
+
+    if name == 'app':
+        from streamlit.testing.v1 import AppTest
+
+        def call(index):
+            at = AppTest.from_file(os.path.join(ROOT_DIR, "app.py"), default_timeout=args.app_timeout)
+            at.run()
+            at.text_input[0].set_value(f"S{run_id}X{index}")
+            at.button[0].click().run()
+            if at.exception:
+                return False
+            return not any("Impossible de récupérer" in error.value for error in at.error)
+        return call
+
+    raise ValueError(f"Scénario inconnu: {name}")
+
+
+def stub_delta(before, after):
+    return {
+        server: {key: after[server][key] - before[server][key] for key in after[server]}
+        for server in after
+    }
+
+
+# ==================== POINT D'ENTRÉE ====================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Liste parmi: fetch, ai, app")
+    parser.add_argument("--concurrency", default="1,4,16", help="Niveaux de concurrence (ex: 1,4,16)")
+    parser.add_argument("--requests", type=int, default=32, help="Appels par niveau (fetch, ai)")
+    parser.add_argument("--app-requests", type=int, default=6, help="Appels par niveau (app, plus lent)")
+    parser.add_argument("--app-timeout", type=float, default=120)
+    parser.add_argument("--fetch-mode", choices=["sequential", "race"], default="sequential")
+    parser.add_argument("--hedge-delay", type=float, default=2.0)
+    parser.add_argument("--latency-ms", type=float, default=30.0, help="Latence moyenne des stubs")
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probabilité d'une réponse 500")
+    parser.add_argument("--burst-every", type=int, default=0, help="Rafale de 429 toutes les N requêtes")
+    parser.add_argument("--burst-length", type=int, default=0, help="Nombre de 429 par rafale")
+    parser.add_argument("--openai-latency-ms", type=float, default=400.0, help="Latence du stub OpenAI")
+    parser.add_argument("--openai-chunk-ms", type=float, default=20.0,
+                        help="Délai entre fragments des réponses OpenAI en streaming (~1 token)")
+    parser.add_argument("--no-rate-limit", action="store_true", help="Désactive les limiteurs de débit du moteur")
+    parser.add_argument("--json", help="Écrit aussi les résultats dans ce fichier")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+
+    # Environnement isolé: à fixer avant l'import du moteur (lu à l'import / à la création des singletons)
+    os.environ['AI_HUNTER_DATA_DIR'] = tempfile.mkdtemp(prefix="ai-hunter-bench-")
+    os.environ['AI_HUNTER_METRICS_PORT'] = "0"
+    os.environ.setdefault('STREAMLIT_LOGGER_LEVEL', 'error')
+    if args.no_rate_limit:
+        for provider in ('YAHOO', 'ALPHAVANTAGE', 'OPENAI'):
+            os.environ[f"AI_HUNTER_RATE_LIMIT_{provider}"] = "100000:100000"
+
+    import stubs
+
+    behavior = dict(jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                    burst_every=args.burst_every, burst_length=args.burst_length)
+    environment = stubs.StubEnvironment(
+        yahoo=stubs.StubBehavior(latency_ms=args.latency_ms, **behavior),
+        alphavantage=stubs.StubBehavior(latency_ms=args.latency_ms, **behavior),
+        openai=stubs.StubBehavior(latency_ms=args.openai_latency_ms, chunk_ms=args.openai_chunk_ms, **behavior),
+    ).install()
+
+    import engine
+
+    results = []
+    print(f"{'Scénario':<8} {'Conc.':>5} {'N':>4} {'Err.':>4} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} "
+          f"{'Débit/s':>8} {'RSS (Mo)':>9}  Requêtes stubs (429 / 5xx)")
+    try:
+        for run_id, (scenario, concurrency) in enumerate((s, c) for s in scenarios for c in levels):
+            # Chaque niveau part d'un état de santé neuf (pas de circuit ouvert hérité)
+            engine.get_provider_health.reset()
+            count = args.app_requests if scenario == 'app' else args.requests
+            before = environment.stats()
+            result = run_level(make_scenario(scenario, args, engine, run_id), count, concurrency)
+            result.update({'scenario': scenario, 'concurrency': concurrency,
+                           'stubs': stub_delta(before, environment.stats())})
+            results.append(result)
+
+            stub_summary = " ".join(
+                f"{name}={s['requests']} ({s['throttled']}/{s['errors']})"
+                for name, s in result['stubs'].items() if s['requests']
+            )
+            print(f"{scenario:<8} {concurrency:>5} {count:>4} {result['errors']:>4} {result['p50_ms']:>9.1f} "
+                  f"{result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f} {result['throughput']:>8.2f} "
+                  f"{result['peak_rss_mb']:>9.0f}  {stub_summary}", flush=True)
+    finally:
+        environment.stop()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Benchmark de l'extraction du prix dans une page Yahoo Finance:
+parsing DOM complet (BeautifulSoup) vs extraction ciblée en streaming
+
+Usage:
+    python benchmarks/bench_scraping.py                 # pages de benchmarks/samples/*.html
+    python benchmarks/bench_scraping.py --synthetic     # + page synthétique de taille réelle (~500 Ko)
+    python benchmarks/bench_scraping.py --save AAPL MSFT  # enregistre des pages réelles d'abord
+
+Le nom du fichier donne le ticker (AAPL.html); les champs attendus sont dans
+samples/expected.json. Code de sortie 1 si une extraction échoue (prix absent,
+champ différent de l'attendu): utilisable comme test de non-régression.
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engine  # noqa: E402
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "samples")
+EXPECTED_FILE = os.path.join(SAMPLES_DIR, "expected.json")
+SYNTHETIC_EXPECTED = {'price': 189.84, 'change': -1.25, 'name': 'AAPL Synthetic Inc.', 'market_cap': 2950000000000.0}
+
+
+def synthetic_page(ticker="AAPL", price=189.84, change=-1.25, size_kb=500):
+    """Page imitant la structure Yahoo: listes d'autres tickers, balises fin-streamer, JSON échappé"""
+    decoys = [
+        f'<li><fin-streamer data-symbol="DEC{i}" data-field="regularMarketPrice" value="{10 + i}.5"></fin-streamer>'
+        f'<span class="name">Decoy {i} Corp</span></li>\n'
+        for i in range(200)
+    ]
+    quote = (
+        f'<fin-streamer data-symbol="{ticker}" data-field="regularMarketPrice" value="{price}">{price}</fin-streamer>'
+        f'<fin-streamer data-symbol="{ticker}" data-field="regularMarketChangePercent" value="{change}">({change}%)</fin-streamer>'
+    )
+    blob = (
+        '<script type="application/json">{"body":"{\\"quoteSummary\\":{\\"price\\":{'
+        f'\\"symbol\\":\\"{ticker}\\",\\"longName\\":\\"{ticker} Synthetic Inc.\\",'
+        f'\\"regularMarketPrice\\":{{\\"raw\\":{price}}},\\"regularMarketChangePercent\\":{{\\"raw\\":{change}}},'
+        '\\"marketCap\\":{\\"raw\\":2950000000000}}}}"}</script>'
+    )
+    filler = '<div class="filler">' + ("lorem ipsum dolor sit amet " * 40) + "</div>\n"
+    head = "<html><head><title>Quote</title></head><body>" + "".join(decoys[:100])
+    body = head + quote + blob + "".join(decoys[100:])
+    while len(body) < size_kb * 1024:
+        body += filler
+    return body + "</body></html>"
+
+
+def save_pages(tickers):
+    os.makedirs(SAMPLES_DIR, exist_ok=True)
+    session = engine.get_http_session()
+    for ticker in tickers:
+        response = session.get(f"https://finance.yahoo.com/quote/{ticker}", timeout=10)
+        response.raise_for_status()
+        with open(os.path.join(SAMPLES_DIR, f"{ticker}.html"), "w", encoding="utf-8") as f:
+            f.write(response.text)
+        print(f"💾 {ticker}: {len(response.text) / 1024:.0f} Ko")
+
+
+def load_pages(synthetic=False):
+    """[(nom, html, champs attendus)]; page synthétique ajoutée si demandée ou si aucune page enregistrée"""
+    expected = {}
+    if os.path.exists(EXPECTED_FILE):
+        with open(EXPECTED_FILE, encoding="utf-8") as f:
+            expected = json.load(f)
+    pages = []
+    for path in sorted(glob.glob(os.path.join(SAMPLES_DIR, "*.html"))):
+        ticker = os.path.splitext(os.path.basename(path))[0]
+        with open(path, encoding="utf-8") as f:
+            pages.append((ticker, f.read(), expected.get(ticker, {})))
+    if synthetic or not pages:
+        pages.append(("AAPL (synthétique)", synthetic_page(), SYNTHETIC_EXPECTED))
+    return pages
+
+
+def check_fields(fields, expected):
+    """Erreurs d'extraction: prix absent, champ attendu manquant ou différent"""
+    errors = [] if fields.get('price') else ["prix absent"]
+    for field, value in expected.items():
+        if fields.get(field) != value:
+            errors.append(f"{field}: {fields.get(field)!r} (attendu {value!r})")
+    return errors
+
+
+def chunks(html, size=engine.SCRAPING_CHUNK_SIZE):
+    for i in range(0, len(html), size):
+        yield html[i:i + size]
+
+
+def full_parse(html, ticker):
+    """Chemin historique: DOM complet puis regex sur le texte"""
+    fields = engine.extract_quote_soup(html, ticker)
+    if 'price' not in fields:
+        match = engine._JSON_NUMBER_RE['price'].search(html)
+        if match:
+            fields['price'] = float(match.group(1))
+    return fields
+
+
+def streaming(html, ticker):
+    return engine.extract_quote(chunks(html), ticker)
+
+
+def measure(func, html, ticker, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(html, ticker)
+        timings.append((time.perf_counter() - start) * 1000)
+    
+    tracemalloc.start()
+    func(html, ticker)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, statistics.median(timings), peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", nargs="*", default=[], metavar="TICKER", help="Enregistrer des pages réelles avant le benchmark")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--synthetic", action="store_true", help="Ajoute la page synthétique (~500 Ko)")
+    args = parser.parse_args()
+    
+    if args.save:
+        save_pages(args.save)
+    
+    failures = []
+    print(f"{'Page':<22} {'Ko':>6} {'Méthode':<12} {'Médiane (ms)':>13} {'Pic mém. (Ko)':>14}  Champs")
+    for name, html, expected in load_pages(args.synthetic):
+        ticker = name.split()[0]
+        for label, func in (("DOM complet", full_parse), ("streaming", streaming)):
+            try:
+                fields, median_ms, peak_kb = measure(func, html, ticker, args.repeat)
+            except Exception as exc:
+                failures.append(f"{name} / {label}: {type(exc).__name__}: {exc}")
+                continue
+            print(f"{name:<22} {len(html) / 1024:>6.0f} {label:<12} {median_ms:>13.2f} {peak_kb:>14.0f}  {fields}")
+            # Le DOM complet ne lit que le prix et la variation: seul le streaming est vérifié en entier
+            checked = expected if label == "streaming" else {k: v for k, v in expected.items() if k == 'price'}
+            failures += [f"{name} / {label}: {error}" for error in check_fields(fields, checked)]
+    
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,435 @@
+"""
+Serveurs HTTP locaux imitant Yahoo Finance, Alpha Vantage et OpenAI (benchmarks hors ligne)
+
+Chaque serveur rejoue les réponses enregistrées dans benchmarks/samples/ si elles
+existent, sinon génère des réponses synthétiques déterministes pour n'importe quel ticker:
+    samples/<TICKER>.html                  page de cotation (voir bench_scraping.py --save)
+    samples/chart_<TICKER>.json            /v8/finance/chart
+    samples/quoteSummary_<TICKER>.json     /v10/finance/quoteSummary
+    samples/alphavantage_<TICKER>.json     GLOBAL_QUOTE
+    samples/openai_completion.json         chat completion
+
+Comportement réglable par serveur (StubBehavior): latence, taux d'erreurs 5xx,
+rafales de 429 (toutes les N requêtes, les K suivantes sont refusées), délai entre
+fragments des réponses en streaming (OpenAI stream=True, server-sent events).
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from bench_scraping import SAMPLES_DIR, synthetic_page
+
+# Hôtes réels redirigés vers chaque stub (voir engine.load_url_rewrites)
+YAHOO_ORIGINS = [
+    "https://fc.yahoo.com",
+    "https://finance.yahoo.com",
+    "https://query1.finance.yahoo.com",
+    "https://query2.finance.yahoo.com",
+    "https://guce.yahoo.com",
+    "https://consent.yahoo.com",
+]
+ALPHAVANTAGE_ORIGINS = ["https://www.alphavantage.co"]
+
+DAY = 86400
+# Profondeur de l'historique synthétique et séance régulière (UTC)
+HISTORY_DAYS = 20 * 365
+SESSION_OPEN, SESSION_CLOSE = 13 * 3600 + 30 * 60, 20 * 3600
+# Paramètre `range` de /v8/finance/chart: jours de bourse ("d") ou jours calendaires
+RANGE_DAYS = {'1mo': 31, '3mo': 92, '6mo': 183, 'ytd': 366, '1y': 366, '2y': 731, '5y': 1827, '10y': 3653,
+              'max': HISTORY_DAYS}
+
+
+@dataclass
+class StubBehavior:
+    latency_ms: float = 30.0
+    jitter_ms: float = 10.0
+    error_rate: float = 0.0  # Probabilité d'une réponse 500
+    burst_every: int = 0  # Toutes les N requêtes, une rafale de 429 (0 = jamais)
+    burst_length: int = 0
+    chunk_ms: float = 0.0  # Délai entre fragments d'une réponse en streaming
+    seed: int = 42
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Client qui ferme la connexion en cours de lecture (scraping en streaming): normal
+        pass
+
+
+class StubServer:
+    """Serveur HTTP threadé: latence et erreurs injectées avant chaque réponse du `router`"""
+
+    def __init__(self, name, router, behavior=None):
+        self.name = name
+        self.router = router
+        self.behavior = behavior or StubBehavior()
+        self.stats = {'requests': 0, 'errors': 0, 'throttled': 0, 'unknown': 0}
+        self._lock = threading.Lock()
+        self._random = random.Random(self.behavior.seed)
+        self._server = _QuietServer(('127.0.0.1', 0), self._handler_class())
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name=f"stub-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _fault(self):
+        """Code d'erreur à injecter pour la requête courante, ou None"""
+        behavior = self.behavior
+        with self._lock:
+            index = self.stats['requests']
+            self.stats['requests'] += 1
+            delay = max(behavior.latency_ms + self._random.uniform(-behavior.jitter_ms, behavior.jitter_ms), 0) / 1000
+            if behavior.burst_every and index % behavior.burst_every < behavior.burst_length:
+                self.stats['throttled'] += 1
+                return delay, 429
+            if self._random.random() < behavior.error_rate:
+                self.stats['errors'] += 1
+                return delay, 500
+        return delay, None
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _respond(self, method):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                delay, fault = stub._fault()
+                time.sleep(delay)
+                if fault:
+                    status, content_type, payload, headers = fault, 'application/json', b'{"error": "injected"}', {}
+                    if fault == 429:
+                        headers = {'Retry-After': '1'}
+                else:
+                    parsed = urlparse(self.path)
+                    result = stub.router(method, parsed.path, parse_qs(parsed.query), body)
+                    if result is None:
+                        with stub._lock:
+                            stub.stats['unknown'] += 1
+                        result = (404, 'text/plain', b'not found', {})
+                    status, content_type, payload, headers = result
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                if isinstance(payload, bytes):
+                    self.send_header('Content-Length', str(len(payload)))
+                else:
+                    self.send_header('Transfer-Encoding', 'chunked')
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                if isinstance(payload, bytes):
+                    self.wfile.write(payload)
+                    return
+                # Réponse en streaming: un fragment HTTP par élément, espacés de chunk_ms
+                for index, piece in enumerate(payload):
+                    if index and stub.behavior.chunk_ms:
+                        time.sleep(stub.behavior.chunk_ms / 1000)
+                    self.wfile.write(f"{len(piece):x}\r\n".encode() + piece + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+            def do_GET(self):
+                self._respond('GET')
+
+            def do_POST(self):
+                self._respond('POST')
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+# ==================== DONNÉES ====================
+
+def _recorded(name):
+    path = os.path.join(SAMPLES_DIR, name)
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            return f.read()
+    return None
+
+
+def _json(payload, status=200, headers=None):
+    return status, 'application/json', json.dumps(payload).encode('utf-8'), headers or {}
+
+
+def ticker_price(ticker):
+    """Prix de base stable par ticker (10 à 510)"""
+    return 10 + int(hashlib.md5(ticker.encode()).hexdigest()[:6], 16) % 50000 / 100
+
+
+def is_business_day(day):
+    return (day + 3) % 7 < 5  # 1970-01-01 = jeudi
+
+
+def daily_bars(ticker, start, end):
+    """Barres journalières déterministes (jours ouvrés) entre deux timestamps epoch"""
+    rng = random.Random(ticker)
+    base = ticker_price(ticker)
+    first_day = int(time.time()) // DAY - HISTORY_DAYS
+    bars = []
+    price = base
+    for day in range(first_day, int(time.time()) // DAY + 1):
+        price *= 1 + rng.gauss(0, 0.015)
+        ts = day * DAY + SESSION_OPEN
+        if not is_business_day(day) or not start <= ts <= end:
+            continue
+        bars.append((ts, price))
+    return bars
+
+
+def intraday_bars(ticker, start, end, step):
+    """Barres intraday déterministes (toutes les `step` s pendant la séance) entre deux timestamps"""
+    bars = []
+    for day in range(start // DAY, end // DAY + 1):
+        if not is_business_day(day):
+            continue
+        rng = random.Random(f"{ticker}:{day}")
+        price = ticker_price(ticker) * (1 + rng.gauss(0, 0.05))
+        for offset in range(SESSION_OPEN, SESSION_CLOSE, step):
+            price *= 1 + rng.gauss(0, 0.002)
+            if start <= day * DAY + offset <= min(end, int(time.time())):
+                bars.append((day * DAY + offset, price))
+    return bars
+
+
+def interval_seconds(interval):
+    """"1d" -> None (journalier), "5m" -> 300, "1h" -> 3600"""
+    match = re.fullmatch(r'(\d+)(m|h)', interval)
+    if not match:
+        return None
+    return int(match.group(1)) * (60 if match.group(2) == 'm' else 3600)
+
+
+def range_start(range_, now):
+    """Début d'une fenêtre `range` ("5d" = 5 dernières séances, comme Yahoo)"""
+    match = re.fullmatch(r'(\d+)d', range_)
+    if not match:
+        return now - RANGE_DAYS.get(range_, 183) * DAY
+    day, remaining = now // DAY, int(match.group(1))
+    while True:
+        if is_business_day(day):
+            remaining -= 1
+            if remaining == 0:
+                return day * DAY
+        day -= 1
+
+
+def trading_periods(start, end):
+    """meta.tradingPeriods (séance régulière par jour), requis par yfinance en intraday"""
+    return [
+        [{'timezone': 'EDT', 'start': day * DAY + SESSION_OPEN, 'end': day * DAY + SESSION_CLOSE, 'gmtoffset': -14400}]
+        for day in range(start // DAY, end // DAY + 1) if is_business_day(day)
+    ]
+
+
+def chart_payload(ticker, query):
+    now = int(time.time())
+    interval = query.get('interval', ['1d'])[0]
+    if 'period1' in query:
+        start = int(query['period1'][0])
+        end = int(query.get('period2', [now])[0])
+    else:
+        start, end = range_start(query.get('range', ['6mo'])[0], now), now
+    step = interval_seconds(interval)
+    bars = intraday_bars(ticker, start, end, step) if step else daily_bars(ticker, start, end)
+    closes = [round(p, 4) for _, p in bars]
+    return {'chart': {'result': [{
+        'meta': {
+            'currency': 'USD', 'symbol': ticker, 'exchangeName': 'NMS', 'fullExchangeName': 'NasdaqGS',
+            'instrumentType': 'EQUITY', 'firstTradeDate': 345479400, 'regularMarketTime': now,
+            'hasPrePostMarketData': True, 'gmtoffset': -14400, 'timezone': 'EDT',
+            'exchangeTimezoneName': 'America/New_York', 'regularMarketPrice': closes[-1] if closes else None,
+            'chartPreviousClose': closes[0] if closes else None, 'priceHint': 2,
+            'currentTradingPeriod': {
+                'pre': {'timezone': 'EDT', 'start': now - 3600, 'end': now, 'gmtoffset': -14400},
+                'regular': {'timezone': 'EDT', 'start': now, 'end': now + 3600, 'gmtoffset': -14400},
+                'post': {'timezone': 'EDT', 'start': now + 3600, 'end': now + 7200, 'gmtoffset': -14400},
+            },
+            'dataGranularity': interval, 'range': query.get('range', [''])[0],
+            'validRanges': ['1d', '5d', '1mo', '3mo', '6mo', '1y', '2y', '5y', '10y', 'ytd', 'max'],
+            **({'tradingPeriods': trading_periods(start, end)} if step else {}),
+        },
+        'timestamp': [ts for ts, _ in bars],
+        'indicators': {
+            'quote': [{
+                'open': [round(c * 0.995, 4) for c in closes],
+                'high': [round(c * 1.01, 4) for c in closes],
+                'low': [round(c * 0.99, 4) for c in closes],
+                'close': closes,
+                'volume': [1_000_000 + 1000 * (i % 50) for i in range(len(closes))],
+            }],
+            'adjclose': [{'adjclose': closes}],
+        },
+    }], 'error': None}}
+
+
+def quote_summary_payload(ticker):
+    price = ticker_price(ticker)
+    raw = lambda value: {'raw': value, 'fmt': str(value)}  # noqa: E731
+    return {'quoteSummary': {'result': [{
+        'price': {'symbol': ticker, 'longName': f"{ticker} Stub Inc.", 'shortName': f"{ticker} Stub",
+                  'regularMarketPrice': raw(price), 'currency': 'USD', 'quoteType': 'EQUITY'},
+        'quoteType': {'symbol': ticker, 'quoteType': 'EQUITY', 'longName': f"{ticker} Stub Inc.",
+                      'exchange': 'NMS', 'exchangeTimezoneName': 'America/New_York'},
+        'summaryDetail': {'marketCap': raw(price * 1e9), 'trailingPE': raw(25.0), 'currency': 'USD'},
+        'financialData': {'totalDebt': raw(price * 1e8), 'revenueGrowth': raw(0.12),
+                          'currentPrice': raw(price), 'financialCurrency': 'USD'},
+        'defaultKeyStatistics': {'sharesOutstanding': raw(1e9)},
+        'assetProfile': {'sector': 'Technology', 'industry': 'Software'},
+    }], 'error': None}}
+
+
+def quote_list_payload(symbols):
+    return {'quoteResponse': {'result': [
+        {'symbol': s, 'longName': f"{s} Stub Inc.", 'regularMarketPrice': ticker_price(s),
+         'marketCap': ticker_price(s) * 1e9, 'trailingPE': 25.0, 'currency': 'USD', 'quoteType': 'EQUITY'}
+        for s in symbols
+    ], 'error': None}}
+
+
+def yahoo_router(method, path, query, body):
+    match = re.match(r'^/v8/finance/chart/([^/]+)$', path)
+    if match:
+        ticker = match.group(1)
+        recorded = _recorded(f"chart_{ticker}.json")
+        return (200, 'application/json', recorded, {}) if recorded else _json(chart_payload(ticker, query))
+    match = re.match(r'^/v10/finance/quoteSummary/([^/]+)$', path)
+    if match:
+        ticker = match.group(1)
+        recorded = _recorded(f"quoteSummary_{ticker}.json")
+        return (200, 'application/json', recorded, {}) if recorded else _json(quote_summary_payload(ticker))
+    if path == '/v7/finance/quote':
+        symbols = [s for s in query.get('symbols', [''])[0].split(',') if s]
+        return _json(quote_list_payload(symbols))
+    match = re.match(r'^/quote/([^/]+)/?$', path)
+    if match:
+        ticker = match.group(1)
+        page = _recorded(f"{ticker}.html") or synthetic_page(ticker, price=round(ticker_price(ticker), 2)).encode('utf-8')
+        return 200, 'text/html; charset=utf-8', page, {}
+    if path == '/v1/test/getcrumb':
+        return 200, 'text/plain', b'stubcrumb', {}
+    if path in ('', '/'):
+        # fc.yahoo.com: cookie de session
+        return 404, 'text/html', b'', {'Set-Cookie': 'A3=stub; Path=/; Max-Age=31536000'}
+    if path.startswith('/ws/fundamentals-timeseries/'):
+        return _json({'timeseries': {'result': [], 'error': None}})
+    return None
+
+
+def alphavantage_router(method, path, query, body):
+    if path != '/query' or query.get('function', [''])[0] != 'GLOBAL_QUOTE':
+        return None
+    ticker = query.get('symbol', [''])[0]
+    recorded = _recorded(f"alphavantage_{ticker}.json")
+    if recorded:
+        return 200, 'application/json', recorded, {}
+    price = ticker_price(ticker)
+    return _json({'Global Quote': {
+        '01. symbol': ticker, '05. price': f"{price:.4f}", '10. change percent': '0.8500%',
+    }})
+
+
+def openai_router(method, path, query, body):
+    if method != 'POST' or not path.endswith('/chat/completions'):
+        return None
+    request = json.loads(body or b'{}')
+    recorded = _recorded("openai_completion.json")
+    if recorded:
+        return 200, 'application/json', recorded, {}
+
+    prompt = " ".join(m.get('content', '') for m in request.get('messages', []))
+    score = int(hashlib.md5(prompt.encode()).hexdigest()[:4], 16) % 100
+    verdict = {'verdict': 'BUY' if score > 66 else 'HOLD' if score > 45 else 'SELL', 'score': score,
+               'thesis': "Réponse simulée (stub)", 'risk': 'MEDIUM'}
+    # Appel groupé: un verdict par persona listé dans le prompt système
+    personas = re.findall(r'"(\w+)": \{"verdict"', prompt)
+    content = {persona: verdict for persona in personas} if personas else verdict
+    text = json.dumps(content, ensure_ascii=False)
+    usage = {'prompt_tokens': len(prompt) // 4, 'completion_tokens': 40 * max(len(personas), 1),
+             'total_tokens': len(prompt) // 4 + 40 * max(len(personas), 1)}
+    if request.get('stream'):
+        include_usage = (request.get('stream_options') or {}).get('include_usage', False)
+        return 200, 'text/event-stream', completion_events(request, text, usage if include_usage else None), {}
+    return _json({
+        'id': 'chatcmpl-stub', 'object': 'chat.completion', 'created': int(time.time()),
+        'model': request.get('model', 'stub'),
+        'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': text}}],
+        'usage': usage,
+    })
+
+
+def completion_events(request, text, usage, piece_size=4):
+    """Server-sent events d'une completion en streaming: ~1 token (4 caractères) par fragment"""
+    base = {'id': 'chatcmpl-stub', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+            'model': request.get('model', 'stub')}
+
+    def event(choices, **extra):
+        return f"data: {json.dumps({**base, 'choices': choices, **extra}, ensure_ascii=False)}\n\n".encode('utf-8')
+
+    yield event([{'index': 0, 'delta': {'role': 'assistant', 'content': ''}, 'finish_reason': None}])
+    for i in range(0, len(text), piece_size):
+        yield event([{'index': 0, 'delta': {'content': text[i:i + piece_size]}, 'finish_reason': None}])
+    yield event([{'index': 0, 'delta': {}, 'finish_reason': 'stop'}])
+    if usage:
+        yield event([], usage=usage)
+    yield b"data: [DONE]\n\n"
+
+
+# ==================== MISE EN PLACE ====================
+
+class StubEnvironment:
+    """
+    Démarre les trois stubs et y redirige le moteur (réseau réel jamais contacté)
+    À créer AVANT le premier appel réseau du moteur (session et client OpenAI lus à la création)
+    """
+
+    def __init__(self, yahoo=None, alphavantage=None, openai=None):
+        self.yahoo = StubServer('yahoo', yahoo_router, yahoo).start()
+        self.alphavantage = StubServer('alphavantage', alphavantage_router, alphavantage).start()
+        self.openai = StubServer('openai', openai_router, openai).start()
+        self.servers = [self.yahoo, self.alphavantage, self.openai]
+
+    def environ(self):
+        """Variables d'environnement lues par le moteur"""
+        rewrites = [f"{origin}={self.yahoo.url}" for origin in YAHOO_ORIGINS]
+        rewrites += [f"{origin}={self.alphavantage.url}" for origin in ALPHAVANTAGE_ORIGINS]
+        return {
+            'AI_HUNTER_URL_REWRITES': ",".join(rewrites),
+            'OPENAI_BASE_URL': f"{self.openai.url}/v1",
+            'OPENAI_API_KEY': 'sk-stub',
+            'ALPHA_VANTAGE_KEY': 'stub',
+        }
+
+    def install(self):
+        os.environ.update(self.environ())
+        return self
+
+    def stats(self):
+        return {server.name: dict(server.stats) for server in self.servers}
+
+    def stop(self):
+        for server in self.servers:
+            server.stop()
@@ -0,0 +1,248 @@
+"""
+AI Hunter en ligne de commande (sans Streamlit)
+
+    python cli.py analyze AAPL MSFT NVDA --format csv --output verdicts.csv
+    python cli.py analyze --file tickers.txt --batch --ai none
+    python cli.py analyze --file sp500.txt --batch --ai-top-n 10   # LLM pour les 10 meilleurs scores locaux
+    python cli.py backtest --start 2019-01-01 --horizon 21 --equity equity.csv   # hors ligne, stockage local
+    python cli.py backtest --source ai --ai-live --ai-max-calls 500   # OpenAI pour au plus 500 verdicts manquants
+"""
+import argparse
+import csv
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import backtest
+import engine
+import metrics
+
+# Champs scalaires repris du dict de données (l'historique n'est pas exporté)
+EXPORT_FIELDS = [
+    'ticker', 'name', 'current_price', 'trend_6m', 'market_cap',
+    'trailing_pe', 'debt', 'revenue_growth', 'source',
+]
+
+
+def _stderr_status(level, message):
+    print(f"[{level}] {message}", file=sys.stderr)
+
+
+def read_tickers(args):
+    """Tickers passés en arguments et/ou lus depuis --file (un par ligne ou séparés par virgules)"""
+    text = " ".join(args.tickers)
+    if args.file:
+        with open(args.file, encoding='utf-8') as f:
+            text += "\n" + f.read()
+    return engine.parse_tickers(text)
+
+
+def fetch_all(tickers, args):
+    """{ticker: dict de données ou None}"""
+    if args.batch:
+        results = engine.fetch_watchlist(tickers, True, args.period, args.interval)
+        return {ticker: results.get(ticker) for ticker in tickers}
+
+    on_status = _stderr_status if args.verbose else None
+    with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="cli-fetch") as executor:
+        futures = {
+            ticker: executor.submit(
+                engine.fetch_stock_data, ticker, args.mode, args.hedge_delay, on_status, args.period, args.interval
+            )
+            for ticker in tickers
+        }
+        return {ticker: future.result() for ticker, future in futures.items()}
+
+
+def analyze(data, ai_mode, local, personas):
+    """
+    Verdicts des personas selon le mode IA ({} si --ai none)
+    `local`: verdicts locaux du ticker, gardés pour les personas non confiés au LLM (`personas`)
+    """
+    if ai_mode == 'none':
+        return {}
+    verdicts = dict(local)
+    if ai_mode == 'local' or not personas:
+        return verdicts
+    if ai_mode == 'single':
+        verdicts.update(engine.analyze_all_personas(data, personas))
+    else:
+        verdicts.update(engine.analyze_personas_concurrently(data, personas))
+    return verdicts
+
+
+def build_record(ticker, data, ai_mode, local=None, personas=engine.PERSONAS):
+    if not data:
+        return {'ticker': ticker, 'error': 'Aucune source de données disponible'}
+
+    record = {field: data.get(field) for field in EXPORT_FIELDS}
+    record['indicators'] = data.get('indicators', {})
+    record['verdicts'] = analyze(data, ai_mode, local or {}, personas)
+    return record
+
+
+def flatten_record(record):
+    """Une ligne CSV: indicateurs et verdicts à plat (rsi_14, Warren Buffett_verdict, ...)"""
+    row = {key: value for key, value in record.items() if key not in ('indicators', 'verdicts')}
+    row.update(record.get('indicators', {}))
+    for persona, verdict in record.get('verdicts', {}).items():
+        for key in ('verdict', 'score', 'thesis', 'risk', 'source'):
+            row[f"{persona}_{key}"] = verdict.get(key)
+    return row
+
+
+def write_records(records, fmt, output):
+    out = open(output, 'w', encoding='utf-8', newline='') if output else sys.stdout
+    try:
+        if fmt == 'json':
+            json.dump(records, out, ensure_ascii=False, indent=2, default=str)
+            out.write("\n")
+        else:
+            rows = [flatten_record(record) for record in records]
+            columns = []
+            for row in rows:
+                columns += [key for key in row if key not in columns]
+            writer = csv.DictWriter(out, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
+    finally:
+        if output:
+            out.close()
+
+
+def cmd_analyze(args):
+    tickers = read_tickers(args)
+    if not tickers:
+        print("Aucun ticker fourni", file=sys.stderr)
+        return 2
+
+    results = fetch_all(tickers, args)
+    # Scores locaux de tout le lot en un passage; seuls les meilleurs / cas limites vont au LLM
+    available = {ticker: data for ticker, data in results.items() if data}
+    local = engine.local_verdicts(available)
+    selected = engine.select_for_ai(available, top_n=args.ai_top_n, margin=args.ai_borderline)
+    records = [
+        build_record(ticker, results.get(ticker), args.ai, local.get(ticker), selected.get(ticker))
+        for ticker in tickers
+    ]
+    write_records(records, args.format, args.output)
+
+    if args.metrics:
+        metrics.REGISTRY.write_textfile(args.metrics)
+
+    failed = [record['ticker'] for record in records if 'error' in record]
+    if failed:
+        print(f"Échec pour: {', '.join(failed)}", file=sys.stderr)
+    return 1 if len(failed) == len(records) else 0
+
+
+def write_backtest(result, fmt, output):
+    """Taux de réussite et performances: tableaux texte ou JSON"""
+    out = open(output, 'w', encoding='utf-8') if output else sys.stdout
+    try:
+        if fmt == 'json':
+            json.dump({
+                'dates': [str(date.date()) for date in result['dates']],
+                'hit_rates': result['hit_rates'].reset_index().to_dict(orient='records'),
+                'performance': result['performance'].reset_index().to_dict(orient='records'),
+            }, out, ensure_ascii=False, indent=2, default=str)
+            out.write("\n")
+        else:
+            dates = result['dates']
+            out.write(f"Rééquilibrages: {len(dates)} ({dates[0].date()} -> {dates[-1].date()})\n\n")
+            out.write(result['hit_rates'].T.to_string() + "\n\n")
+            out.write(result['performance'].to_string() + "\n")
+    finally:
+        if output:
+            out.close()
+
+
+def cmd_backtest(args):
+    tickers = read_tickers(args) or None
+    result = engine.run_backtest(
+        tickers, args.start, args.end, args.horizon, args.step,
+        source=args.source, live=args.ai_live, workers=args.ai_workers, max_calls=args.ai_max_calls
+    )
+    if result is None:
+        print("Historique journalier local vide ou trop court (lancer d'abord analyze / le scan)", file=sys.stderr)
+        return 2
+
+    write_backtest(result, args.format, args.output)
+    if result['calls']:
+        print(f"Appels OpenAI: {result['calls']}", file=sys.stderr)
+    if args.equity:
+        result['equity'].to_csv(args.equity, index_label='Date')
+    if args.verdicts:
+        result['verdicts'].to_csv(args.verdicts)
+
+    if args.metrics:
+        metrics.REGISTRY.write_textfile(args.metrics)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="ai-hunter", description="AI Hunter - analyse de tickers sans interface")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    p_analyze = subparsers.add_parser('analyze', help="Données + indicateurs + verdicts IA pour une liste de tickers")
+    p_analyze.add_argument('tickers', nargs='*', help="Tickers (ex: AAPL MSFT)")
+    p_analyze.add_argument('--file', help="Fichier de tickers (un par ligne ou séparés par virgules)")
+    p_analyze.add_argument('--format', choices=['json', 'csv'], default='json')
+    p_analyze.add_argument('--output', '-o', help="Fichier de sortie (défaut: stdout)")
+    p_analyze.add_argument('--mode', choices=['sequential', 'race'], default=engine.DEFAULT_FETCH_MODE,
+                           help="Orchestration des sources de données")
+    p_analyze.add_argument('--hedge-delay', type=float, default=engine.DEFAULT_HEDGE_DELAY)
+    p_analyze.add_argument('--period', default=engine.DEFAULT_HISTORY_PERIOD,
+                           help="Fenêtre d'historique yfinance (5d, 6mo, 1y, 5y, max...)")
+    p_analyze.add_argument('--interval', default=engine.DEFAULT_HISTORY_INTERVAL,
+                           help="Intervalle des barres (1d, 1h, 30m, 5m...)")
+    p_analyze.add_argument('--ai', choices=['parallel', 'single', 'local', 'none'], default=engine.DEFAULT_AI_MODE,
+                           help="parallel: un appel par persona, single: un appel groupé, "
+                                "local: scores locaux sans LLM, none: pas de verdict")
+    p_analyze.add_argument('--ai-top-n', type=int, default=engine.AI_TOP_N,
+                           help="LLM seulement pour les N meilleurs scores locaux de chaque persona (0 = tous)")
+    p_analyze.add_argument('--ai-borderline', type=float, default=engine.AI_BORDERLINE_MARGIN,
+                           help="... et pour les scores locaux à moins de N points d'un seuil de verdict")
+    p_analyze.add_argument('--workers', type=int, default=4, help="Tickers récupérés en parallèle")
+    p_analyze.add_argument('--batch', action='store_true',
+                           help="Téléchargement groupé yfinance (rapide, sans sources de repli)")
+    p_analyze.add_argument('--verbose', '-v', action='store_true', help="Progression des sources sur stderr")
+    p_analyze.add_argument('--metrics', default=engine.METRICS_FILE,
+                           help="Fichier Prometheus (latences, compteurs) écrit en fin d'exécution")
+    p_analyze.set_defaults(func=cmd_analyze)
+
+    p_backtest = subparsers.add_parser('backtest', help="Rejoue l'historique local à travers les verdicts personas")
+    p_backtest.add_argument('tickers', nargs='*', help="Tickers (défaut: tous ceux du stockage local)")
+    p_backtest.add_argument('--file', help="Fichier de tickers (un par ligne ou séparés par virgules)")
+    p_backtest.add_argument('--start', help="Première date (ex: 2019-01-01)")
+    p_backtest.add_argument('--end', help="Dernière date")
+    p_backtest.add_argument('--horizon', type=int, default=backtest.DEFAULT_HORIZON,
+                            help="Horizon des rendements à terme (barres)")
+    p_backtest.add_argument('--step', type=int, help="Barres entre deux rééquilibrages (défaut: l'horizon)")
+    p_backtest.add_argument('--source', choices=['local', 'ai'], default='local',
+                            help="local: scorer local, ai: verdicts IA déjà archivés (hors ligne)")
+    p_backtest.add_argument('--ai-live', action='store_true',
+                            help="Avec --source ai: demande à OpenAI les verdicts absents de l'archive "
+                                 "(payant: une requête par date x ticker x persona)")
+    p_backtest.add_argument('--ai-workers', type=int, default=engine.BACKTEST_AI_WORKERS,
+                            help="Appels OpenAI simultanés avec --ai-live")
+    p_backtest.add_argument('--ai-max-calls', type=int,
+                            help="Avec --ai-live: nombre maximal d'appels OpenAI (défaut: sans limite)")
+    p_backtest.add_argument('--format', choices=['text', 'json'], default='text')
+    p_backtest.add_argument('--output', '-o', help="Fichier de sortie (défaut: stdout)")
+    p_backtest.add_argument('--equity', help="CSV des courbes de capital par persona")
+    p_backtest.add_argument('--verdicts', help="CSV des verdicts et rendements à terme (date, ticker)")
+    p_backtest.add_argument('--metrics', default=engine.METRICS_FILE,
+                            help="Fichier Prometheus (latences, compteurs) écrit en fin d'exécution")
+    p_backtest.set_defaults(func=cmd_backtest)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
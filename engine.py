@@ -0,0 +1,3464 @@
+"""
+Moteur de données AI Hunter: sources de prix, cache, orchestrateur, analyse IA
+
+Utilisable sans Streamlit (CLI, cron, workers): aucune dépendance à l'interface,
+et les bibliothèques lourdes (yfinance, openai, bs4) ne sont importées qu'au
+premier appel qui en a besoin.
+"""
+import os
+import sys
+import json
+import time
+import re
+import sqlite3
+import hashlib
+import heapq
+import random
+import threading
+import functools
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from queue import Queue, Empty
+
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+import backtest
+import indicators
+import metrics
+import scoring
+
+# ==================== CONFIGURATION ====================
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+
+def get_secret(name):
+    """Variable d'environnement, sinon secret Streamlit (uniquement si Streamlit est déjà chargé)"""
+    value = os.getenv(name)
+    if value or 'streamlit' not in sys.modules:
+        return value
+    try:
+        return sys.modules['streamlit'].secrets.get(name, None)
+    except Exception:
+        # Pas de fichier secrets.toml
+        return None
+
+
+_singletons = {}
+_singletons_lock = threading.RLock()
+
+
+def singleton(factory):
+    """
+    Instance unique par process (et par arguments), créée au premier appel
+    Le module reste chargé entre les reruns Streamlit: l'instance est partagée
+    par toutes les sessions, threads et appels headless
+    """
+    @functools.wraps(factory)
+    def get(*args):
+        key = (factory.__name__,) + args
+        with _singletons_lock:
+            if key not in _singletons:
+                _singletons[key] = factory(*args)
+            return _singletons[key]
+    
+    def reset():
+        """Oublie les instances: la prochaine lecture en recrée une (benchmarks, tests)"""
+        with _singletons_lock:
+            for key in [k for k in _singletons if k[0] == factory.__name__]:
+                del _singletons[key]
+    
+    get.reset = reset
+    return get
+
+
+class _Flight:
+    """Appel en cours: résultat (ou exception) attendu par tous les appelants de la même clé"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.listeners = []
+        self.last_partial = None
+        self.lock = threading.Lock()
+    
+    def subscribe(self, on_partial):
+        # Un appelant arrivé en cours de route reçoit d'abord le dernier résultat partiel
+        with self.lock:
+            self.listeners.append(on_partial)
+            if self.last_partial is not None:
+                on_partial(self.last_partial)
+    
+    def publish(self, partial):
+        with self.lock:
+            self.last_partial = partial
+            for listener in self.listeners:
+                listener(partial)
+
+
+class SingleFlight:
+    """
+    Déduplication des appels concurrents (single-flight): pour une même clé, un seul
+    appel réel à la fois, les appelants arrivés pendant ce temps attendent et reçoivent
+    le même résultat (ou la même exception). Rien n'est mémorisé une fois l'appel terminé:
+    c'est le rôle des caches placés devant.
+    Le résultat est partagé: les appelants ne doivent pas le modifier.
+    """
+    
+    def __init__(self, name):
+        self.name = name
+        self._flights = {}
+        self._lock = threading.Lock()
+    
+    def do(self, key, fn, on_partial=None):
+        """
+        `fn()` si aucun appel n'est en cours pour `key`, sinon attend celui en cours
+        `on_partial`: reçoit les résultats intermédiaires diffusés via publish(key, ...)
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        metrics.inc('singleflight_calls', group=self.name, role='leader' if leader else 'follower')
+        if on_partial is not None:
+            flight.subscribe(on_partial)
+        
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result
+    
+    def publish(self, key, partial):
+        """Diffuse un résultat intermédiaire à tous les appelants en attente sur `key`"""
+        with self._lock:
+            flight = self._flights.get(key)
+        if flight is not None:
+            flight.publish(partial)
+    
+    def in_flight(self):
+        with self._lock:
+            return len(self._flights)
+
+
+@singleton
+def get_inflight(group):
+    """Groupe de déduplication partagé par tout le process ('fetch_quote', 'quote_cache', 'openai')"""
+    return SingleFlight(group)
+
+# ==================== MÉTRIQUES ====================
+
+# Export Prometheus: fichier réécrit périodiquement (textfile collector) et/ou endpoint HTTP
+METRICS_FILE = os.getenv("AI_HUNTER_METRICS_FILE")
+METRICS_PORT = int(os.getenv("AI_HUNTER_METRICS_PORT", "0"))
+METRICS_INTERVAL = float(os.getenv("AI_HUNTER_METRICS_INTERVAL", "15"))
+
+metrics.describe('fetch_quote_seconds', "Récupération complète d'un ticker (toutes sources)")
+metrics.describe('fetch_method_seconds', "Appel d'une source de données")
+metrics.describe('http_attempt_seconds', "Tentative HTTP individuelle (retries urllib3 compris)")
+metrics.describe('http_retries', "Retries urllib3 par hôte et motif")
+metrics.describe('yf_info_seconds', "Appel stock.info (fondamentaux yfinance)")
+metrics.describe('yf_batch_download_seconds', "yf.download groupé (watchlist)")
+metrics.describe('html_parse_seconds', "Extraction de la cotation depuis le HTML")
+metrics.describe('rate_limit_wait_seconds', "Attente imposée par le limiteur de débit")
+metrics.describe('circuit_breaker_trips', "Ouvertures de circuit par source")
+metrics.describe('circuit_breaker_skips', "Appels évités par un circuit ouvert")
+metrics.describe('ohlcv_store_requests', "Historiques servis par le stockage local (delta), complets, re-téléchargés (rebase: dividende, split) ou en échec réseau (failed)")
+metrics.describe('verdict_cache_lookups', "Consultations du cache des verdicts IA")
+metrics.describe('verdict_archive_lookups', "Consultations de l'archive permanente des verdicts IA (backtest)")
+metrics.describe('openai_completion_seconds', "Appel OpenAI (hors cache)")
+metrics.describe('openai_tokens', "Tokens OpenAI consommés (response.usage)")
+metrics.describe('openai_stream_seconds', "Appel OpenAI en streaming, jusqu'au dernier fragment (hors cache)")
+metrics.describe('openai_first_token_seconds', "Streaming OpenAI: délai avant le premier fragment de texte")
+metrics.describe('ai_first_verdict_seconds', "Streaming: délai avant verdict + score affichables, par persona")
+metrics.describe('ai_analysis_seconds', "Analyse IA d'un persona (cache compris)")
+metrics.describe('quote_cache_lookups', "Lectures du cache compact des cotations")
+metrics.describe('macro_refresh_seconds', "Rafraîchissement du snapshot macro (un yf.download groupé)")
+metrics.describe('cache_warm_seconds', "Rafraîchissement d'un ticker par le préchauffage du cache")
+metrics.describe('cache_warmer_skips', "Passages du préchauffage reportés (entrée encore fraîche, débit réservé)")
+metrics.describe('fundamentals_cache_lookups', "Consultations du cache journalier des fondamentaux")
+metrics.describe('local_scoring_seconds', "Pré-scoring local vectorisé des personas")
+metrics.describe('ai_fallback_verdicts', "Verdicts locaux servis à la place de l'IA (clé absente, appel en échec)")
+metrics.describe('ai_calls_skipped', "Analyses persona non envoyées au LLM (filtre par score local)")
+metrics.describe('backtest_seconds', "Backtest des verdicts personas sur l'historique local")
+metrics.describe('singleflight_calls', "Appels dédupliqués: leader (appel réel) ou follower (attend le leader)")
+
+
+@singleton
+def start_metrics_export():
+    """Démarre l'export configuré (une seule fois par process)"""
+    if METRICS_FILE:
+        metrics.write_periodically(METRICS_FILE, METRICS_INTERVAL)
+    if METRICS_PORT:
+        try:
+            metrics.serve_http(METRICS_PORT)
+        except OSError:
+            # Port déjà pris (autre process): l'export fichier reste possible
+            pass
+    return True
+
+# ==================== LIMITEUR DE DÉBIT ====================
+
+# Budget par fournisseur: (jetons par seconde, rafale max)
+# Un jeton = une requête HTTP, ou un appel logique entier (voir RateLimiter.call): une
+# récupération yfinance fait ~8 requêtes (chart, quoteSummary...), comptées pour une seule.
+# Yahoo: une analyse = 2 appels (cotation + fondamentaux hors cache). 8 appels/s, rafale 16:
+# un utilisateur enchaînant les analyses (~2.5/s hors ligne) n'attend jamais, seules les
+# charges soutenues (screener, warmer, plusieurs sessions) sont lissées à ~4 analyses/s
+# Surcharge possible: AI_HUNTER_RATE_LIMIT_<FOURNISSEUR>="débit:rafale" (ex: "0.5:3")
+DEFAULT_RATE_LIMITS = {
+    'yahoo': (8.0, 16),
+    'alphavantage': (5 / 60, 5),  # Limite documentée: 5 requêtes/minute
+    'openai': (3.0, 10),
+}
+
+# Hôtes HTTP -> fournisseur (les autres hôtes ne sont pas limités)
+PROVIDER_HOSTS = {
+    'yahoo.com': 'yahoo',
+    'alphavantage.co': 'alphavantage',
+}
+# Poignée de main cookie / crumb / consentement de yfinance: jamais comptée (hôte ou chemin)
+HANDSHAKE_HOSTS = {'fc.yahoo.com', 'guce.yahoo.com', 'consent.yahoo.com'}
+HANDSHAKE_PATHS = {'/v1/test/getcrumb'}
+
+
+def load_rate_limits():
+    limits = dict(DEFAULT_RATE_LIMITS)
+    for provider in limits:
+        override = os.getenv(f"AI_HUNTER_RATE_LIMIT_{provider.upper()}")
+        if override:
+            rate, _, burst = override.partition(':')
+            limits[provider] = (float(rate), int(burst or 1))
+    return limits
+
+
+class TokenBucket:
+    """
+    Seau à jetons thread-safe: `rate` jetons/s, au plus `capacity` en réserve
+    Un appel ne bloque que si le budget est épuisé; les jetons sont réservés dans
+    l'ordre d'arrivée (le solde peut devenir négatif = file d'attente)
+    """
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.stats = {'acquired': 0, 'waited': 0, 'total_wait': 0.0, 'max_wait': 0.0}
+    
+    def _refill(self, now):
+        # Appelé sous self._lock
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def acquire(self):
+        """Prend un jeton, attend si nécessaire. Retourne le temps d'attente (s)"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= 1
+            wait_time = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.stats['acquired'] += 1
+            if wait_time > 0:
+                self.stats['waited'] += 1
+                self.stats['total_wait'] += wait_time
+                self.stats['max_wait'] = max(self.stats['max_wait'], wait_time)
+        
+        if wait_time > 0:
+            time.sleep(wait_time)
+        return wait_time
+    
+    def available(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+class RateLimiter:
+    """Un seau à jetons par fournisseur, partagé par tous les threads et sessions"""
+    
+    def __init__(self, limits):
+        self.buckets = {provider: TokenBucket(rate, burst) for provider, (rate, burst) in limits.items()}
+        self._scopes = threading.local()
+    
+    def _active(self):
+        if not hasattr(self._scopes, 'providers'):
+            self._scopes.providers = set()
+        return self._scopes.providers
+    
+    @contextmanager
+    def call(self, provider):
+        """
+        Appel logique (une récupération, un stock.info): un seul jeton, les requêtes HTTP
+        faites par ce thread pendant l'appel ne sont plus comptées une à une
+        """
+        active = self._active()
+        if provider in active:
+            yield 0.0
+            return
+        wait_time = self.acquire(provider)
+        active.add(provider)
+        try:
+            yield wait_time
+        finally:
+            active.discard(provider)
+    
+    def acquire(self, provider):
+        bucket = self.buckets.get(provider)
+        if bucket is None:
+            return 0.0
+        wait_time = bucket.acquire()
+        metrics.observe('rate_limit_wait_seconds', wait_time, provider=provider)
+        return wait_time
+    
+    def acquire_for_url(self, url):
+        parsed = urlparse(url)
+        host = parsed.hostname or ''
+        if host in HANDSHAKE_HOSTS or parsed.path in HANDSHAKE_PATHS:
+            return 0.0
+        for domain, provider in PROVIDER_HOSTS.items():
+            if host == domain or host.endswith('.' + domain):
+                # Déjà compté par l'appel logique en cours (voir call)
+                return 0.0 if provider in self._active() else self.acquire(provider)
+        return 0.0
+    
+    def snapshot(self):
+        rows = []
+        for provider, bucket in self.buckets.items():
+            stats = dict(bucket.stats)
+            rows.append({
+                'Fournisseur': provider,
+                'Débit (req/s)': round(bucket.rate, 3),
+                'Rafale': bucket.capacity,
+                'Jetons dispo': round(max(bucket.available(), 0), 1),
+                'Requêtes': stats['acquired'],
+                'En attente': stats['waited'],
+                'Attente moy. (s)': round(stats['total_wait'] / stats['waited'], 2) if stats['waited'] else 0.0,
+                'Attente max (s)': round(stats['max_wait'], 2),
+            })
+        return rows
+
+
+@singleton
+def get_rate_limiter():
+    return RateLimiter(load_rate_limits())
+
+
+def rate_limited(provider):
+    """Décorateur: chaque appel de la fonction est un appel logique au fournisseur (voir RateLimiter.call)"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with get_rate_limiter().call(provider):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+# ==================== SESSION HTTP ROBUSTE ====================
+
+# Headers réalistes pour contourner la détection
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9,fr;q=0.8',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'none',
+    'Cache-Control': 'max-age=0',
+    'DNT': '1',
+}
+
+# Limites par hôte: connexions gardées ouvertes, inactivité max (s) avant recyclage du pool
+HOST_POOL_LIMITS = {
+    'finance.yahoo.com': {'pool_maxsize': 10, 'keepalive': 60},
+    'query1.finance.yahoo.com': {'pool_maxsize': 10, 'keepalive': 60},
+    'query2.finance.yahoo.com': {'pool_maxsize': 10, 'keepalive': 60},
+    'www.alphavantage.co': {'pool_maxsize': 4, 'keepalive': 30},
+}
+DEFAULT_POOL_LIMITS = {'pool_maxsize': 10, 'keepalive': 60}
+
+
+def load_url_rewrites():
+    """
+    Redirections d'origine (miroir, proxy, serveurs de benchmark locaux)
+    AI_HUNTER_URL_REWRITES="https://finance.yahoo.com=http://127.0.0.1:8001,https://www.alphavantage.co=..."
+    """
+    rewrites = {}
+    for item in os.getenv("AI_HUNTER_URL_REWRITES", "").split(','):
+        origin, _, target = item.strip().partition('=')
+        if origin and target:
+            rewrites[origin.rstrip('/')] = target.rstrip('/')
+    return rewrites
+
+
+class InstrumentedRetry(Retry):
+    """Retry urllib3 qui compte chaque nouvelle tentative (hôte, motif)"""
+    
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if response is not None:
+            reason = str(response.status)
+        else:
+            reason = type(error).__name__ if error else 'unknown'
+        metrics.inc('http_retries', host=_pool.host if _pool else '', reason=reason)
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+
+class _TimedPoolMixin:
+    """Chaque tentative HTTP sur le fil (y compris les retries urllib3) mesurée séparément"""
+    
+    def _make_request(self, conn, method, url, *args, **kwargs):
+        with metrics.span('http_attempt', host=self.host) as span:
+            response = super()._make_request(conn, method, url, *args, **kwargs)
+            span['outcome'] = str(response.status)
+            return response
+
+
+class TimedHTTPConnectionPool(_TimedPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class TimedHTTPSConnectionPool(_TimedPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class InstrumentedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
+
+
+def create_retry_strategy():
+    # Strategy de retry: 3 tentatives avec délai croissant
+    return InstrumentedRetry(
+        total=3,
+        backoff_factor=1,  # 1s, 2s, 4s
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET", "POST"]
+    )
+
+
+class PooledSession(requests.Session):
+    """
+    Session partagée par tout le process (threads et sessions Streamlit)
+    - Un HTTPAdapter par hôte fournisseur, avec sa propre taille de pool
+    - Connexions keep-alive réutilisées; un pool inactif depuis plus de `keepalive` s
+      est fermé avant réutilisation (évite les sockets fermés côté serveur)
+    - Chaque requête passe par le limiteur de débit du fournisseur (si fourni), sauf pendant
+      un appel logique déjà compté (RateLimiter.call) et la poignée de main cookie/crumb
+    - `url_rewrites` {origine: cible}: l'origine d'une URL est remplacée après le
+      limiteur de débit (le budget reste celui du fournisseur d'origine)
+    - Erreurs de transport (exception réseau / timeout, 429, 5xx) comptées par thread
+      (voir provider_errors): distingue une source en panne d'un ticker sans données
+    """
+    
+    def __init__(self, host_limits=HOST_POOL_LIMITS, default_limits=DEFAULT_POOL_LIMITS, rate_limiter=None,
+                 url_rewrites=None):
+        super().__init__()
+        self.rate_limiter = rate_limiter
+        self.url_rewrites = dict(url_rewrites or {})
+        self.headers.update(BROWSER_HEADERS)
+        self._lock = threading.Lock()
+        self._limits = {}
+        self._last_used = {}
+        self._recycled = {}
+        self._errors = threading.local()
+        
+        for prefix in ("http://", "https://"):
+            self._mount_pool(prefix, default_limits, pool_connections=10)
+        for host, limits in host_limits.items():
+            self._mount_pool(f"https://{host}", limits)
+    
+    def _mount_pool(self, prefix, limits, pool_connections=1):
+        self.mount(prefix, InstrumentedAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=limits['pool_maxsize'],
+            max_retries=create_retry_strategy()
+        ))
+        self._limits[prefix] = limits
+        self._last_used[prefix] = time.monotonic()
+        self._recycled[prefix] = 0
+    
+    def request(self, method, url, *args, **kwargs):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire_for_url(url)
+        try:
+            response = super().request(method, self.rewrite_url(url), *args, **kwargs)
+        except requests.RequestException:
+            self._errors.count = self.provider_errors() + 1
+            raise
+        if response.status_code == 429 or response.status_code >= 500:
+            self._errors.count = self.provider_errors() + 1
+        return response
+    
+    def provider_errors(self):
+        """Erreurs de transport vues par le thread courant (compteur croissant, à comparer avant/après)"""
+        return getattr(self._errors, 'count', 0)
+    
+    def rewrite_url(self, url):
+        if self.url_rewrites:
+            parsed = urlparse(url)
+            target = self.url_rewrites.get(f"{parsed.scheme}://{parsed.netloc}")
+            if target:
+                return target + url[len(parsed.scheme) + 3 + len(parsed.netloc):]
+        return url
+    
+    def get_adapter(self, url):
+        adapter = super().get_adapter(url)
+        prefix = next(p for p, a in self.adapters.items() if a is adapter)
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_used[prefix] > self._limits[prefix]['keepalive']:
+                adapter.close()
+                self._recycled[prefix] += 1
+            self._last_used[prefix] = now
+        return adapter
+    
+    def pool_stats(self):
+        """Par hôte: connexions ouvertes, requêtes servies, réutilisations, connexions inactives"""
+        stats = []
+        for prefix, adapter in self.adapters.items():
+            pools = list(adapter.poolmanager.pools._container.values())
+            connections = sum(pool.num_connections for pool in pools)
+            requests_count = sum(pool.num_requests for pool in pools)
+            stats.append({
+                'host': prefix,
+                'pool_maxsize': self._limits[prefix]['pool_maxsize'],
+                'connections': connections,
+                'requests': requests_count,
+                'reused': max(requests_count - connections, 0),
+                'idle': sum(1 for pool in pools if pool.pool is not None for conn in list(pool.pool.queue) if conn is not None),
+                'recycled': self._recycled[prefix],
+            })
+        return stats
+
+
+@singleton
+def get_http_session():
+    """Session HTTP poolée unique, utilisée par tous les fetchers et yfinance"""
+    return PooledSession(rate_limiter=get_rate_limiter(), url_rewrites=load_url_rewrites())
+
+# ==================== STOCKAGE LOCAL OHLCV ====================
+
+# Répertoire des données persistantes (historiques, caches disque)
+DATA_DIR = os.getenv("AI_HUNTER_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".data"))
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Fenêtres d'historique proposées: libellé -> (période, intervalle yfinance)
+# yfinance limite l'intraday (60 jours en 5-30 min, 730 jours en 1 h)
+HISTORY_RANGES = {
+    "1 Jour (5 min)": ("1d", "5m"),
+    "5 Jours (30 min)": ("5d", "30m"),
+    "1 Mois (1 h)": ("1mo", "1h"),
+    "6 Mois": ("6mo", "1d"),
+    "1 An": ("1y", "1d"),
+    "5 Ans": ("5y", "1d"),
+    "Max": ("max", "1d"),
+}
+DEFAULT_HISTORY_RANGE = "6 Mois"
+DEFAULT_HISTORY_PERIOD, DEFAULT_HISTORY_INTERVAL = HISTORY_RANGES[DEFAULT_HISTORY_RANGE]
+# Écart toléré entre le début de la fenêtre et la première barre stockée (week-ends, jours fériés)
+COVERAGE_TOLERANCE = pd.Timedelta(days=7)
+# Delta: barres déjà stockées re-téléchargées pour vérifier la base d'ajustement (dividendes, splits)
+REBASE_LOOKBACK = pd.Timedelta(days=7)
+# Écart relatif de clôture au-delà duquel le stock local est considéré sur une autre base
+REBASE_TOLERANCE = 1e-4
+
+
+class OHLCVStore:
+    """
+    Historiques OHLCV persistés dans SQLite, indexés par (ticker, intervalle, timestamp)
+    Survit aux redémarrages: seules les barres manquantes sont re-téléchargées
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ohlcv (
+                    ticker TEXT NOT NULL,
+                    interval TEXT NOT NULL,
+                    ts INTEGER NOT NULL,
+                    open REAL, high REAL, low REAL, close REAL, volume REAL,
+                    PRIMARY KEY (ticker, interval, ts)
+                ) WITHOUT ROWID
+            """)
+    
+    def _connect(self):
+        # Une connexion par opération: sûr entre threads et sessions Streamlit
+        return sqlite3.connect(self.path, timeout=30)
+    
+    def last_timestamp(self, ticker, interval):
+        """Date de la dernière barre stockée (ou None)"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT MAX(ts) FROM ohlcv WHERE ticker = ? AND interval = ?",
+                (ticker, interval)
+            ).fetchone()
+        if not row or row[0] is None:
+            return None
+        return pd.Timestamp(row[0], unit='s')
+    
+    def bounds(self, ticker, interval):
+        """Dates (première barre, dernière barre) stockées, (None, None) si rien"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT MIN(ts), MAX(ts) FROM ohlcv WHERE ticker = ? AND interval = ?",
+                (ticker, interval)
+            ).fetchone()
+        if not row or row[0] is None:
+            return None, None
+        return pd.Timestamp(row[0], unit='s'), pd.Timestamp(row[1], unit='s')
+    
+    def load(self, ticker, interval, start=None):
+        """Historique stocké depuis `start` (inclus), index DatetimeIndex 'Date'"""
+        query = "SELECT ts, open, high, low, close, volume FROM ohlcv WHERE ticker = ? AND interval = ?"
+        params = [ticker, interval]
+        if start is not None:
+            query += " AND ts >= ?"
+            params.append(int(pd.Timestamp(start).timestamp()))
+        query += " ORDER BY ts"
+        
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        
+        df = pd.DataFrame(rows, columns=['ts'] + OHLCV_COLUMNS)
+        df.index = pd.DatetimeIndex(pd.to_datetime(df.pop('ts'), unit='s'), name='Date')
+        return df
+    
+    def tickers(self, interval):
+        """Tickers ayant au moins une barre stockée pour cet intervalle"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT DISTINCT ticker FROM ohlcv WHERE interval = ? ORDER BY ticker", (interval,)).fetchall()
+        return [row[0] for row in rows]
+    
+    def load_panel(self, tickers, interval, start=None, end=None):
+        """
+        Historiques de plusieurs tickers en une requête, au format panel de indicators.to_panel:
+        {'Open'|'High'|'Low'|'Close'|'Volume': DataFrame large (index = dates, colonnes = tickers)}
+        """
+        query = "SELECT ticker, ts, open, high, low, close, volume FROM ohlcv WHERE interval = ?"
+        params = [interval]
+        if tickers:
+            query += f" AND ticker IN ({','.join('?' * len(tickers))})"
+            params += list(tickers)
+        for bound, op in ((start, '>='), (end, '<=')):
+            if bound is not None:
+                query += f" AND ts {op} ?"
+                params.append(int(pd.Timestamp(bound).timestamp()))
+        
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        if not rows:
+            return {}
+        
+        df = pd.DataFrame(rows, columns=['ticker', 'ts'] + OHLCV_COLUMNS)
+        df['ts'] = pd.to_datetime(df['ts'], unit='s')
+        wide = df.pivot(index='ts', columns='ticker')
+        wide.index.name = 'Date'
+        available = set(wide.columns.get_level_values(1))
+        columns = [t for t in tickers if t in available] if tickers else sorted(available)
+        return {field: wide[field].reindex(columns=columns).astype(float) for field in OHLCV_COLUMNS}
+    
+    def append(self, ticker, interval, df, replace_all=False):
+        """
+        Ajoute (ou remplace) les barres de `df`
+        `replace_all`: supprime d'abord tout l'historique stocké du ticker (même transaction)
+        """
+        df = normalize_ohlcv(df, daily=interval.endswith(('d', 'wk', 'mo')))
+        if df.empty:
+            return 0
+        
+        ts = (df.index - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+        rows = list(zip(
+            [ticker] * len(df), [interval] * len(df), ts.tolist(),
+            *(df[col].astype(float).tolist() for col in OHLCV_COLUMNS)
+        ))
+        with self._connect() as conn:
+            if replace_all:
+                conn.execute("DELETE FROM ohlcv WHERE ticker = ? AND interval = ?", (ticker, interval))
+            conn.executemany("INSERT OR REPLACE INTO ohlcv VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+    
+    def same_basis(self, ticker, interval, df):
+        """
+        Les barres re-téléchargées (`df`, ajustées par yfinance) sont-elles sur la même base
+        d'ajustement que le stock ? Après un dividende ou un split, Yahoo réajuste tout
+        l'historique: les clôtures déjà stockées ne correspondent plus.
+        Compare les barres communes, sauf la dernière stockée (parfois partielle); True si aucune
+        """
+        df = normalize_ohlcv(df, daily=interval.endswith(('d', 'wk', 'mo')))
+        if df.empty:
+            return True
+        stored = self.load(ticker, interval, start=df.index[0]).iloc[:-1]
+        common = stored.index.intersection(df.index)
+        if common.empty:
+            return True
+        return bool(np.allclose(
+            df.loc[common, 'Close'].to_numpy(dtype=float), stored.loc[common, 'Close'].to_numpy(dtype=float),
+            rtol=REBASE_TOLERANCE, atol=0
+        ))
+
+
+def normalize_ohlcv(df, daily=True):
+    """
+    Uniformise un historique yfinance: colonnes OHLCV à plat (sans multi-index),
+    index sans fuseau horaire (UTC), ramené à la date pour les barres journalières
+    """
+    if df is None or df.empty:
+        return pd.DataFrame(columns=OHLCV_COLUMNS)
+    
+    df = df.copy()
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.get_level_values(0)
+    df = df[[col for col in OHLCV_COLUMNS if col in df.columns]].dropna(subset=['Close'])
+    
+    index = pd.DatetimeIndex(df.index)
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None) if not daily else index.tz_localize(None)
+    df.index = index.normalize() if daily else index
+    df.index.name = 'Date'
+    return df[~df.index.duplicated(keep='last')]
+
+
+def period_offset(period):
+    """
+    Durée d'une période yfinance ("6mo", "1y", "5d"...), None pour "max"
+    Les jours sont des jours de bourse ("1d" un lundi = depuis vendredi)
+    """
+    match = re.fullmatch(r'(\d+)(d|wk|mo|y)', period)
+    if not match:
+        return None
+    count, unit = int(match.group(1)), match.group(2)
+    return {
+        'd': pd.offsets.BDay(count),
+        'wk': pd.DateOffset(weeks=count),
+        'mo': pd.DateOffset(months=count),
+        'y': pd.DateOffset(years=count),
+    }[unit]
+
+
+def period_start(period, now=None):
+    """Début de la fenêtre d'une période yfinance à la date `now` (défaut: maintenant), None pour max"""
+    offset = period_offset(period)
+    if offset is None:
+        return None
+    return (now if now is not None else pd.Timestamp.now()).normalize() - offset
+
+
+def covers_window(first, last, window_start):
+    """
+    Le stock local suffit-il pour un simple delta ?
+    Non si vide, période "max", dernière barre hors fenêtre, ou première barre bien après
+    le début de la fenêtre (période allongée, ex: 6mo stockés puis 5y demandés)
+    """
+    if last is None or window_start is None or last < window_start:
+        return False
+    return first <= window_start + COVERAGE_TOLERANCE
+
+
+@singleton
+def get_ohlcv_store():
+    return OHLCVStore(os.path.join(DATA_DIR, "ohlcv.sqlite"))
+
+
+def fetch_history_incremental(ticker_symbol, fetch_range, period=DEFAULT_HISTORY_PERIOD,
+                              interval=DEFAULT_HISTORY_INTERVAL, allow_stale=False):
+    """
+    Historique via le stockage local + delta réseau:
+    - rien en local (ou ne couvrant pas la fenêtre): téléchargement complet de `period`
+    - sinon: seulement les barres depuis la dernière date stockée (re-téléchargée car parfois partielle),
+      plus quelques barres déjà stockées (REBASE_LOOKBACK) pour vérifier la base d'ajustement
+    - base d'ajustement changée (dividende, split): téléchargement complet qui remplace le stock
+    `fetch_range(**kwargs)` appelle yfinance avec period=... ou start=...
+    Téléchargement en échec (None ou vide): None, pour que l'appelant passe à la source suivante;
+    `allow_stale`: l'appelant accepte alors le stock local tel quel (hors ligne)
+    """
+    store = get_ohlcv_store()
+    window_start = period_start(period)
+    first, last = store.bounds(ticker_symbol, interval)
+    replace_all = False
+    
+    if not covers_window(first, last, window_start):
+        metrics.inc('ohlcv_store_requests', kind='full')
+        df = fetch_range(period=period, interval=interval)
+    else:
+        metrics.inc('ohlcv_store_requests', kind='delta')
+        df = fetch_range(start=(last - REBASE_LOOKBACK).strftime('%Y-%m-%d'), interval=interval)
+        if df is not None and not store.same_basis(ticker_symbol, interval, df):
+            metrics.inc('ohlcv_store_requests', kind='rebase')
+            df = fetch_range(period=period, interval=interval)
+            replace_all = True
+    
+    if df is None or df.empty:
+        # Le stock local serait servi comme une donnée fraîche (cotation périmée mise en cache)
+        metrics.inc('ohlcv_store_requests', kind='failed')
+        if not allow_stale:
+            return None
+    else:
+        store.append(ticker_symbol, interval, df, replace_all=replace_all)
+    
+    return store.load(ticker_symbol, interval, start=window_start)
+
+def trailing_trend(close, months=6):
+    """
+    Variation (%) sur les `months` derniers mois de l'historique
+    (toute la fenêtre si elle est plus courte, ex: intraday), voir indicators.trailing_trend
+    """
+    return float(indicators.trailing_trend(close.to_frame()).iloc[0])
+
+
+def build_stock_data(ticker_symbol, df, fundamentals, source, indicator_snapshot=None):
+    """
+    Construit le dict de données standard à partir d'un historique yfinance
+    `fundamentals`: fondamentaux déjà connus (voir get_fundamentals), {} sinon
+    `indicator_snapshot`: indicateurs déjà calculés (watchlist), sinon calculés ici
+    Retourne None si le prix est invalide
+    """
+    close_col = df['Close']
+    if isinstance(close_col, pd.DataFrame):
+        close_col = close_col.iloc[:, 0]
+    
+    price_today = float(close_col.iloc[-1])
+    
+    if price_today <= 0:
+        return None
+    
+    trend_6m = trailing_trend(close_col)
+    
+    return {
+        'ticker': ticker_symbol,
+        'name': fundamentals.get('name') or ticker_symbol,
+        'current_price': price_today,
+        'history': df,
+        'trend_6m': trend_6m,
+        'market_cap': fundamentals.get('market_cap') or 0,
+        'trailing_pe': fundamentals.get('trailing_pe') or 0,
+        'debt': fundamentals.get('debt') or 0,
+        'revenue_growth': fundamentals.get('revenue_growth') or 0,
+        'indicators': indicators.snapshot_for_history(df) if indicator_snapshot is None else indicator_snapshot,
+        'source': source
+    }
+
+# ==================== MÉTHODE 1: YFINANCE DOWNLOAD ====================
+
+@rate_limited('yahoo')
+def fetch_via_yf_download(ticker_symbol, period=DEFAULT_HISTORY_PERIOD, interval=DEFAULT_HISTORY_INTERVAL):
+    """
+    Méthode 1: yfinance.download (généralement la plus fiable)
+    Retourne None en cas d'échec
+    """
+    import yfinance as yf
+    
+    try:
+        # Historique: stockage local + delta téléchargé
+        df = fetch_history_incremental(
+            ticker_symbol,
+            lambda **kwargs: yf.download(
+                ticker_symbol,
+                progress=False,
+                timeout=10,
+                threads=False,  # Évite les problèmes de concurrence
+                session=get_http_session(),
+                **kwargs
+            ),
+            period=period,
+            interval=interval
+        )
+        
+        if df is None or df.empty:
+            return None
+        
+        # Fondamentaux: cache journalier séparé (voir fetch_stock_data)
+        return build_stock_data(ticker_symbol, df, {}, 'API YFINANCE (download)')
+        
+    except Exception:
+        return None
+
+# ==================== MÉTHODE 2: YFINANCE TICKER.HISTORY ====================
+
+@rate_limited('yahoo')
+def fetch_via_yf_ticker(ticker_symbol, period=DEFAULT_HISTORY_PERIOD, interval=DEFAULT_HISTORY_INTERVAL):
+    """
+    Méthode 2: yfinance.Ticker().history (alternative)
+    Parfois fonctionne quand download échoue
+    """
+    import yfinance as yf
+    
+    try:
+        session = get_http_session()
+        stock = yf.Ticker(ticker_symbol, session=session)
+        
+        df = fetch_history_incremental(ticker_symbol, stock.history, period=period, interval=interval)
+        
+        if df is None or df.empty or df['Close'].iloc[-1] <= 0:
+            return None
+        
+        # Fondamentaux: cache journalier séparé (voir fetch_stock_data)
+        return build_stock_data(ticker_symbol, df, {}, 'API YFINANCE (Ticker.history)')
+        
+    except Exception:
+        return None
+
+# ==================== MÉTHODE 3: SCRAPING YAHOO ====================
+
+# Champs recherchés dans la page (balises fin-streamer et JSON embarqué, éventuellement échappé)
+_FIN_STREAMER_RE = re.compile(r'<fin-streamer\b[^>]*>', re.IGNORECASE)
+_ATTR_RE = re.compile(r'([\w-]+)="([^"]*)"')
+_JSON_NUMBER_RE = {
+    'price': re.compile(r'\\?"regularMarketPrice\\?":\s*\{\s*\\?"raw\\?"\s*:\s*(-?[\d.]+(?:[eE][+-]?\d+)?)'),
+    'change': re.compile(r'\\?"regularMarketChangePercent\\?":\s*\{\s*\\?"raw\\?"\s*:\s*(-?[\d.]+(?:[eE][+-]?\d+)?)'),
+    'market_cap': re.compile(r'\\?"marketCap\\?":\s*\{\s*\\?"raw\\?"\s*:\s*(-?[\d.]+(?:[eE][+-]?\d+)?)'),
+}
+_JSON_NAME_RE = re.compile(r'\\?"(?:longName|shortName)\\?":\s*\\?"((?:[^"\\]|\\[^"])*)\\?"')
+
+SCRAPING_FIELDS = ('price', 'change', 'name', 'market_cap')
+SCRAPING_CHUNK_SIZE = 64 * 1024
+# Rayon (caractères) autour du symbole dans lequel chercher les champs JSON de la cotation
+_QUOTE_RADIUS = 3000
+# Recouvrement entre morceaux: un motif (ou le symbole de référence) peut être coupé à la frontière
+_SCAN_OVERLAP = _QUOTE_RADIUS + 512
+
+
+class StreamingQuoteExtractor:
+    """
+    Extraction ciblée du prix, de la variation, du nom et de la market cap au fil du
+    téléchargement de la page: pas de parsing DOM, arrêt dès que tous les champs sont trouvés
+    """
+    
+    def __init__(self, ticker_symbol):
+        self.ticker_symbol = ticker_symbol
+        self.fields = {}
+        self.text = ''
+        self._scanned = 0
+        self._symbol_re = re.compile(r'\\?"symbol\\?":\s*\\?"' + re.escape(ticker_symbol) + r'\\?"')
+    
+    @property
+    def complete(self):
+        return all(field in self.fields for field in SCRAPING_FIELDS)
+    
+    def feed(self, chunk):
+        """Ajoute un morceau de page; retourne True quand tous les champs sont trouvés"""
+        self.text += chunk
+        start = max(self._scanned - _SCAN_OVERLAP, 0)
+        self._scan(self.text[start:])
+        self._scanned = len(self.text)
+        return self.complete
+    
+    def _scan(self, window):
+        # === TECHNIQUE 1: Balises fin-streamer du ticker ===
+        for match in _FIN_STREAMER_RE.finditer(window):
+            attrs = dict(_ATTR_RE.findall(match.group(0)))
+            symbol = attrs.get('data-symbol')
+            if symbol and symbol != self.ticker_symbol:
+                continue
+            field = {'regularMarketPrice': 'price', 'regularMarketChangePercent': 'change'}.get(attrs.get('data-field'))
+            if field and field not in self.fields:
+                self._set_number(field, attrs.get('value'))
+        
+        # === TECHNIQUE 2: JSON embarqué (quote) ===
+        # Recherche autour de "symbol":"<ticker>" pour ne pas prendre les données d'un autre ticker
+        anchors = list(self._symbol_re.finditer(window))
+        self._scan_json([window[max(m.start() - _QUOTE_RADIUS, 0):m.end() + _QUOTE_RADIUS] for m in anchors])
+    
+    def finish(self):
+        """Fin de page: si le symbole n'apparaît nulle part, recherche JSON sur toute la page"""
+        if not self.complete and not self._symbol_re.search(self.text):
+            self._scan_json([self.text])
+        return self.fields
+    
+    def _scan_json(self, regions):
+        for region in regions:
+            for field, pattern in _JSON_NUMBER_RE.items():
+                if field not in self.fields:
+                    match = pattern.search(region)
+                    if match:
+                        self._set_number(field, match.group(1))
+            
+            if 'name' not in self.fields:
+                match = _JSON_NAME_RE.search(region)
+                if match:
+                    self.fields['name'] = match.group(1).replace('\\', '')
+    
+    def _set_number(self, field, raw):
+        try:
+            self.fields[field] = float(raw)
+        except (TypeError, ValueError):
+            pass
+
+
+def extract_quote_soup(html, ticker_symbol):
+    """Dernier recours: parsing DOM complet (lent sur une page Yahoo de plusieurs centaines de Ko)"""
+    from bs4 import BeautifulSoup
+    
+    soup = BeautifulSoup(html, 'html.parser')
+    fields = {}
+    
+    price_tag = (
+        soup.find('fin-streamer', {'data-field': 'regularMarketPrice', 'data-symbol': ticker_symbol})
+        or soup.find('fin-streamer', {'data-field': 'regularMarketPrice'})
+    )
+    if not (price_tag and price_tag.get('value')):
+        price_tag = soup.find('fin-streamer', {'data-symbol': ticker_symbol})
+    if price_tag and price_tag.get('value'):
+        try:
+            fields['price'] = float(price_tag['value'])
+        except ValueError:
+            pass
+    
+    change_tag = (
+        soup.find('fin-streamer', {'data-field': 'regularMarketChangePercent', 'data-symbol': ticker_symbol})
+        or soup.find('fin-streamer', {'data-field': 'regularMarketChangePercent'})
+    )
+    if change_tag and change_tag.get('value'):
+        try:
+            fields['change'] = float(change_tag['value'])
+        except ValueError:
+            pass
+    
+    return fields
+
+
+def extract_quote(chunks, ticker_symbol):
+    """
+    Champs de cotation depuis une suite de morceaux de page (texte)
+    Chemin rapide en streaming, DOM complet seulement si aucun prix n'a été trouvé
+    """
+    extractor = StreamingQuoteExtractor(ticker_symbol)
+    # Temps d'analyse seul: l'itération sur `chunks` peut attendre le réseau
+    parse_time = 0.0
+    for chunk in chunks:
+        start = time.perf_counter()
+        complete = extractor.feed(chunk)
+        parse_time += time.perf_counter() - start
+        if complete:
+            break
+    
+    start = time.perf_counter()
+    fields = extractor.finish()
+    metrics.observe('html_parse_seconds', parse_time + time.perf_counter() - start, outcome='ok', parser='stream')
+    if not fields.get('price'):
+        with metrics.span('html_parse', parser='dom'):
+            soup_fields = extract_quote_soup(extractor.text, ticker_symbol)
+        fields = {**soup_fields, **{k: v for k, v in fields.items() if k != 'price'}}
+    return fields
+
+
+@rate_limited('yahoo')
+def fetch_via_scraping(ticker_symbol):
+    """
+    Méthode 3: Scraping direct du HTML Yahoo Finance
+    Lecture en streaming: la page n'est téléchargée que jusqu'aux champs utiles
+    """
+    try:
+        session = get_http_session()
+        url = f"https://finance.yahoo.com/quote/{ticker_symbol}"
+        
+        # Débit limité par la session (fournisseur "yahoo")
+        with session.get(url, timeout=10, stream=True) as response:
+            if response.status_code != 200:
+                return None
+            
+            response.encoding = response.encoding or 'utf-8'
+            fields = extract_quote(
+                response.iter_content(chunk_size=SCRAPING_CHUNK_SIZE, decode_unicode=True),
+                ticker_symbol
+            )
+        
+        price = fields.get('price')
+        
+        # Vérification finale
+        if not price or price <= 0:
+            return None
+        
+        change = fields.get('change', 0)
+        
+        return {
+            'ticker': ticker_symbol,
+            'name': fields.get('name') or ticker_symbol,
+            'current_price': price,
+            'history': pd.DataFrame(),  # Pas d'historique en scraping
+            'trend_6m': change * 10,  # Estimation approximative
+            'market_cap': fields.get('market_cap', 0),
+            'trailing_pe': 0,
+            'debt': 0,
+            'revenue_growth': 0,
+            'indicators': {},
+            'source': 'SCRAPING WEB (Mode Survie)'
+        }
+        
+    except Exception:
+        return None
+
+# ==================== MÉTHODE 4: ALPHA VANTAGE (BACKUP) ====================
+
+def fetch_via_alphavantage(ticker_symbol):
+    """
+    Méthode 4: API Alpha Vantage (gratuit, 5 req/min)
+    Nécessite une clé API gratuite: https://www.alphavantage.co/support/#api-key
+    """
+    api_key = get_secret("ALPHA_VANTAGE_KEY")
+    
+    if not api_key:
+        return None
+    
+    try:
+        response = get_http_session().get(
+            "https://www.alphavantage.co/query",
+            params={'function': 'GLOBAL_QUOTE', 'symbol': ticker_symbol, 'apikey': api_key},
+            timeout=10
+        )
+        data = response.json()
+        
+        quote = data.get('Global Quote', {})
+        
+        if not quote:
+            return None
+        
+        price = float(quote.get('05. price', 0))
+        
+        if price <= 0:
+            return None
+        
+        # Extraction du change percent
+        change_str = quote.get('10. change percent', '0%').replace('%', '')
+        try:
+            change_pct = float(change_str)
+        except:
+            change_pct = 0
+        
+        return {
+            'ticker': ticker_symbol,
+            'name': ticker_symbol,
+            'current_price': price,
+            'history': pd.DataFrame(),
+            'trend_6m': change_pct,
+            'market_cap': 0,
+            'trailing_pe': 0,
+            'debt': 0,
+            'revenue_growth': 0,
+            'indicators': {},
+            'source': 'ALPHA VANTAGE API'
+        }
+        
+    except Exception:
+        return None
+
+# ==================== ORCHESTRATEUR PRINCIPAL ====================
+
+FETCH_METHODS = [
+    ("📊 YFinance Download", fetch_via_yf_download),
+    ("📈 YFinance Ticker", fetch_via_yf_ticker),
+    ("🌐 Web Scraping", fetch_via_scraping),
+    ("🔑 Alpha Vantage", fetch_via_alphavantage),
+]
+
+# Sources sans historique ni fondamentaux: toujours essayées après les sources complètes
+DEGRADED_METHODS = {"🌐 Web Scraping", "🔑 Alpha Vantage"}
+
+# Mode par défaut: "sequential" (fallback une source après l'autre) ou "race"
+DEFAULT_FETCH_MODE = os.getenv("AI_HUNTER_FETCH_MODE", "sequential")
+# Délai (s) avant de lancer la source suivante en mode "race" (0 = tout en parallèle)
+DEFAULT_HEDGE_DELAY = float(os.getenv("AI_HUNTER_HEDGE_DELAY", "2.0"))
+
+
+def _is_valid_result(result):
+    return bool(result) and result.get('current_price', 0) > 0
+
+
+def _notify(on_status, level, message):
+    """Relaie un message de progression ('info', 'success', 'warning') si un callback est fourni"""
+    if on_status:
+        on_status(level, message)
+
+
+def _timed_call(method_name, method_func, ticker_symbol, health=None):
+    """
+    Exécute une méthode de fetch et mesure sa durée
+    Échec de la source: exception, ou aucun résultat avec une erreur de transport (réseau,
+    timeout, 429, 5xx) pendant l'appel. Aucun résultat sans erreur (ticker inconnu, pas de
+    données): 'empty', la source a répondu et n'est pas pénalisée
+    Le résultat est enregistré dans le suivi de santé des sources si fourni
+    """
+    session = get_http_session()
+    errors_before = session.provider_errors()
+    start = time.perf_counter()
+    with metrics.span('fetch_method', method=method_name) as span:
+        try:
+            result = method_func(ticker_symbol)
+            raised = False
+        except Exception:
+            result = None
+            raised = True
+        if _is_valid_result(result):
+            outcome = 'ok'
+        elif raised or session.provider_errors() > errors_before:
+            outcome = 'fail'
+        else:
+            outcome = 'empty'
+        span['outcome'] = outcome
+    elapsed = time.perf_counter() - start
+    if health is not None:
+        health.record(method_name, {'ok': True, 'fail': False, 'empty': None}[outcome], elapsed)
+    return result, elapsed
+
+
+class ProviderHealth:
+    """
+    Santé de chaque source de données:
+    - taux de succès et latence moyenne sur les `window` derniers appels
+    - circuit breaker: ouvert après `failure_threshold` échecs consécutifs, la source est
+      ignorée pendant `cooldown` s, puis un seul essai à la fois est autorisé (semi-ouvert):
+      les autres appelants la voient ouverte jusqu'au résultat de l'essai (ou `probe_timeout` s)
+    """
+    
+    def __init__(self, window=20, failure_threshold=5, cooldown=300, probe_timeout=60):
+        self.window = window
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.probe_timeout = probe_timeout
+        self._lock = threading.Lock()
+        self._providers = {}
+    
+    def _state(self, name):
+        # Appelé sous self._lock
+        if name not in self._providers:
+            self._providers[name] = {
+                'outcomes': deque(maxlen=self.window),
+                'latencies': deque(maxlen=self.window),
+                'consecutive_failures': 0,
+                'opened_at': None,
+                'probe_until': None,
+                'trips': 0,
+            }
+        return self._providers[name]
+    
+    def record(self, name, success, elapsed):
+        """
+        Résultat d'un appel: True (données), False (panne de la source)
+        ou None (réponse sans données: ni succès ni échec, mais la source répond)
+        """
+        with self._lock:
+            state = self._state(name)
+            state['probe_until'] = None
+            if success is None:
+                state['consecutive_failures'] = 0
+                state['opened_at'] = None
+                return
+            state['outcomes'].append(success)
+            if success:
+                state['latencies'].append(elapsed)
+                state['consecutive_failures'] = 0
+                state['opened_at'] = None
+            else:
+                state['consecutive_failures'] += 1
+                if state['consecutive_failures'] >= self.failure_threshold:
+                    # Ouverture (ou ré-ouverture après un essai semi-ouvert raté)
+                    if state['opened_at'] is None:
+                        state['trips'] += 1
+                        metrics.inc('circuit_breaker_trips', source=name)
+                    state['opened_at'] = time.monotonic()
+    
+    def circuit(self, name):
+        """'closed', 'open' ou 'half-open' (lecture seule: pour appeler la source, voir acquire)"""
+        with self._lock:
+            opened_at = self._state(name)['opened_at']
+        if opened_at is None:
+            return 'closed'
+        return 'open' if time.monotonic() - opened_at < self.cooldown else 'half-open'
+    
+    def acquire(self, name):
+        """
+        La source peut-elle être appelée ? Circuit fermé: oui, ouvert: non
+        Semi-ouvert: oui pour un seul appelant (l'essai), réservé jusqu'à record / release
+        ou `probe_timeout` s; non pour les autres
+        """
+        with self._lock:
+            state = self._state(name)
+            if state['opened_at'] is None:
+                return True
+            now = time.monotonic()
+            if now - state['opened_at'] < self.cooldown:
+                return False
+            if state['probe_until'] is not None and now < state['probe_until']:
+                return False
+            state['probe_until'] = now + self.probe_timeout
+            return True
+    
+    def release(self, name):
+        """Libère un essai semi-ouvert réservé mais jamais lancé (une autre source a répondu avant)"""
+        with self._lock:
+            self._state(name)['probe_until'] = None
+    
+    def expected_latency(self, name):
+        """Latence moyenne des succès divisée par le taux de succès (0 si jamais essayée)"""
+        with self._lock:
+            state = self._state(name)
+            if not state['outcomes']:
+                return 0.0
+            success_rate = sum(state['outcomes']) / len(state['outcomes'])
+            latencies = list(state['latencies'])
+        if not latencies:
+            return float('inf')
+        return (sum(latencies) / len(latencies)) / success_rate
+    
+    def plan(self, methods):
+        """
+        Ordre d'essai: sources au circuit ouvert (ou dont l'essai semi-ouvert est déjà en cours)
+        retirées, les autres triées par latence attendue (les sources dégradées restent après
+        les sources complètes). Les essais semi-ouverts réservés ici sont à libérer s'ils ne sont
+        pas lancés (voir release)
+        Retourne (méthodes à essayer, noms ignorés); tout coupé: aucune méthode
+        """
+        allowed = {n: self.acquire(n) for n, _ in methods}
+        available = [(n, f) for n, f in methods if allowed[n]]
+        skipped = [n for n, _ in methods if not allowed[n]]
+        available.sort(key=lambda m: (m[0] in DEGRADED_METHODS, self.expected_latency(m[0])))
+        return available, skipped
+    
+    def snapshot(self):
+        """État de chaque source pour l'affichage"""
+        with self._lock:
+            names = list(self._providers)
+        rows = []
+        for name in names:
+            with self._lock:
+                state = self._providers[name]
+                outcomes = list(state['outcomes'])
+                latencies = list(state['latencies'])
+                opened_at = state['opened_at']
+                failures = state['consecutive_failures']
+                trips = state['trips']
+            circuit = self.circuit(name)
+            rows.append({
+                'Source': name,
+                'Circuit': {'closed': '🟢 fermé', 'open': '🔴 ouvert', 'half-open': '🟡 semi-ouvert'}[circuit],
+                'Succès (%)': round(100 * sum(outcomes) / len(outcomes)) if outcomes else None,
+                'Latence moy. (s)': round(sum(latencies) / len(latencies), 2) if latencies else None,
+                'Échecs consécutifs': failures,
+                'Coupures': trips,
+                'Réouverture dans (s)': round(self.cooldown - (time.monotonic() - opened_at)) if circuit == 'open' else None,
+            })
+        return rows
+
+
+@singleton
+def get_provider_health():
+    return ProviderHealth(
+        failure_threshold=int(os.getenv("AI_HUNTER_BREAKER_THRESHOLD", "5")),
+        cooldown=float(os.getenv("AI_HUNTER_BREAKER_COOLDOWN", "300"))
+    )
+
+
+def fetch_sequential(ticker_symbol, methods=FETCH_METHODS, on_status=None, health=None):
+    """
+    Essaie les sources une par une, dans l'ordre
+    Retourne (résultat ou None, rapport)
+    """
+    report = {'mode': 'sequential', 'winner': None, 'timings': {}}
+    
+    for i, (method_name, method_func) in enumerate(methods, 1):
+        _notify(on_status, 'info', f"Tentative {i}/{len(methods)}: {method_name}...")
+        
+        result, elapsed = _timed_call(method_name, method_func, ticker_symbol, health)
+        
+        if _is_valid_result(result):
+            report['timings'][method_name] = {'status': 'win', 'elapsed': elapsed}
+            report['winner'] = method_name
+            _notify(on_status, 'success', f"✅ {method_name} - Succès!")
+            return result, report
+        
+        report['timings'][method_name] = {'status': 'fail', 'elapsed': elapsed}
+        _notify(on_status, 'warning', f"⚠️ {method_name} - Échec")
+    
+    return None, report
+
+
+def fetch_racing(ticker_symbol, methods=FETCH_METHODS, hedge_delay=DEFAULT_HEDGE_DELAY, on_status=None, health=None):
+    """
+    Mode "hedged": lance les sources en parallèle
+    - hedge_delay = 0: toutes les sources partent en même temps
+    - hedge_delay > 0: la source suivante part si aucune réponse valide après ce délai
+      (ou immédiatement si toutes les sources en cours ont échoué)
+    La première réponse valide gagne, les autres sont annulées ou ignorées.
+    Retourne (résultat ou None, rapport)
+    """
+    report = {'mode': 'race', 'winner': None, 'timings': {}}
+    executor = ThreadPoolExecutor(max_workers=len(methods), thread_name_prefix="fetch-race")
+    race_start = time.perf_counter()
+    running = {}
+    next_index = 0
+    winner = None
+    
+    def launch_next():
+        nonlocal next_index
+        method_name, method_func = methods[next_index]
+        next_index += 1
+        _notify(on_status, 'info', f"Lancement {next_index}/{len(methods)}: {method_name}...")
+        future = executor.submit(_timed_call, method_name, method_func, ticker_symbol, health)
+        running[future] = method_name
+    
+    try:
+        launch_next()
+        if hedge_delay <= 0:
+            while next_index < len(methods):
+                launch_next()
+        
+        while running and winner is None:
+            timeout = hedge_delay if next_index < len(methods) else None
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            failed = False
+            
+            for future in done:
+                method_name = running.pop(future)
+                result, elapsed = future.result()
+                
+                if winner is None and _is_valid_result(result):
+                    winner = result
+                    report['winner'] = method_name
+                    report['timings'][method_name] = {'status': 'win', 'elapsed': elapsed}
+                    _notify(on_status, 'success', f"✅ {method_name} - Succès!")
+                else:
+                    report['timings'][method_name] = {'status': 'fail', 'elapsed': elapsed}
+                    _notify(on_status, 'warning', f"⚠️ {method_name} - Échec")
+                    failed = True
+            
+            # Délai de hedge écoulé ou source en échec: on lance la source suivante
+            if winner is None and next_index < len(methods) and (not done or failed):
+                launch_next()
+    finally:
+        # Les sources encore en cours sont abandonnées (résultat ignoré)
+        abandoned_at = time.perf_counter() - race_start
+        for future, method_name in running.items():
+            future.cancel()
+            report['timings'][method_name] = {'status': 'abandoned', 'elapsed': abandoned_at}
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    for method_name, _ in methods[next_index:]:
+        report['timings'][method_name] = {'status': 'not_started', 'elapsed': 0.0}
+    
+    return winner, report
+
+
+def fetch_stock_data(ticker_symbol, mode=DEFAULT_FETCH_MODE, hedge_delay=DEFAULT_HEDGE_DELAY, on_status=None,
+                     period=DEFAULT_HISTORY_PERIOD, interval=DEFAULT_HISTORY_INTERVAL, with_fundamentals=True):
+    """
+    Orchestrateur intelligent avec 4 méthodes de fallback (sans cache ni UI)
+    - mode "sequential": une source après l'autre
+    - mode "race": sources en parallèle / décalées (voir fetch_racing)
+    - period / interval: fenêtre d'historique des sources yfinance (voir HISTORY_RANGES)
+    - with_fundamentals: fondamentaux (cache journalier) récupérés en parallèle des prix puis
+      fusionnés; False: prix seuls, à compléter par l'appelant (prefetch_fundamentals)
+    Appels concurrents pour le même ticker et la même fenêtre: un seul téléchargement,
+    dont le résultat est partagé (la progression n'est relayée qu'au premier appelant)
+    Retourne les données (avec 'fetch_report': source gagnante + durée par source) ou None
+    """
+    fundamentals = prefetch_fundamentals(ticker_symbol) if with_fundamentals else None
+    data = get_inflight('fetch_quote').do(
+        (ticker_symbol, period, interval),
+        lambda: _fetch_stock_data(ticker_symbol, mode, hedge_delay, on_status, period, interval)
+    )
+    if data is None or fundamentals is None:
+        return data
+    try:
+        return merge_fundamentals(data, fundamentals.result(timeout=FUNDAMENTALS_TIMEOUT))
+    except Exception:
+        # Fondamentaux trop lents ou en échec: les prix restent utilisables
+        return data
+
+
+def _fetch_stock_data(ticker_symbol, mode, hedge_delay, on_status, period, interval):
+    # Sources au circuit ouvert ignorées, les autres par latence attendue
+    health = get_provider_health()
+    methods, skipped = health.plan(FETCH_METHODS)
+    # Les sources dégradées n'ont pas d'historique: seule la fenêtre des sources yfinance change
+    methods = [
+        (name, func if name in DEGRADED_METHODS else functools.partial(func, period=period, interval=interval))
+        for name, func in methods
+    ]
+    for method_name in skipped:
+        metrics.inc('circuit_breaker_skips', source=method_name)
+        _notify(on_status, 'warning', f"⛔ {method_name} - Circuit ouvert, ignorée")
+    if not methods:
+        # Toutes les sources coupées: échec immédiat plutôt qu'une rafale vers des sources en panne
+        return None
+    
+    with metrics.span('fetch_quote', mode=mode) as span:
+        if mode == "race":
+            result, report = fetch_racing(ticker_symbol, methods, hedge_delay, on_status=on_status, health=health)
+        else:
+            result, report = fetch_sequential(ticker_symbol, methods, on_status=on_status, health=health)
+        span['outcome'] = 'ok' if result is not None else 'fail'
+    
+    for method_name in skipped:
+        report['timings'][method_name] = {'status': 'circuit_open', 'elapsed': 0.0}
+    # Sources jamais lancées (une autre a répondu avant): essai semi-ouvert éventuel libéré
+    for method_name, _ in methods:
+        if report['timings'].get(method_name, {}).get('status', 'not_started') == 'not_started':
+            health.release(method_name)
+    
+    if result is None:
+        # Toutes les méthodes ont échoué
+        return None
+    
+    result['fetch_report'] = report
+    return result
+
+
+# ==================== CACHE DES COTATIONS (COMPACT) ====================
+
+# Durée de vie (s) et nombre max de cotations gardées en mémoire pour tout le process
+QUOTE_CACHE_TTL = float(os.getenv("AI_HUNTER_QUOTE_CACHE_TTL", "1800"))
+QUOTE_CACHE_SIZE = int(os.getenv("AI_HUNTER_QUOTE_CACHE_SIZE", "1000"))
+
+SECONDS_PER_DAY = 86400
+
+# Bougies max envoyées au navigateur (~3 px par bougie sur un graphique pleine largeur)
+CHART_MAX_BARS = int(os.getenv("AI_HUNTER_CHART_MAX_BARS", "400"))
+
+
+def decimation_groups(length, max_bars):
+    """
+    Découpe `length` barres consécutives en au plus `max_bars` paquets de taille égale
+    Retourne (première ligne, dernière ligne) de chaque paquet
+    """
+    step = max(-(-length // max_bars), 1)
+    starts = np.arange(0, length, step)
+    return starts, np.append(starts[1:], length)[:len(starts)] - 1
+
+
+class CompactHistory:
+    """
+    Historique OHLCV compact et immuable
+    - index: jours epoch (int32) pour les barres journalières, secondes epoch (int64) sinon
+    - OHLC en float32 dans un seul bloc contigu (n x 4), volume en int64
+    Tableaux en lecture seule: partagé sans copie entre lectures, DataFrame construit
+    seulement à l'affichage (to_frame)
+    """
+    __slots__ = ('times', 'ohlc', 'volume', 'unit')
+    
+    COLUMNS = ('Open', 'High', 'Low', 'Close')
+    
+    def __init__(self, times, ohlc, volume, unit='D'):
+        for array in (times, ohlc, volume):
+            array.flags.writeable = False
+        self.times = times
+        self.ohlc = ohlc
+        self.volume = volume
+        self.unit = unit
+    
+    @classmethod
+    def from_frame(cls, df):
+        if df is None or df.empty:
+            return EMPTY_HISTORY
+        if isinstance(df.columns, pd.MultiIndex):
+            df = df.copy()
+            df.columns = df.columns.get_level_values(0)
+        
+        index = pd.DatetimeIndex(df.index)
+        if index.tz is not None:
+            index = index.tz_convert('UTC').tz_localize(None)
+        seconds = np.asarray((index - pd.Timestamp(0)) // pd.Timedelta(seconds=1), dtype=np.int64)
+        if (seconds % SECONDS_PER_DAY == 0).all():
+            times, unit = (seconds // SECONDS_PER_DAY).astype(np.int32), 'D'
+        else:
+            times, unit = seconds, 's'
+        
+        close = df['Close'].to_numpy(dtype=np.float64, na_value=np.nan)
+        ohlc = np.empty((len(df), 4), dtype=np.float32)
+        for i, column in enumerate(cls.COLUMNS):
+            ohlc[:, i] = df[column].to_numpy(dtype=np.float64, na_value=np.nan) if column in df.columns else close
+        volume = (
+            df['Volume'].fillna(0).to_numpy(dtype=np.float64).astype(np.int64)
+            if 'Volume' in df.columns else np.zeros(len(df), dtype=np.int64)
+        )
+        return cls(times, ohlc, volume, unit)
+    
+    def __len__(self):
+        return len(self.times)
+    
+    @property
+    def empty(self):
+        return len(self.times) == 0
+    
+    @property
+    def nbytes(self):
+        return self.times.nbytes + self.ohlc.nbytes + self.volume.nbytes
+    
+    def index(self):
+        return pd.to_datetime(self.times.astype(np.int64) * self._scale(), unit='s')
+    
+    def _scale(self):
+        return SECONDS_PER_DAY if self.unit == 'D' else 1
+    
+    def bounds(self, start=None, end=None):
+        """Lignes [début, fin) des barres datées entre `start` et `end` (inclus)"""
+        step = pd.Timedelta(seconds=self._scale())
+        lo, hi = 0, len(self)
+        if start is not None:
+            lo = int(np.searchsorted(self.times, (pd.Timestamp(start) - pd.Timestamp(0)) // step, side='left'))
+        if end is not None:
+            hi = int(np.searchsorted(self.times, (pd.Timestamp(end) - pd.Timestamp(0)) // step, side='right'))
+        return lo, max(hi, lo)
+    
+    def rows(self, lo, hi):
+        """Historique restreint aux lignes [lo, hi): vues des tableaux, sans copie"""
+        if lo == 0 and hi >= len(self):
+            return self
+        return CompactHistory(self.times[lo:hi], self.ohlc[lo:hi], self.volume[lo:hi], self.unit)
+    
+    def decimate(self, max_bars=CHART_MAX_BARS):
+        """
+        Au plus `max_bars` bougies en regroupant les barres consécutives (voir decimation_groups)
+        OHLC conservé: ouverture de la première barre, plus haut / plus bas du paquet,
+        clôture de la dernière; volumes additionnés. Historique inchangé s'il tient déjà
+        """
+        if len(self) <= max_bars:
+            return self
+        starts, ends = decimation_groups(len(self), max_bars)
+        ohlc = np.empty((len(starts), 4), dtype=np.float32)
+        ohlc[:, 0] = self.ohlc[starts, 0]
+        ohlc[:, 1] = np.fmax.reduceat(self.ohlc[:, 1], starts)
+        ohlc[:, 2] = np.fmin.reduceat(self.ohlc[:, 2], starts)
+        ohlc[:, 3] = self.ohlc[ends, 3]
+        return CompactHistory(self.times[starts], ohlc, np.add.reduceat(self.volume, starts), self.unit)
+    
+    def to_frame(self):
+        """DataFrame OHLCV (float32 / int64), construit à la demande"""
+        frame = pd.DataFrame(self.ohlc, index=self.index(), columns=list(self.COLUMNS))
+        frame['Volume'] = self.volume
+        frame.index.name = 'Date'
+        return frame
+
+
+EMPTY_HISTORY = CompactHistory(np.empty(0, dtype=np.int32), np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.int64))
+
+
+class QuoteSnapshot:
+    """
+    Cotation en cache: scalaires dans des slots (pas de __dict__) + historique compact
+    Lecture façon dict (data['ticker'], data.get('trailing_pe', 0)) comme les dicts du moteur
+    """
+    __slots__ = (
+        'ticker', 'name', 'current_price', 'trend_6m', 'market_cap', 'trailing_pe',
+        'debt', 'revenue_growth', 'source', 'indicators', 'fetch_report', 'history',
+    )
+    
+    @classmethod
+    def from_data(cls, data):
+        if isinstance(data, QuoteSnapshot):
+            return data
+        snapshot = cls()
+        for field in cls.__slots__:
+            setattr(snapshot, field, data.get(field))
+        snapshot.indicators = dict(data.get('indicators') or {})
+        snapshot.history = CompactHistory.from_frame(data.get('history'))
+        return snapshot
+    
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+    
+    def __contains__(self, key):
+        return key in self.__slots__ and getattr(self, key, None) is not None
+    
+    def get(self, key, default=None):
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        return default if value is None else value
+    
+    def with_fields(self, fields):
+        """Copie avec certains scalaires remplacés (historique et indicateurs partagés, sans copie)"""
+        snapshot = QuoteSnapshot()
+        for field in self.__slots__:
+            setattr(snapshot, field, fields.get(field, getattr(self, field, None)))
+        return snapshot
+    
+    def to_dict(self):
+        """Dict au format du moteur (historique redevenu DataFrame)"""
+        data = {field: getattr(self, field, None) for field in self.__slots__}
+        data['history'] = self.history.to_frame()
+        return data
+    
+    @property
+    def nbytes(self):
+        """Empreinte approximative: objet, scalaires, indicateurs et historique"""
+        size = sys.getsizeof(self) + self.history.nbytes
+        size += sum(sys.getsizeof(getattr(self, f, None)) for f in self.__slots__ if f not in ('history', 'indicators'))
+        size += sys.getsizeof(self.indicators) + sum(sys.getsizeof(v) for v in self.indicators.values())
+        return size
+
+
+def data_nbytes(data):
+    """Empreinte d'un dict de données du moteur (DataFrame pandas en profondeur)"""
+    size = sys.getsizeof(data)
+    for key, value in data.items():
+        if isinstance(value, pd.DataFrame):
+            size += int(value.memory_usage(deep=True).sum())
+        elif isinstance(value, dict):
+            size += sys.getsizeof(value) + sum(sys.getsizeof(v) for v in value.values())
+        else:
+            size += sys.getsizeof(value)
+    return size
+
+
+class QuoteCache:
+    """
+    Cotations récentes partagées par tout le process (sessions, screener, watchlist)
+    Stockées en QuoteSnapshot: une lecture renvoie le même objet, sans pickle ni copie
+    (contrairement à st.cache_data qui désérialise une copie complète à chaque lecture)
+    """
+    
+    def __init__(self, ttl=QUOTE_CACHE_TTL, max_entries=QUOTE_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (stored_at, snapshot, taille du dict d'origine)
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+    
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry[0] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                metrics.inc('quote_cache_lookups', result='hit')
+                return entry[1]
+            if entry:
+                del self._entries[key]
+            self.stats['misses'] += 1
+        metrics.inc('quote_cache_lookups', result='miss')
+        return None
+    
+    def put(self, key, data):
+        """Convertit (si besoin) et stocke; retourne le QuoteSnapshot"""
+        original_bytes = data_nbytes(data) if isinstance(data, dict) else None
+        snapshot = QuoteSnapshot.from_data(data)
+        with self._lock:
+            self._entries[key] = (time.time(), snapshot, original_bytes)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+        return snapshot
+    
+    def age(self, key):
+        """Âge (s) de l'entrée, None si absente (expirée ou non)"""
+        with self._lock:
+            entry = self._entries.get(key)
+        return time.time() - entry[0] if entry else None
+    
+    def get_or_fetch(self, key, fetch):
+        """
+        Valeur en cache, sinon `fetch()` (les échecs, None, ne sont pas mis en cache)
+        Les appelants concurrents sur une même clé absente attendent un seul `fetch()`
+        """
+        snapshot = self.get(key)
+        if snapshot is None:
+            snapshot = get_inflight('quote_cache').do(key, lambda: self._fetch_and_put(key, fetch))
+        return snapshot
+    
+    def _fetch_and_put(self, key, fetch):
+        data = fetch()
+        return self.put(key, data) if data else None
+    
+    def memory_report(self):
+        """Par entrée: barres, taille du dict d'origine (DataFrame) et taille compacte"""
+        with self._lock:
+            entries = list(self._entries.items())
+        return [
+            {
+                'Clé': " / ".join(str(part) for part in (key if isinstance(key, tuple) else (key,))),
+                'Barres': len(snapshot.history),
+                'DataFrame (Ko)': round(original / 1024, 1) if original else None,
+                'Compact (Ko)': round(snapshot.nbytes / 1024, 1),
+            }
+            for key, (_, snapshot, original) in entries
+        ]
+    
+    def snapshot_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._entries)
+            stats['compact_bytes'] = sum(entry[1].nbytes for entry in self._entries.values())
+            stats['original_bytes'] = sum(entry[2] or 0 for entry in self._entries.values())
+        return stats
+
+
+def quote_cache_key(ticker_symbol, period=DEFAULT_HISTORY_PERIOD, interval=DEFAULT_HISTORY_INTERVAL):
+    """Clé d'une cotation complète: une entrée par fenêtre d'historique"""
+    return ('quote', ticker_symbol, period, interval)
+
+
+@singleton
+def get_quote_cache():
+    return QuoteCache()
+
+# ==================== MODE WATCHLIST (BATCH) ====================
+
+# Nombre de tickers par appel yf.download
+WATCHLIST_BATCH_SIZE = int(os.getenv("AI_HUNTER_WATCHLIST_BATCH_SIZE", "100"))
+
+
+def parse_tickers(text):
+    """Liste de tickers depuis un texte libre (virgules, espaces, retours à la ligne), sans doublons"""
+    tickers = [t.strip().upper() for t in re.split(r'[\s,;]+', text or '')]
+    return list(dict.fromkeys(t for t in tickers if t))
+
+
+def _split_batch_download(df, tickers):
+    """Découpe le résultat d'un yf.download multi-tickers (group_by='ticker') en un historique par ticker"""
+    if df is None or df.empty:
+        return {}
+    if not isinstance(df.columns, pd.MultiIndex):
+        return {tickers[0]: df} if len(tickers) == 1 else {}
+    available = set(df.columns.get_level_values(0))
+    return {t: df[t] for t in tickers if t in available}
+
+
+def fetch_histories_batch(tickers, period=DEFAULT_HISTORY_PERIOD, interval=DEFAULT_HISTORY_INTERVAL,
+                          batch_size=WATCHLIST_BATCH_SIZE, allow_stale=False):
+    """
+    Historiques de plusieurs tickers en quelques appels yf.download groupés
+    Comme fetch_history_incremental: les tickers déjà stockés ne récupèrent que le delta,
+    et ceux dont le téléchargement a échoué sont absents (sauf `allow_stale`)
+    Retourne {ticker: DataFrame} (tickers sans données absents)
+    """
+    import yfinance as yf
+    
+    store = get_ohlcv_store()
+    window_start = period_start(period)
+    
+    # Séparation: téléchargement complet vs delta depuis la plus ancienne dernière date
+    full, delta = [], []
+    delta_start = None
+    for ticker in tickers:
+        first, last = store.bounds(ticker, interval)
+        if not covers_window(first, last, window_start):
+            full.append(ticker)
+        else:
+            delta.append(ticker)
+            delta_start = last if delta_start is None else min(delta_start, last)
+    
+    def download(group, range_kwargs):
+        for i in range(0, len(group), batch_size):
+            batch = group[i:i + batch_size]
+            try:
+                with metrics.span('yf_batch_download'):
+                    df = yf.download(
+                        batch,
+                        interval=interval,
+                        group_by='ticker',
+                        progress=False,
+                        timeout=10,
+                        threads=True,
+                        session=get_http_session(),
+                        **range_kwargs
+                    )
+            except Exception:
+                continue
+            for ticker, ticker_df in _split_batch_download(df, batch).items():
+                # Ticker en échec dans un lot: colonnes entièrement NaN
+                if not ticker_df.dropna(how='all').empty:
+                    yield ticker, ticker_df
+    
+    fresh = set()
+    for ticker, ticker_df in download(full, {'period': period}):
+        store.append(ticker, interval, ticker_df)
+        fresh.add(ticker)
+    
+    # Delta: tickers dont la base d'ajustement a changé (dividende, split) re-téléchargés en entier
+    rebase = []
+    if delta:
+        for ticker, ticker_df in download(delta, {'start': (delta_start - REBASE_LOOKBACK).strftime('%Y-%m-%d')}):
+            if store.same_basis(ticker, interval, ticker_df):
+                store.append(ticker, interval, ticker_df)
+                fresh.add(ticker)
+            else:
+                rebase.append(ticker)
+    if rebase:
+        metrics.inc('ohlcv_store_requests', len(rebase), kind='rebase')
+        for ticker, ticker_df in download(rebase, {'period': period}):
+            store.append(ticker, interval, ticker_df, replace_all=True)
+            fresh.add(ticker)
+    
+    failed = len(tickers) - len(fresh)
+    if failed:
+        metrics.inc('ohlcv_store_requests', failed, kind='failed')
+    histories = {}
+    for ticker in tickers:
+        if ticker not in fresh and not allow_stale:
+            continue
+        df = store.load(ticker, interval, start=window_start)
+        if not df.empty:
+            histories[ticker] = df
+    return histories
+
+
+def fetch_watchlist(tickers, with_info=True, period=DEFAULT_HISTORY_PERIOD, interval=DEFAULT_HISTORY_INTERVAL):
+    """
+    Données de toute une watchlist: historiques groupés + fondamentaux optionnels
+    Retourne {ticker: dict de données} au même format que fetch_stock_data
+    """
+    histories = fetch_histories_batch(list(tickers), period, interval)
+    infos = get_fundamentals_batch(list(histories)) if with_info else {}
+    # Indicateurs de toute la watchlist en un seul passage vectorisé
+    snapshots = indicators.snapshots_for_histories(histories)
+    
+    results = {}
+    for ticker, df in histories.items():
+        data = build_stock_data(ticker, df, infos.get(ticker, {}), 'API YFINANCE (batch)', snapshots.get(ticker, {}))
+        if data:
+            results[ticker] = data
+    return results
+
+
+def summarize_watchlist(results):
+    """
+    Tableau récapitulatif (prix, tendance 6 mois, PE, market cap) d'une watchlist
+    + score local 0-100 de chaque persona (voir scoring), calculé en un seul passage
+    """
+    rows = [
+        {
+            'Ticker': data['ticker'],
+            'Nom': data['name'],
+            'Prix ($)': round(data['current_price'], 2),
+            'Trend 6M (%)': round(data.get('trend_6m', 0), 1),
+            'PE': round(data['trailing_pe'], 1) if data.get('trailing_pe') else None,
+            'Market Cap ($B)': round(data['market_cap'] / 1e9, 1) if data.get('market_cap') else None,
+            'RSI 14': _round_or_none(data.get('indicators', {}).get('rsi_14'), 0),
+            'Vol 20j (%)': _round_or_none(data.get('indicators', {}).get('volatility_20'), 1),
+            'Max DD (%)': _round_or_none(data.get('indicators', {}).get('max_drawdown'), 1),
+        }
+        for data in results.values()
+    ]
+    summary = pd.DataFrame(rows, columns=[
+        'Ticker', 'Nom', 'Prix ($)', 'Trend 6M (%)', 'PE', 'Market Cap ($B)', 'RSI 14', 'Vol 20j (%)', 'Max DD (%)'
+    ])
+    if results:
+        _, _, scores = scoring.score_records(results, PERSONAS)
+        for persona in PERSONAS:
+            summary[f"{persona} (local)"] = scores[persona].to_numpy()
+    return summary
+
+
+def _round_or_none(value, digits):
+    return round(value, digits) if value is not None else None
+
+# ==================== SNAPSHOT MACRO ====================
+
+# Symboles du bandeau: symbole yfinance -> libellé
+MACRO_SYMBOLS = {'^GSPC': 'S&P500', 'BTC-USD': 'BTC', '^VIX': 'VIX'}
+# Période de rafraîchissement en arrière-plan (s); au-delà de 3 périodes sans succès, valeurs périmées
+MACRO_REFRESH_INTERVAL = float(os.getenv("AI_HUNTER_MACRO_REFRESH", "60"))
+MACRO_STALE_AFTER = 3 * MACRO_REFRESH_INTERVAL
+
+
+class MacroSnapshot:
+    """
+    Cotations macro partagées par tout le process, rafraîchies par un thread de fond
+    (un seul yf.download groupé par rafraîchissement, quel que soit le nombre de sessions)
+    Les lectures ne bloquent jamais: dernières valeurs connues + leur âge, même après un échec
+    """
+    
+    def __init__(self, symbols=MACRO_SYMBOLS, interval=MACRO_REFRESH_INTERVAL):
+        self.symbols = dict(symbols)
+        self.interval = interval
+        self._values = {}  # symbole -> {'price', 'change_pct'}
+        self._updated_at = None
+        self._last_error = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="macro-refresh", daemon=True)
+            self._thread.start()
+        return self
+    
+    def stop(self):
+        self._stop.set()
+    
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.interval)
+    
+    def refresh(self):
+        """Un rafraîchissement; en cas d'échec les valeurs précédentes sont conservées"""
+        import yfinance as yf
+        
+        with metrics.span('macro_refresh') as span:
+            try:
+                df = yf.download(
+                    list(self.symbols),
+                    period="5d",
+                    interval="1d",
+                    group_by='ticker',
+                    progress=False,
+                    timeout=10,
+                    threads=False,
+                    session=get_http_session()
+                )
+                values = {}
+                for symbol, symbol_df in _split_batch_download(df, list(self.symbols)).items():
+                    close = symbol_df['Close'].dropna()
+                    if close.empty:
+                        continue
+                    previous = float(close.iloc[-2]) if len(close) > 1 else None
+                    values[symbol] = {
+                        'price': float(close.iloc[-1]),
+                        'change_pct': (float(close.iloc[-1]) / previous - 1) * 100 if previous else None,
+                    }
+                if not values:
+                    raise ValueError("aucune cotation reçue")
+            except Exception as e:
+                span['outcome'] = 'fail'
+                with self._lock:
+                    self._last_error = str(e)[:80]
+                return False
+        
+        with self._lock:
+            # Symbole absent de cette réponse: sa dernière valeur connue est gardée
+            self._values.update(values)
+            self._updated_at = time.time()
+            self._last_error = None
+        return True
+    
+    def snapshot(self):
+        """
+        Lecture instantanée: {'values': {symbole: {...}}, 'age': s depuis le dernier succès (ou None),
+        'stale': bool, 'error': dernier échec (ou None)}
+        """
+        with self._lock:
+            values = {symbol: dict(value) for symbol, value in self._values.items()}
+            updated_at, error = self._updated_at, self._last_error
+        age = time.time() - updated_at if updated_at else None
+        return {
+            'values': values,
+            'age': age,
+            'stale': age is None or age > MACRO_STALE_AFTER or error is not None,
+            'error': error,
+        }
+
+
+@singleton
+def get_macro_snapshot():
+    """Snapshot macro du process, thread de rafraîchissement démarré au premier appel"""
+    return MacroSnapshot().start()
+
+# ==================== PRÉCHAUFFAGE DU CACHE ====================
+
+# Tickers gardés au chaud dans le cache des cotations (vide = préchauffage désactivé)
+WARM_TICKERS = parse_tickers(os.getenv("AI_HUNTER_WARM_TICKERS", ""))
+# Rafraîchissement quand l'entrée atteint cette fraction de sa durée de vie (avant expiration)
+WARM_REFRESH_AT = float(os.getenv("AI_HUNTER_WARM_REFRESH_AT", "0.75"))
+# Échéances avancées d'un délai aléatoire (fraction du TTL) pour ne pas rafraîchir tout en même temps
+WARM_JITTER = float(os.getenv("AI_HUNTER_WARM_JITTER", "0.1"))
+# Premier passage au démarrage étalé sur cette durée (s)
+WARM_STARTUP_SPREAD = float(os.getenv("AI_HUNTER_WARM_STARTUP_SPREAD", "60"))
+# Part de la rafale Yahoo qui doit être disponible avant un rafraîchissement (priorité aux utilisateurs)
+WARM_MIN_HEADROOM = float(os.getenv("AI_HUNTER_WARM_MIN_HEADROOM", "0.5"))
+# Nouvelle tentative après un échec (s); l'entrée existante reste servie jusqu'à son expiration
+WARM_RETRY_DELAY = 300.0
+WARM_DEFER_DELAY = 2.0
+
+
+class CacheWarmer:
+    """
+    Garde des tickers populaires au chaud (façon stale-while-revalidate): chaque entrée est
+    re-téléchargée en arrière-plan avant d'expirer, pendant que l'ancienne reste servie
+    - un seul rafraîchissement à la fois, lancé seulement si le seau Yahoo a de la réserve
+    - échéances étalées (démarrage réparti + gigue) pour éviter les rafales
+    - une entrée rafraîchie entre-temps par un utilisateur repousse simplement l'échéance
+    """
+    
+    def __init__(self, tickers, cache=None, refresh_at=WARM_REFRESH_AT, jitter=WARM_JITTER,
+                 startup_spread=WARM_STARTUP_SPREAD, min_headroom=WARM_MIN_HEADROOM, rate_limiter=None):
+        self.tickers = list(tickers)
+        self.cache = cache or get_quote_cache()
+        self.refresh_at = refresh_at
+        self.jitter = jitter
+        self.startup_spread = startup_spread
+        self.min_headroom = min_headroom
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self._heap = []  # (échéance epoch, ticker)
+        self._status = {ticker: {'due': None, 'last_refresh': None, 'outcome': None} for ticker in self.tickers}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._random = random.Random()
+        self._thread = None
+    
+    def start(self):
+        if self._thread is None:
+            now = time.time()
+            for i, ticker in enumerate(self.tickers):
+                self._schedule(ticker, now + self.startup_spread * (i + self._random.random()) / len(self.tickers))
+            self._thread = threading.Thread(target=self._run, name="cache-warmer", daemon=True)
+            self._thread.start()
+        return self
+    
+    def stop(self):
+        self._stop.set()
+    
+    def _schedule(self, ticker, due):
+        with self._lock:
+            heapq.heappush(self._heap, (due, ticker))
+            self._status[ticker]['due'] = due
+    
+    def _next_due(self, stored_at):
+        """Échéance d'une entrée stockée à `stored_at`: avant expiration, avancée d'une gigue"""
+        ttl = self.cache.ttl
+        return stored_at + ttl * self.refresh_at - self._random.uniform(0, ttl * self.jitter)
+    
+    def _has_headroom(self):
+        bucket = self.rate_limiter.buckets.get('yahoo')
+        return bucket is None or bucket.available() >= bucket.capacity * self.min_headroom
+    
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                due, ticker = self._heap[0] if self._heap else (None, None)
+            if ticker is None:
+                return
+            wait_time = due - time.time()
+            if wait_time > 0:
+                self._stop.wait(wait_time)
+                continue
+            with self._lock:
+                heapq.heappop(self._heap)
+            self._step(ticker)
+    
+    def _step(self, ticker):
+        now = time.time()
+        age = self.cache.age(quote_cache_key(ticker))
+        with self._lock:
+            last_refresh = self._status[ticker]['last_refresh']
+        if age is not None and (last_refresh is None or now - age > last_refresh + 1):
+            # Rafraîchi entre-temps par une requête utilisateur: échéance recalculée sur cette entrée
+            due = self._next_due(now - age)
+            if due > now:
+                metrics.inc('cache_warmer_skips', reason='fresh')
+                with self._lock:
+                    self._status[ticker]['last_refresh'] = now - age
+                self._schedule(ticker, due)
+                return
+        if not self._has_headroom():
+            metrics.inc('cache_warmer_skips', reason='rate_limit')
+            self._schedule(ticker, time.time() + WARM_DEFER_DELAY)
+            return
+        self.refresh(ticker)
+    
+    def refresh(self, ticker):
+        """Re-télécharge un ticker et le remet en cache; planifie le passage suivant"""
+        with metrics.span('cache_warm') as span:
+            data = fetch_stock_data(ticker)
+            span['outcome'] = 'ok' if data else 'fail'
+        if data:
+            self.cache.put(quote_cache_key(ticker), data)
+        now = time.time()
+        if data:
+            due = self._next_due(now)
+        else:
+            due = now + WARM_RETRY_DELAY
+        with self._lock:
+            self._status[ticker].update(last_refresh=now, outcome=span['outcome'])
+        self._schedule(ticker, due)
+        return bool(data)
+    
+    def snapshot(self):
+        """Par ticker: âge de l'entrée en cache, prochain passage, dernier résultat"""
+        now = time.time()
+        with self._lock:
+            status = {ticker: dict(values) for ticker, values in self._status.items()}
+        rows = []
+        for ticker, values in status.items():
+            age = self.cache.age(quote_cache_key(ticker))
+            rows.append({
+                'Ticker': ticker,
+                'Âge en cache (s)': round(age) if age is not None else None,
+                'Prochain passage (s)': round(max(values['due'] - now, 0)) if values['due'] else None,
+                'Dernier résultat': values['outcome'] or '-',
+            })
+        return rows
+
+
+@singleton
+def get_cache_warmer():
+    """Préchauffage des WARM_TICKERS (démarré au premier appel), None si aucun ticker configuré"""
+    if not WARM_TICKERS:
+        return None
+    return CacheWarmer(WARM_TICKERS).start()
+
+# ==================== CACHE DES VERDICTS IA ====================
+
+# Durée de vie d'un verdict en cache (s)
+VERDICT_CACHE_TTL = float(os.getenv("AI_HUNTER_VERDICT_CACHE_TTL", str(24 * 3600)))
+# Nombre de verdicts gardés en mémoire (LRU)
+VERDICT_CACHE_MEMORY_SIZE = int(os.getenv("AI_HUNTER_VERDICT_CACHE_SIZE", "512"))
+# Tier disque (SQLite): activé par défaut, taille max en octets
+VERDICT_CACHE_DISK = os.getenv("AI_HUNTER_VERDICT_CACHE_DISK", "1") == "1"
+VERDICT_CACHE_DISK_MAX_BYTES = int(os.getenv("AI_HUNTER_VERDICT_CACHE_DISK_MAX_BYTES", str(20 * 1024 * 1024)))
+# Archive permanente des réponses IA (rejeu hors ligne des backtests): activée par défaut
+VERDICT_ARCHIVE_DISK = os.getenv("AI_HUNTER_VERDICT_ARCHIVE_DISK", "1") == "1"
+
+
+def verdict_cache_key(system_prompt, model, user_message):
+    """Clé de contenu: hash de (prompt système, modèle, message utilisateur)"""
+    payload = json.dumps([system_prompt, model, user_message], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class VerdictCache:
+    """
+    Cache des réponses IA adressé par contenu
+    - Tier 1: LRU en mémoire (nombre d'entrées limité)
+    - Tier 2 (optionnel): SQLite sur disque, éviction des plus anciens au-delà de max_bytes
+    Les deux tiers expirent après `ttl` secondes
+    """
+    TABLE = 'verdicts'
+    METRIC = 'verdict_cache_lookups'
+    
+    def __init__(self, ttl=VERDICT_CACHE_TTL, memory_size=VERDICT_CACHE_MEMORY_SIZE,
+                 disk_path=None, disk_max_bytes=VERDICT_CACHE_DISK_MAX_BYTES):
+        self.ttl = ttl
+        self.memory_size = memory_size
+        self.disk_path = disk_path
+        self.disk_max_bytes = disk_max_bytes
+        self._memory = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        
+        if disk_path:
+            os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {self.TABLE} (
+                        key TEXT PRIMARY KEY,
+                        stored_at REAL NOT NULL,
+                        value TEXT NOT NULL
+                    )
+                """)
+    
+    def _connect(self):
+        return sqlite3.connect(self.disk_path, timeout=30)
+    
+    def get(self, key):
+        """Valeur en cache (dict) ou None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[0] <= self.ttl:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                metrics.inc(self.METRIC, result='memory_hit')
+                return entry[1]
+            if entry:
+                del self._memory[key]
+        
+        if self.disk_path:
+            with self._connect() as conn:
+                row = conn.execute(
+                    f"SELECT stored_at, value FROM {self.TABLE} WHERE key = ? AND stored_at >= ?",
+                    (key, now - self.ttl)
+                ).fetchone()
+            if row:
+                value = json.loads(row[1])
+                with self._lock:
+                    self.stats['disk_hits'] += 1
+                    self._remember(key, row[0], value)
+                metrics.inc(self.METRIC, result='disk_hit')
+                return value
+        
+        with self._lock:
+            self.stats['misses'] += 1
+        metrics.inc(self.METRIC, result='miss')
+        return None
+    
+    def put(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+        
+        if self.disk_path:
+            with self._connect() as conn:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {self.TABLE} VALUES (?, ?, ?)",
+                    (key, now, json.dumps(value, ensure_ascii=False))
+                )
+                self._evict_disk(conn, now)
+    
+    def _remember(self, key, stored_at, value):
+        # Appelé sous self._lock
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+            self.stats['evictions'] += 1
+    
+    def _evict_disk(self, conn, now):
+        conn.execute(f"DELETE FROM {self.TABLE} WHERE stored_at < ?", (now - self.ttl,))
+        total = conn.execute(f"SELECT COALESCE(SUM(LENGTH(value)), 0) FROM {self.TABLE}").fetchone()[0]
+        if total <= self.disk_max_bytes:
+            return
+        # Suppression des plus anciens jusqu'à repasser sous la limite
+        excess = total - self.disk_max_bytes
+        freed = 0
+        stale = []
+        for key, size in conn.execute(f"SELECT key, LENGTH(value) FROM {self.TABLE} ORDER BY stored_at"):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany(f"DELETE FROM {self.TABLE} WHERE key = ?", stale)
+        with self._lock:
+            self.stats['evictions'] += len(stale)
+    
+    def snapshot_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats['hits'] = stats['memory_hits'] + stats['disk_hits']
+        stats['memory_entries'] = len(self._memory)
+        return stats
+
+
+@singleton
+def get_verdict_cache():
+    disk_path = os.path.join(DATA_DIR, "verdicts.sqlite") if VERDICT_CACHE_DISK else None
+    return VerdictCache(disk_path=disk_path)
+
+
+class VerdictArchive(VerdictCache):
+    """
+    Archive des réponses IA, mêmes clés que le cache des verdicts mais sans expiration
+    ni éviction disque: un backtest rejoue des dates passées bien après le TTL du cache
+    """
+    TABLE = 'verdict_archive'
+    METRIC = 'verdict_archive_lookups'
+    
+    def __init__(self, memory_size=VERDICT_CACHE_MEMORY_SIZE, disk_path=None):
+        super().__init__(ttl=float('inf'), memory_size=memory_size, disk_path=disk_path,
+                         disk_max_bytes=float('inf'))
+    
+    def _evict_disk(self, conn, now):
+        pass
+
+
+@singleton
+def get_verdict_archive():
+    disk_path = os.path.join(DATA_DIR, "verdict_archive.sqlite") if VERDICT_ARCHIVE_DISK else None
+    return VerdictArchive(disk_path=disk_path)
+
+
+def remember_verdict(key, result):
+    """Réponse IA valide: cache (TTL) + archive permanente"""
+    get_verdict_cache().put(key, result)
+    get_verdict_archive().put(key, result)
+
+# ==================== FONDAMENTAUX (CACHE JOURNALIER) ====================
+
+# PE, market cap, dette, croissance: quasi fixes dans la journée, contrairement aux prix (30 min)
+FUNDAMENTALS_TTL = float(os.getenv("AI_HUNTER_FUNDAMENTALS_TTL", str(24 * 3600)))
+FUNDAMENTALS_MEMORY_SIZE = int(os.getenv("AI_HUNTER_FUNDAMENTALS_CACHE_SIZE", "2048"))
+FUNDAMENTALS_DISK = os.getenv("AI_HUNTER_FUNDAMENTALS_CACHE_DISK", "1") == "1"
+# Appels stock.info simultanés (préchargement, lots)
+FUNDAMENTALS_WORKERS = int(os.getenv("AI_HUNTER_FUNDAMENTALS_WORKERS", "8"))
+# Attente max (s) des fondamentaux lancés en parallèle des prix
+FUNDAMENTALS_TIMEOUT = float(os.getenv("AI_HUNTER_FUNDAMENTALS_TIMEOUT", "15"))
+# Ticker sans fondamentaux (ETF, radié) ou stock.info en échec: pas de nouvel essai avant N s
+FUNDAMENTALS_NEGATIVE_TTL = float(os.getenv("AI_HUNTER_FUNDAMENTALS_NEGATIVE_TTL", "900"))
+
+FUNDAMENTAL_FIELDS = ('name', 'market_cap', 'trailing_pe', 'debt', 'revenue_growth')
+
+
+def fundamentals_from_info(info):
+    """Champs utiles de `stock.info` (quelques centaines d'octets au lieu de ~150 clés)"""
+    return {
+        'name': info.get('longName') or info.get('shortName'),
+        'market_cap': info.get('marketCap', 0),
+        'trailing_pe': info.get('trailingPE', 0),
+        'debt': info.get('totalDebt', 0),
+        'revenue_growth': info.get('revenueGrowth', 0),
+    }
+
+
+class FundamentalsCache(VerdictCache):
+    """
+    Fondamentaux par ticker: mêmes tiers que les verdicts (LRU mémoire + SQLite), TTL journalier
+    Tier disque: chaque valeur est aussi archivée par jour (sans expiration) pour le backtest
+    (fondamentaux tels que connus à la date T, voir history_panels)
+    Résultats négatifs (aucun fondamental, échec) gardés en mémoire `negative_ttl` s
+    """
+    TABLE = 'fundamentals'
+    METRIC = 'fundamentals_cache_lookups'
+    
+    def __init__(self, ttl=FUNDAMENTALS_TTL, memory_size=FUNDAMENTALS_MEMORY_SIZE, disk_path=None,
+                 disk_max_bytes=VERDICT_CACHE_DISK_MAX_BYTES, negative_ttl=FUNDAMENTALS_NEGATIVE_TTL):
+        super().__init__(ttl, memory_size, disk_path, disk_max_bytes)
+        self.negative_ttl = negative_ttl
+        self._unavailable = OrderedDict()  # key -> expire à (time.time())
+        if disk_path:
+            with self._connect() as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS fundamentals_history (
+                        ticker TEXT NOT NULL,
+                        day TEXT NOT NULL,
+                        value TEXT NOT NULL,
+                        PRIMARY KEY (ticker, day)
+                    ) WITHOUT ROWID
+                """)
+    
+    def put(self, key, value):
+        super().put(key, value)
+        if self.disk_path:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO fundamentals_history VALUES (?, ?, ?)",
+                    (key, time.strftime('%Y-%m-%d', time.gmtime()), json.dumps(value, ensure_ascii=False))
+                )
+        with self._lock:
+            self._unavailable.pop(key, None)
+    
+    def put_unavailable(self, key):
+        """Mémorise l'absence de fondamentaux pour `key` (négatif, TTL court)"""
+        now = time.time()
+        with self._lock:
+            self._unavailable[key] = now + self.negative_ttl
+            self._unavailable.move_to_end(key)
+            while len(self._unavailable) > self.memory_size:
+                self._unavailable.popitem(last=False)
+    
+    def is_unavailable(self, key):
+        """True si un résultat négatif récent existe pour `key` (pas de nouvel appel réseau)"""
+        with self._lock:
+            expires_at = self._unavailable.get(key)
+            if expires_at is None:
+                return False
+            if time.time() >= expires_at:
+                del self._unavailable[key]
+                return False
+        metrics.inc(self.METRIC, result='negative_hit')
+        return True
+    
+    def history_panels(self, tickers=None):
+        """
+        Archive des fondamentaux: {champ: DataFrame large (index = jour d'archivage, colonnes = tickers)}
+        À ré-indexer en "as of" (dernière valeur connue à chaque date), {} si pas d'archive
+        """
+        if not self.disk_path:
+            return {}
+        query = "SELECT ticker, day, value FROM fundamentals_history"
+        params = []
+        if tickers:
+            query += f" WHERE ticker IN ({','.join('?' * len(tickers))})"
+            params = list(tickers)
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        if not rows:
+            return {}
+        
+        records = [{'ticker': ticker, 'day': day, **json.loads(value)} for ticker, day, value in rows]
+        df = pd.DataFrame(records)
+        df['day'] = pd.to_datetime(df['day'])
+        return {
+            field: df.pivot(index='day', columns='ticker', values=field).astype(float)
+            for field in FUNDAMENTAL_FIELDS if field != 'name' and field in df.columns
+        }
+
+
+@singleton
+def get_fundamentals_cache():
+    disk_path = os.path.join(DATA_DIR, "fundamentals.sqlite") if FUNDAMENTALS_DISK else None
+    return FundamentalsCache(disk_path=disk_path)
+
+
+@singleton
+def get_fundamentals_executor():
+    return ThreadPoolExecutor(max_workers=FUNDAMENTALS_WORKERS, thread_name_prefix="fundamentals")
+
+
+@rate_limited('yahoo')
+def _download_fundamentals(ticker_symbol):
+    """
+    `stock.info` -> fondamentaux mis en cache
+    None si indisponibles ou en échec: résultat négatif mis en cache (FUNDAMENTALS_NEGATIVE_TTL)
+    """
+    import yfinance as yf
+    
+    cache = get_fundamentals_cache()
+    try:
+        with metrics.span('yf_info') as span:
+            info = yf.Ticker(ticker_symbol, session=get_http_session()).info or {}
+            span['outcome'] = 'ok' if info else 'fail'
+    except Exception:
+        info = None
+    fundamentals = fundamentals_from_info(info) if info else None
+    if not fundamentals or not any(fundamentals.values()):
+        cache.put_unavailable(ticker_symbol)
+        return None
+    cache.put(ticker_symbol, fundamentals)
+    return fundamentals
+
+
+def _fetch_fundamentals(ticker_symbol):
+    return get_inflight('fundamentals').do(ticker_symbol, lambda: _download_fundamentals(ticker_symbol))
+
+
+def get_fundamentals(ticker_symbol):
+    """Fondamentaux d'un ticker (cache mémoire, disque, sinon stock.info), None si indisponibles"""
+    cache = get_fundamentals_cache()
+    cached = cache.get(ticker_symbol)
+    if cached is not None:
+        return cached
+    if cache.is_unavailable(ticker_symbol):
+        return None
+    return _fetch_fundamentals(ticker_symbol)
+
+
+def prefetch_fundamentals(ticker_symbol):
+    """Lance get_fundamentals en arrière-plan; retourne le Future (résultat: dict ou None)"""
+    return get_fundamentals_executor().submit(get_fundamentals, ticker_symbol)
+
+
+def get_fundamentals_batch(tickers):
+    """
+    Fondamentaux de plusieurs tickers: lus en cache d'abord, les manquants récupérés
+    en parallèle (une requête stock.info par ticker, FUNDAMENTALS_WORKERS à la fois)
+    Retourne {ticker: fondamentaux} (tickers indisponibles absents)
+    """
+    cache = get_fundamentals_cache()
+    results = {ticker: cache.get(ticker) for ticker in tickers}
+    executor = get_fundamentals_executor()
+    futures = {
+        ticker: executor.submit(_fetch_fundamentals, ticker)
+        for ticker, fundamentals in results.items() if fundamentals is None and not cache.is_unavailable(ticker)
+    }
+    for ticker, future in futures.items():
+        results[ticker] = future.result()
+    return {ticker: fundamentals for ticker, fundamentals in results.items() if fundamentals}
+
+
+def merge_fundamentals(data, fundamentals):
+    """Données de prix complétées par les fondamentaux (valeurs renseignées seulement), sans modifier `data`"""
+    fields = {key: value for key, value in (fundamentals or {}).items() if key in FUNDAMENTAL_FIELDS and value}
+    if not fields:
+        return data
+    if isinstance(data, QuoteSnapshot):
+        return data.with_fields(fields)
+    return {**data, **fields}
+
+# ==================== SCREENER (UNIVERS) ====================
+
+# Listes d'indices prédéfinies
+UNIVERSES = {
+    "Dow Jones 30": [
+        "AAPL", "AMGN", "AMZN", "AXP", "BA", "CAT", "CRM", "CSCO", "CVX", "DIS",
+        "GS", "HD", "HON", "IBM", "JNJ", "JPM", "KO", "MCD", "MMM", "MRK",
+        "MSFT", "NKE", "NVDA", "PG", "SHW", "TRV", "UNH", "V", "VZ", "WMT",
+    ],
+    "Tech Mega Caps": [
+        "AAPL", "MSFT", "NVDA", "GOOGL", "AMZN", "META", "TSLA", "AVGO", "ORCL", "AMD",
+        "NFLX", "ADBE", "CRM", "INTC", "QCOM",
+    ],
+}
+
+SCREENER_WORKERS = int(os.getenv("AI_HUNTER_SCREENER_WORKERS", "8"))
+# Au-delà, un ticker est marqué "timeout" et son résultat ignoré
+SCREENER_TICKER_TIMEOUT = float(os.getenv("AI_HUNTER_SCREENER_TICKER_TIMEOUT", "60"))
+# Criblages terminés gardés en mémoire: nombre max et durée (s) après la fin
+SCREENER_MAX_RUNS = int(os.getenv("AI_HUNTER_SCREENER_MAX_RUNS", "8"))
+SCREENER_RUN_TTL = float(os.getenv("AI_HUNTER_SCREENER_RUN_TTL", "3600"))
+
+
+def parse_universe_csv(file):
+    """Tickers d'un CSV: colonne 'ticker' ou 'symbol' si présente, sinon la première colonne"""
+    df = pd.read_csv(file)
+    columns = {col.lower().strip(): col for col in df.columns}
+    column = columns.get('ticker') or columns.get('symbol') or df.columns[0]
+    return parse_tickers(" ".join(df[column].dropna().astype(str)))
+
+
+def screen_score(data):
+    """
+    Score de classement 0-100 à partir des données déjà récupérées:
+    tendance 6 mois, RSI et position du prix par rapport à la SMA50
+    """
+    ind = data.get('indicators') or {}
+    trend = max(min(data.get('trend_6m', 0), 50), -50)  # ±50% -> ±25 pts
+    score = 50 + trend / 2
+    if 'rsi_14' in ind:
+        # Momentum sain (50-70) favorisé, surachat / survente pénalisés
+        score += 10 - abs(ind['rsi_14'] - 60) / 2
+    if 'sma_50' in ind and ind['sma_50'] > 0:
+        score += max(min((data['current_price'] / ind['sma_50'] - 1) * 100, 15), -15)
+    return round(max(min(score, 100), 0), 1)
+
+
+class ScreenerRun:
+    """
+    Criblage d'un univers sur un pool de threads borné
+    Tourne en arrière-plan, indépendamment des reruns Streamlit: la page ne fait
+    que lire l'état (reprise transparente si le script est relancé en cours de route)
+    Tickers soumis au fil de l'eau, `max_workers` à la fois: un ticker en timeout libère
+    sa place (le suivant démarre sur un thread de réserve), son thread finit en arrière-plan
+    et son résultat est ignoré. Un ticker n'est soumis que si un thread est libre (jamais
+    en file derrière des threads bloqués) et son délai court à partir de son démarrage
+    """
+    
+    def __init__(self, tickers, max_workers=SCREENER_WORKERS, ticker_timeout=SCREENER_TICKER_TIMEOUT):
+        self.tickers = list(tickers)
+        self.ticker_timeout = ticker_timeout
+        self.results = {}  # ticker -> QuoteSnapshot
+        self.scores = {}
+        self.errors = {}
+        self.started_at = time.time()
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self._running = {}  # ticker -> heure de début (démarrés uniquement)
+        self._pending = deque(self.tickers)
+        self._futures = {}  # ticker -> Future, tickers en cours suivis uniquement
+        self._max_workers = max_workers
+        # Autant de threads de réserve que de places: remplacement des tickers en timeout
+        self._threads = 2 * max_workers
+        self._busy = 0  # threads occupés, y compris par des tickers en timeout
+        self._executor = ThreadPoolExecutor(max_workers=self._threads, thread_name_prefix="screener")
+        with self._lock:
+            self._submit_pending()
+    
+    def _submit_pending(self):
+        # Appelé sous self._lock
+        while self._pending and len(self._futures) < self._max_workers and self._busy < self._threads:
+            ticker = self._pending.popleft()
+            self._busy += 1
+            self._futures[ticker] = self._executor.submit(self._process, ticker)
+        if not self._pending:
+            self._executor.shutdown(wait=False)
+    
+    def _process(self, ticker):
+        with self._lock:
+            self._running[ticker] = time.time()
+        try:
+            # Cache partagé: un ticker déjà consulté (vue unique, autre criblage) n'est pas re-téléchargé
+            data = get_quote_cache().get_or_fetch(quote_cache_key(ticker), lambda: fetch_stock_data(ticker))
+            error = None if data else "aucune source disponible"
+        except Exception as e:
+            data, error = None, str(e)[:80]
+        
+        with self._lock:
+            self._busy -= 1
+            if ticker in self._running:
+                del self._running[ticker]
+                del self._futures[ticker]
+                if data:
+                    self.scores[ticker] = screen_score(data)
+                    self.results[ticker] = data
+                else:
+                    self.errors[ticker] = error
+            # Sinon: déjà marqué en timeout, résultat tardif ignoré
+            self._expire_slow()
+    
+    def _expire_slow(self):
+        # Appelé sous self._lock
+        now = time.time()
+        for ticker, started in list(self._running.items()):
+            if now - started > self.ticker_timeout:
+                # Plus suivi: sa place revient au ticker suivant
+                del self._running[ticker]
+                self._futures.pop(ticker).cancel()
+                self.errors[ticker] = f"timeout ({self.ticker_timeout:g}s)"
+        self._submit_pending()
+        if len(self.results) + len(self.errors) == len(self.tickers) and self.finished_at is None:
+            self.finished_at = now
+    
+    @property
+    def done(self):
+        with self._lock:
+            self._expire_slow()
+            return self.finished_at is not None
+    
+    def progress(self):
+        with self._lock:
+            self._expire_slow()
+            return {
+                'total': len(self.tickers),
+                'done': len(self.results),
+                'failed': len(self.errors),
+                'running': len(self._running),
+                'elapsed': (self.finished_at or time.time()) - self.started_at,
+            }
+    
+    def ranking(self):
+        """Tableau classé par score (tickers terminés uniquement)"""
+        with self._lock:
+            results = [(data, self.scores[ticker]) for ticker, data in self.results.items()]
+        rows = [
+            {
+                'Ticker': data['ticker'],
+                'Nom': data['name'],
+                'Score': score,
+                'Prix ($)': round(data['current_price'], 2),
+                'Trend 6M (%)': round(data.get('trend_6m', 0), 1),
+                'RSI 14': _round_or_none((data.get('indicators') or {}).get('rsi_14'), 0),
+                'Source': data['source'],
+            }
+            for data, score in results
+        ]
+        df = pd.DataFrame(rows, columns=['Ticker', 'Nom', 'Score', 'Prix ($)', 'Trend 6M (%)', 'RSI 14', 'Source'])
+        df = df.sort_values('Score', ascending=False, ignore_index=True)
+        df.index = df.index + 1
+        return df
+    
+    def failures(self):
+        with self._lock:
+            return dict(self.errors)
+
+
+def screener_run_id(tickers):
+    return hashlib.sha1(",".join(sorted(tickers)).encode()).hexdigest()[:12]
+
+
+class ScreenerRuns:
+    """
+    Criblages en cours ou terminés, partagés entre reruns (et sessions) du process
+    Un criblage terminé est oublié `ttl` s après sa fin, ou au-delà de `max_runs` criblages
+    (les moins récemment consultés d'abord); un criblage en cours n'est jamais retiré
+    """
+    
+    def __init__(self, max_runs=SCREENER_MAX_RUNS, ttl=SCREENER_RUN_TTL):
+        self.max_runs = max_runs
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._runs = OrderedDict()
+    
+    def start(self, tickers):
+        """Lance un criblage (ou reprend un criblage identique encore en cours) -> identifiant"""
+        run_id = screener_run_id(tickers)
+        with self._lock:
+            existing = self._runs.get(run_id)
+            if existing is None or existing.done:
+                self._runs[run_id] = ScreenerRun(tickers)
+            self._runs.move_to_end(run_id)
+            self._prune()
+        return run_id
+    
+    def get(self, run_id):
+        """Criblage par identifiant, None s'il est inconnu ou déjà oublié"""
+        with self._lock:
+            self._prune()
+            run = self._runs.get(run_id)
+            if run is not None:
+                self._runs.move_to_end(run_id)
+            return run
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._runs)
+    
+    def _prune(self):
+        # Appelé sous self._lock
+        now = time.time()
+        finished = [run_id for run_id, run in self._runs.items() if run.done]
+        for run_id in finished:
+            if now - self._runs[run_id].finished_at > self.ttl:
+                del self._runs[run_id]
+        for run_id in finished:
+            if len(self._runs) <= self.max_runs:
+                break
+            self._runs.pop(run_id, None)
+
+
+@singleton
+def get_screener_runs():
+    return ScreenerRuns()
+
+# ==================== JSON INCRÉMENTAL ====================
+
+_JSON_WS = ' \t\r\n'
+_JSON_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+_PARTIAL_NUMBER_RE = re.compile(r'[-+.0-9eE]+')
+_JSON_LITERALS = {'true': True, 'false': False, 'null': None}
+_MISSING = object()
+
+
+class PartialString(str):
+    """Chaîne JSON dont le guillemet fermant n'est pas encore arrivé"""
+
+
+class PartialJSONParser:
+    """
+    Valeur d'un préfixe de texte JSON (réponse en cours de streaming)
+    - chaînes ouvertes: contenu reçu jusque-là, en PartialString
+    - nombres et littéraux: seulement une fois terminés (pas de "score": 7 avant 75)
+    - clé incomplète ou sans valeur: ignorée
+    Lève ValueError dès que le préfixe ne peut plus devenir un JSON valide
+    """
+    
+    def __init__(self, text):
+        self.text = text
+        self.pos = 0
+    
+    def parse(self):
+        value, _ = self._value()
+        return None if value is _MISSING else value
+    
+    def _skip(self):
+        while self.pos < len(self.text) and self.text[self.pos] in _JSON_WS:
+            self.pos += 1
+        return self.pos >= len(self.text)
+    
+    def _fail(self, expected):
+        raise ValueError(f"JSON invalide à la position {self.pos} (attendu: {expected})")
+    
+    def _value(self):
+        """(valeur ou _MISSING, valeur terminée ?)"""
+        if self._skip():
+            return _MISSING, False
+        char = self.text[self.pos]
+        if char == '{':
+            return self._container('}', {})
+        if char == '[':
+            return self._container(']', [])
+        if char == '"':
+            return self._string()
+        return self._scalar()
+    
+    def _container(self, closing, result):
+        self.pos += 1
+        while True:
+            if self._skip():
+                return result, False
+            if self.text[self.pos] == closing:
+                self.pos += 1
+                return result, True
+            if result and self.text[self.pos] == ',':
+                self.pos += 1
+                if self._skip():
+                    return result, False
+            elif result:
+                self._fail("',' ou '" + closing + "'")
+            
+            if isinstance(result, dict):
+                if self.text[self.pos] != '"':
+                    self._fail("une clé")
+                key, complete = self._string()
+                if not complete or self._skip():
+                    return result, False
+                if self.text[self.pos] != ':':
+                    self._fail("':'")
+                self.pos += 1
+                value, complete = self._value()
+                if value is not _MISSING:
+                    result[str(key)] = value
+            else:
+                value, complete = self._value()
+                if value is not _MISSING:
+                    result.append(value)
+            if not complete:
+                return result, False
+    
+    def _string(self):
+        self.pos += 1
+        chars = []
+        text = self.text
+        while self.pos < len(text):
+            char = text[self.pos]
+            if char == '"':
+                self.pos += 1
+                return ''.join(chars), True
+            if char == '\\':
+                escape = text[self.pos + 1:self.pos + 2]
+                if not escape:
+                    break
+                if escape == 'u':
+                    digits = text[self.pos + 2:self.pos + 6]
+                    if len(digits) < 4:
+                        break
+                    chars.append(chr(int(digits, 16)))
+                    self.pos += 6
+                    continue
+                if escape not in _JSON_ESCAPES:
+                    self._fail("un échappement valide")
+                chars.append(_JSON_ESCAPES[escape])
+                self.pos += 2
+                continue
+            chars.append(char)
+            self.pos += 1
+        # Fin du texte avant le guillemet fermant (ou au milieu d'un échappement)
+        self.pos = len(text)
+        return PartialString(''.join(chars)), False
+    
+    def _scalar(self):
+        rest = self.text[self.pos:]
+        for literal, value in _JSON_LITERALS.items():
+            if rest.startswith(literal):
+                self.pos += len(literal)
+                return value, True
+            if literal.startswith(rest):
+                self.pos = len(self.text)
+                return _MISSING, False
+        match = _PARTIAL_NUMBER_RE.match(rest)
+        if not match:
+            self._fail("une valeur")
+        self.pos += match.end()
+        if self.pos >= len(self.text):
+            # Nombre peut-être incomplet ("7", "2.", "1e"): attendu jusqu'au délimiteur suivant
+            return _MISSING, False
+        try:
+            return json.loads(match.group()), True
+        except ValueError:
+            self._fail("un nombre")
+
+
+def parse_partial_json(text):
+    """Objet partiel d'une réponse JSON en cours (voir PartialJSONParser), None si rien d'exploitable"""
+    return PartialJSONParser(text).parse()
+
+
+def partial_verdict(partial):
+    """Champs affichables d'un verdict en cours: verdict / score / risque une fois complets, thèse au fil de l'eau"""
+    if not isinstance(partial, dict):
+        return {}
+    return {key: value for key, value in partial.items() if key == 'thesis' or not isinstance(value, PartialString)}
+
+# ==================== CERVEAU IA ====================
+
+AI_MODEL = "gpt-3.5-turbo"
+PERSONAS = ["Warren", "Cathie", "Jim"]
+
+# Mode par défaut: "parallel" (un appel par persona, en parallèle) ou "single" (un seul appel JSON)
+DEFAULT_AI_MODE = os.getenv("AI_HUNTER_AI_MODE", "parallel")
+# Verdicts en streaming (affichage progressif) par défaut dans l'interface
+DEFAULT_AI_STREAM = os.getenv("AI_HUNTER_AI_STREAM", "1") == "1"
+
+# Instructions selon le persona
+VERDICT_LOGIC = "Score < 45 = SELL, 46-65 = HOLD, > 66 = BUY."
+PERSONA_PROMPTS = {
+    "Warren": f"Tu es Warren Buffett. Analyse value investing. {VERDICT_LOGIC}",
+    "Cathie": f"Tu es Cathie Wood. Focus croissance disruptive. {VERDICT_LOGIC}",
+    "Jim": f"Tu es Jim Cramer. Analyse momentum court terme. {VERDICT_LOGIC}"
+}
+
+VERDICT_FORMAT = '{"verdict": "BUY/HOLD/SELL", "score": 0-100, "thesis": "explication courte", "risk": "LOW/MEDIUM/HIGH"}'
+
+
+def get_openai_api_key():
+    return get_secret("OPENAI_API_KEY")
+
+
+@singleton
+def get_openai_client(api_key):
+    """Client OpenAI partagé (pool de connexions réutilisé entre appels et sessions)"""
+    from openai import OpenAI
+    return OpenAI(api_key=api_key)
+
+
+def error_verdict(thesis):
+    return {
+        'verdict': 'ERROR',
+        'score': 0,
+        'thesis': thesis,
+        'risk': 'HIGH'
+    }
+
+
+def fallback_verdict(persona, data, reason):
+    """
+    Verdict de repli quand l'IA est indisponible: score local instantané (voir scoring)
+    si LOCAL_FALLBACK, sinon verdict ERROR. `reason` est gardé dans 'fallback'
+    """
+    if not LOCAL_FALLBACK:
+        return error_verdict(reason)
+    try:
+        verdict = local_verdict(persona, data)
+    except Exception:
+        return error_verdict(reason)
+    metrics.inc('ai_fallback_verdicts', persona=persona)
+    verdict['fallback'] = reason
+    return verdict
+
+
+def _verdict_outcome(verdict):
+    if verdict.get('verdict') == 'ERROR':
+        return 'error'
+    return 'fallback' if verdict.get('source') == 'local' else 'ok'
+
+
+def build_market_summary(data):
+    """Bloc de données du ticker commun à tous les prompts"""
+    # Message adapté selon la source de données
+    source_quality = "(Données limitées)" if "SCRAPING" in data['source'] or "ALPHA" in data['source'] else "(Données complètes)"
+    
+    summary = f"""
+        ANALYSE: {data['ticker']} {source_quality}
+        Prix actuel: ${data['current_price']:.2f}
+        Tendance 6 mois: {data.get('trend_6m', 0):.1f}%
+        PE Ratio: {data.get('trailing_pe', 'N/A')}
+        Market Cap: ${data.get('market_cap', 0)/1e9:.1f}B
+        """
+    
+    # Indicateurs techniques (si historique disponible)
+    ind = data.get('indicators') or {}
+    lines = []
+    if 'rsi_14' in ind:
+        lines.append(f"RSI 14: {ind['rsi_14']:.0f}")
+    if 'macd_hist' in ind:
+        lines.append(f"MACD histogramme: {ind['macd_hist']:+.2f}")
+    if 'sma_50' in ind:
+        lines.append(f"Prix vs SMA50: {(data['current_price'] / ind['sma_50'] - 1) * 100:+.1f}%")
+    if 'bb_pct' in ind:
+        lines.append(f"Position Bollinger (0=basse, 1=haute): {ind['bb_pct']:.2f}")
+    if 'volatility_20' in ind:
+        lines.append(f"Volatilité 20j annualisée: {ind['volatility_20']:.0f}%")
+    if 'max_drawdown' in ind:
+        lines.append(f"Max drawdown: {ind['max_drawdown']:.1f}%")
+    if 'volume_z' in ind:
+        lines.append(f"Volume (z-score 20j): {ind['volume_z']:+.1f}")
+    if lines:
+        summary += "Indicateurs: " + " | ".join(lines) + "\n        "
+    return summary
+
+
+def record_token_usage(response):
+    """Compteurs de tokens depuis `response.usage` (absent sur certaines réponses)"""
+    usage = getattr(response, 'usage', None)
+    if usage is None:
+        return
+    for kind in ('prompt_tokens', 'completion_tokens'):
+        count = getattr(usage, kind, None)
+        if count:
+            metrics.inc('openai_tokens', count, model=AI_MODEL, kind=kind.split('_')[0])
+
+
+def cached_json_completion(client, system_prompt, user_message, max_tokens=200):
+    """
+    Completion JSON via le cache des verdicts: un prompt identique ne coûte aucun token
+    Les réponses invalides (exception) ne sont pas mises en cache
+    """
+    cache = get_verdict_cache()
+    key = verdict_cache_key(system_prompt, AI_MODEL, user_message)
+    
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    # Même prompt déjà en cours (autre session, autre onglet): on attend sa réponse
+    return get_inflight('openai').do(key, lambda: _json_completion(client, system_prompt, user_message, max_tokens, key))
+
+
+def _json_completion(client, system_prompt, user_message, max_tokens, key):
+    get_rate_limiter().acquire('openai')
+    with metrics.span('openai_completion', model=AI_MODEL):
+        response = client.chat.completions.create(
+            model=AI_MODEL,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_message}
+            ],
+            temperature=0.3,
+            max_tokens=max_tokens,
+            response_format={"type": "json_object"}
+        )
+    record_token_usage(response)
+    
+    result = json.loads(response.choices[0].message.content)
+    remember_verdict(key, result)
+    return result
+
+
+def streamed_json_completion(client, system_prompt, user_message, on_partial, max_tokens=200):
+    """
+    Comme cached_json_completion, mais en streaming: `on_partial(objet partiel)` à chaque
+    fragment qui modifie le JSON reçu (voir parse_partial_json)
+    Réponse tronquée ou invalide: exception, rien n'est mis en cache
+    """
+    cache = get_verdict_cache()
+    key = verdict_cache_key(system_prompt, AI_MODEL, user_message)
+    
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    # Même prompt déjà en cours: les fragments du premier appel sont relayés à tous
+    flights = get_inflight('openai')
+    return flights.do(
+        key,
+        lambda: _streamed_completion(client, system_prompt, user_message, max_tokens, key,
+                                     lambda partial: flights.publish(key, partial)),
+        on_partial=on_partial
+    )
+
+
+def _streamed_completion(client, system_prompt, user_message, max_tokens, key, on_partial):
+    get_rate_limiter().acquire('openai')
+    with metrics.span('openai_stream', model=AI_MODEL):
+        start = time.perf_counter()
+        stream = client.chat.completions.create(
+            model=AI_MODEL,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_message}
+            ],
+            temperature=0.3,
+            max_tokens=max_tokens,
+            response_format={"type": "json_object"},
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        text, finish_reason, last_partial = "", None, None
+        try:
+            for chunk in stream:
+                record_token_usage(chunk)
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                finish_reason = choice.finish_reason or finish_reason
+                delta = choice.delta.content if choice.delta else None
+                if not delta:
+                    continue
+                if not text:
+                    metrics.observe('openai_first_token_seconds', time.perf_counter() - start, model=AI_MODEL)
+                text += delta
+                partial = parse_partial_json(text)
+                if partial and partial != last_partial:
+                    last_partial = partial
+                    on_partial(partial)
+        finally:
+            # Abandon en cours de route (JSON invalide): libère la connexion
+            stream.close()
+    
+    if finish_reason == 'length':
+        raise ValueError("Réponse tronquée (max_tokens)")
+    result = json.loads(text)
+    remember_verdict(key, result)
+    return result
+
+
+def analyze_with_ai(persona, data, client=None, on_partial=None):
+    """
+    Analyse IA via OpenAI GPT
+    `client`: client OpenAI partagé (sinon récupéré via get_openai_client)
+    `on_partial`: mode streaming, appelé avec le verdict partiel (voir partial_verdict)
+    Retourne: {verdict, score, thesis, risk}
+    """
+    with metrics.span('ai_analysis', persona=persona) as span:
+        result = _analyze_persona(persona, data, client, on_partial)
+        span['outcome'] = _verdict_outcome(result)
+    return result
+
+
+def _first_verdict_tracker(persona, on_partial):
+    """
+    Relaie les verdicts partiels quand leur partie affichable change, et mesure le délai
+    avant verdict + score affichables (ce que l'utilisateur attend, plus que la fin de la thèse)
+    """
+    start = time.perf_counter()
+    last = None
+    
+    def relay(partial):
+        nonlocal last
+        fields = partial_verdict(partial)
+        if not fields or fields == last:
+            return
+        if 'verdict' in fields and 'score' in fields and not (last and 'verdict' in last and 'score' in last):
+            metrics.observe('ai_first_verdict_seconds', time.perf_counter() - start, persona=persona)
+        last = fields
+        on_partial(fields)
+    
+    return relay
+
+
+def _analyze_persona(persona, data, client, on_partial=None):
+    try:
+        if client is None:
+            api_key = get_openai_api_key()
+            
+            if not api_key:
+                return fallback_verdict(persona, data, 'Clé OpenAI manquante (OPENAI_API_KEY)')
+            
+            client = get_openai_client(api_key)
+        
+        system_prompt, user_message = persona_prompt(persona, data)
+        if on_partial is not None:
+            return streamed_json_completion(
+                client, system_prompt, user_message, _first_verdict_tracker(persona, on_partial)
+            )
+        return cached_json_completion(client, system_prompt, user_message)
+        
+    except Exception as e:
+        return fallback_verdict(persona, data, f"Erreur IA: {str(e)[:50]}")
+
+
+def persona_prompt(persona, data):
+    """(prompt système, message utilisateur) d'une analyse persona (aussi la clé du cache des verdicts)"""
+    user_message = f"""{build_market_summary(data)}
+        Donne ton verdict en JSON strict: {VERDICT_FORMAT}
+        """
+    return PERSONA_PROMPTS.get(persona, PERSONA_PROMPTS["Warren"]), user_message
+
+
+def cached_ai_verdict(persona, data):
+    """
+    Verdict IA déjà obtenu pour ces données (aucun appel réseau), None sinon
+    Archive permanente d'abord, puis cache (TTL): un succès du cache y est recopié
+    """
+    system_prompt, user_message = persona_prompt(persona, data)
+    key = verdict_cache_key(system_prompt, AI_MODEL, user_message)
+    result = get_verdict_archive().get(key)
+    if result is None:
+        result = get_verdict_cache().get(key)
+        if result is not None:
+            get_verdict_archive().put(key, result)
+    return result
+
+
+def analyze_personas_concurrently(data, personas=PERSONAS, client=None):
+    """
+    Lance une analyse par persona en parallèle (client partagé)
+    Générateur: produit (persona, résultat) dans l'ordre d'arrivée
+    """
+    if client is None:
+        api_key = get_openai_api_key()
+        if not api_key:
+            for persona in personas:
+                yield persona, fallback_verdict(persona, data, 'Clé OpenAI manquante (OPENAI_API_KEY)')
+            return
+        client = get_openai_client(api_key)
+    
+    with ThreadPoolExecutor(max_workers=len(personas), thread_name_prefix="ai-persona") as executor:
+        futures = {executor.submit(analyze_with_ai, persona, data, client): persona for persona in personas}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def analyze_all_personas(data, personas=PERSONAS, client=None, on_partial=None):
+    """
+    Mode appel unique: les verdicts de tous les personas dans une seule completion JSON
+    (~3x moins de requêtes et de tokens de contexte)
+    `on_partial(persona, verdict partiel)`: mode streaming
+    Retourne {persona: {verdict, score, thesis, risk}}
+    """
+    with metrics.span('ai_analysis', persona='all') as span:
+        results = _analyze_all(data, personas, client, on_partial)
+        outcomes = {_verdict_outcome(r) for r in results.values()}
+        span['outcome'] = 'error' if 'error' in outcomes else 'fallback' if 'fallback' in outcomes else 'ok'
+    return results
+
+
+def _analyze_all(data, personas, client, on_partial=None):
+    try:
+        if client is None:
+            api_key = get_openai_api_key()
+            
+            if not api_key:
+                return {p: fallback_verdict(p, data, 'Clé OpenAI manquante (OPENAI_API_KEY)') for p in personas}
+            
+            client = get_openai_client(api_key)
+        
+        system_prompt = "Tu joues successivement plusieurs investisseurs, chacun avec sa propre logique:\n" + "\n".join(
+            f"- {persona}: {PERSONA_PROMPTS[persona]}" for persona in personas
+        )
+        keys = ", ".join(f'"{persona}": {VERDICT_FORMAT}' for persona in personas)
+        user_message = f"""{build_market_summary(data)}
+        Donne le verdict de chaque investisseur en JSON strict: {{{keys}}}
+        """
+        
+        max_tokens = 200 * len(personas)
+        if on_partial is not None:
+            trackers = {persona: _first_verdict_tracker(persona, functools.partial(on_partial, persona)) for persona in personas}
+            
+            def relay(partial):
+                for persona, verdict in partial.items():
+                    if persona in trackers and isinstance(verdict, dict):
+                        trackers[persona](verdict)
+            
+            result = streamed_json_completion(client, system_prompt, user_message, relay, max_tokens=max_tokens)
+        else:
+            result = cached_json_completion(client, system_prompt, user_message, max_tokens=max_tokens)
+        return {
+            persona: result[persona] if isinstance(result.get(persona), dict)
+            else fallback_verdict(persona, data, "Verdict absent de la réponse")
+            for persona in personas
+        }
+        
+    except Exception as e:
+        return {p: fallback_verdict(p, data, f"Erreur IA: {str(e)[:50]}") for p in personas}
+
+
+def stream_persona_verdicts(data, personas=PERSONAS, client=None, ai_mode=DEFAULT_AI_MODE):
+    """
+    Verdicts en streaming, consommés par le thread appelant (Streamlit n'accepte pas
+    d'affichage depuis les threads de travail)
+    Générateur: produit (persona, verdict, terminé) - verdicts partiels puis final,
+    les partiels d'un même persona arrivés entre deux lectures sont fusionnés
+    """
+    events = Queue()
+    
+    def on_partial(persona, partial):
+        events.put((persona, partial, False))
+    
+    def run_single():
+        try:
+            results = analyze_all_personas(data, personas, client, on_partial)
+        except Exception as e:
+            results = {p: fallback_verdict(p, data, f"Erreur IA: {str(e)[:50]}") for p in personas}
+        for persona in personas:
+            events.put((persona, results[persona], True))
+    
+    def run_persona(persona):
+        try:
+            result = analyze_with_ai(persona, data, client, functools.partial(on_partial, persona))
+        except Exception as e:
+            result = fallback_verdict(persona, data, f"Erreur IA: {str(e)[:50]}")
+        events.put((persona, result, True))
+    
+    executor = ThreadPoolExecutor(max_workers=len(personas), thread_name_prefix="ai-stream")
+    if ai_mode == "single":
+        executor.submit(run_single)
+    else:
+        for persona in personas:
+            executor.submit(run_persona, persona)
+    executor.shutdown(wait=False)
+    
+    pending = set(personas)
+    while pending:
+        batch = [events.get()]
+        while True:
+            try:
+                batch.append(events.get_nowait())
+            except Empty:
+                break
+        latest = {}
+        for persona, verdict, done in batch:
+            if persona not in pending:
+                continue
+            if done:
+                latest.pop(persona, None)
+                pending.discard(persona)
+                yield persona, verdict, True
+            else:
+                latest[persona] = verdict
+        for persona, verdict in latest.items():
+            yield persona, verdict, False
+
+# ==================== PRÉ-SCORING LOCAL ====================
+
+# Verdict de repli (score local) quand la clé OpenAI manque ou que l'appel échoue
+LOCAL_FALLBACK = os.getenv("AI_HUNTER_LOCAL_FALLBACK", "1") == "1"
+# Filtre avant LLM (lots de tickers): N meilleurs scores locaux par persona (0 = pas de filtre)
+AI_TOP_N = int(os.getenv("AI_HUNTER_AI_TOP_N", "0"))
+# ... plus les cas limites, à moins de N points d'un seuil de verdict
+AI_BORDERLINE_MARGIN = float(os.getenv("AI_HUNTER_AI_BORDERLINE", "3"))
+
+
+def local_verdicts(records, personas=PERSONAS):
+    """Verdicts locaux de plusieurs tickers en un passage vectorisé -> {ticker: {persona: verdict}}"""
+    with metrics.span('local_scoring'):
+        return scoring.local_verdicts(records, personas)
+
+
+def local_verdict(persona, data):
+    """Verdict local d'un persona pour un ticker (même format que analyze_with_ai, 'source': 'local')"""
+    return local_verdicts({data['ticker']: data}, [persona])[data['ticker']][persona]
+
+
+def select_for_ai(records, personas=PERSONAS, top_n=AI_TOP_N, margin=AI_BORDERLINE_MARGIN):
+    """
+    Analyses à confier au LLM pour un lot de tickers: meilleurs scores locaux de chaque
+    persona et cas limites (voir scoring.select_for_llm)
+    Retourne {ticker: [personas]} (liste vide: verdicts locaux suffisants)
+    """
+    if not records:
+        return {}
+    _, _, scores = scoring.score_records(records, personas)
+    mask = scoring.select_for_llm(scores, top_n, margin)
+    columns = list(mask.columns)
+    selected = {
+        ticker: [columns[j] for j in np.flatnonzero(row)]
+        for ticker, row in zip(mask.index, mask.to_numpy())
+    }
+    skipped = sum(len(personas) - len(chosen) for chosen in selected.values())
+    if skipped:
+        metrics.inc('ai_calls_skipped', skipped)
+    return selected
+
+
+# ==================== BACKTEST ====================
+
+# Appels OpenAI simultanés du backtest --ai-live (le rate limiter "openai" borne le débit)
+BACKTEST_AI_WORKERS = int(os.getenv("AI_HUNTER_BACKTEST_AI_WORKERS", "8"))
+
+
+def load_backtest_data(tickers=None, start=None, end=None, interval='1d'):
+    """
+    Historiques et archive des fondamentaux depuis le stockage local (aucun appel réseau)
+    Retourne (panel, {champ: DataFrame}); panel vide si rien n'est stocké
+    """
+    store = get_ohlcv_store()
+    panel = store.load_panel(tickers or store.tickers(interval), interval, start, end)
+    if not panel:
+        return {}, {}
+    return panel, get_fundamentals_cache().history_panels(list(panel['Close'].columns))
+
+
+def _live_ai_verdict(persona, data):
+    """Verdict IA demandé à OpenAI (archivé); None si l'IA n'a pas répondu (replis locaux exclus)"""
+    verdict = analyze_with_ai(persona, data)
+    if verdict.get('verdict') == 'ERROR' or verdict.get('source') == 'local':
+        return None
+    return verdict
+
+
+def run_backtest(tickers=None, start=None, end=None, horizon=backtest.DEFAULT_HORIZON, step=None,
+                 source='local', live=False, personas=PERSONAS, workers=BACKTEST_AI_WORKERS, max_calls=None):
+    """
+    Rejoue les historiques journaliers stockés à travers les verdicts personas (voir backtest.run)
+    Features à chaque date calculées comme en direct, sur DEFAULT_HISTORY_PERIOD d'historique
+    - source 'local': scorer local vectorisé
+    - source 'ai': verdicts IA déjà archivés (hors ligne, dates sans verdict ignorées);
+      `live`: verdicts manquants demandés à OpenAI sur `workers` threads, au plus `max_calls`
+      appels (réseau, payant: une requête par ligne x persona, débit borné par le rate limiter
+      "openai"), archivés sans expiration pour les rejeux
+    Retourne le dict de backtest.run, ou None si l'historique local est vide / trop court
+    """
+    panel, fundamentals = load_backtest_data(tickers, start, end)
+    if not panel:
+        return None
+    
+    verdict_fn = miss_fn = None
+    if source == 'ai':
+        verdict_fn = cached_ai_verdict
+        miss_fn = _live_ai_verdict if live else None
+    with metrics.span('backtest', source=source):
+        return backtest.run(panel, fundamentals, personas, horizon, step,
+                            lookback=period_offset(DEFAULT_HISTORY_PERIOD), verdict_fn=verdict_fn,
+                            miss_fn=miss_fn, workers=workers, max_calls=max_calls)
@@ -0,0 +1,450 @@
+"""
+Indicateurs techniques vectorisés (NumPy / pandas)
+
+Tous les calculs portent sur des "panels": DataFrames larges (index = dates,
+colonnes = tickers). Un seul passage calcule un ticker ou toute une watchlist,
+sans boucle Python par barre.
+"""
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+
+# Valeurs résumées (dernière barre) ajoutées au dict de données
+SNAPSHOT_FIELDS = [
+    'sma_20', 'sma_50', 'ema_12', 'ema_26', 'rsi_14',
+    'macd', 'macd_signal', 'macd_hist', 'atr_14',
+    'bb_upper', 'bb_lower', 'bb_pct', 'volatility_20', 'max_drawdown', 'volume_z',
+]
+
+
+# ==================== PANELS ====================
+
+def to_panel(histories):
+    """
+    {ticker: DataFrame OHLCV} -> {'Open'|'High'|'Low'|'Close'|'Volume': DataFrame large}
+    Les dates manquantes d'un ticker restent NaN
+    """
+    frames = {ticker: df for ticker, df in histories.items() if df is not None and not df.empty}
+    if not frames:
+        return {}
+    stacked = pd.concat(frames, axis=1).sort_index()
+    # copy(): un bloc NumPy contigu par champ (sinon un bloc par ticker, bien plus lent)
+    return {
+        field: stacked.xs(field, axis=1, level=1).astype(float).copy()
+        for field in ['Open', 'High', 'Low', 'Close', 'Volume']
+        if field in stacked.columns.get_level_values(1)
+    }
+
+
+# ==================== NOYAUX 2D ====================
+# pandas applique rolling/ewm colonne par colonne: sur 500 tickers ce coût par colonne
+# domine. Ces noyaux travaillent sur tout le tableau (dates x tickers) d'un coup.
+
+def _like(frame, values):
+    return pd.DataFrame(values, index=frame.index, columns=frame.columns)
+
+
+def _window_sums(values, window):
+    """Sommes glissantes (valeurs, carrés, nombre de valeurs valides) via sommes cumulées"""
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    zeros = np.zeros((1, values.shape[1]))
+    cum = np.vstack([zeros, np.cumsum(filled, axis=0)])
+    cum_sq = np.vstack([zeros, np.cumsum(filled * filled, axis=0)])
+    cum_n = np.vstack([zeros, np.cumsum(valid, axis=0)])
+    total = np.full(values.shape, np.nan)
+    total_sq = np.full(values.shape, np.nan)
+    count = np.zeros(values.shape)
+    if len(values) >= window:
+        total[window - 1:] = cum[window:] - cum[:-window]
+        total_sq[window - 1:] = cum_sq[window:] - cum_sq[:-window]
+        count[window - 1:] = cum_n[window:] - cum_n[:-window]
+    return total, total_sq, count
+
+
+def rolling_mean(frame, window):
+    """Moyenne glissante (NaN tant que la fenêtre n'est pas complète)"""
+    total, _, count = _window_sums(frame.to_numpy(dtype=float), window)
+    return _like(frame, np.where(count == window, total / window, np.nan))
+
+
+def rolling_std(frame, window, ddof=1):
+    """Écart-type glissant (NaN tant que la fenêtre n'est pas complète)"""
+    total, total_sq, count = _window_sums(frame.to_numpy(dtype=float), window)
+    variance = np.maximum(total_sq - total * total / window, 0.0) / (window - ddof)
+    return _like(frame, np.where(count == window, np.sqrt(variance), np.nan))
+
+
+def ewm_mean(frame, alpha, min_periods=1):
+    """
+    Moyenne exponentielle récursive (équivalent pandas ewm(adjust=False)):
+    y[t] = (1 - alpha) * y[t-1] + alpha * x[t], y[premier] = x[premier]
+    Forme fermée par sommes cumulées, calculée par blocs pour éviter le débordement
+    de (1 - alpha)^-t (un seul bloc pour ~1 an de barres journalières)
+    """
+    values = frame.to_numpy(dtype=float)
+    n_rows, n_cols = values.shape
+    result = np.full(values.shape, np.nan)
+    if n_rows == 0:
+        return _like(frame, result)
+
+    # Trous internes comblés par la dernière valeur, NaN de tête remplacés par la première
+    valid = ~np.isnan(values)
+    has_data = valid.any(axis=0)
+    first = valid.argmax(axis=0)
+    last_valid_row = np.maximum.accumulate(np.where(valid, np.arange(n_rows)[:, None], 0), axis=0)
+    x = values[last_valid_row, np.arange(n_cols)]
+    x = np.where(np.arange(n_rows)[:, None] < first, values[first, np.arange(n_cols)], x)
+
+    decay = 1.0 - alpha
+    block = max(int(25 * np.log(10) / -np.log(decay)), 1) if decay > 0 else n_rows
+    previous = x[0]
+    for start in range(0, n_rows, block):
+        chunk = x[start:start + block]
+        steps = np.arange(1, len(chunk) + 1)[:, None]
+        growth = decay ** -steps.astype(float)
+        smoothed = decay ** steps * (previous + np.cumsum(alpha * chunk * growth, axis=0))
+        result[start:start + block] = smoothed
+        previous = smoothed[-1]
+
+    rows = np.arange(n_rows)[:, None]
+    result[(rows < first + min_periods - 1) | ~has_data] = np.nan
+    return _like(frame, result)
+
+
+# ==================== INDICATEURS ====================
+
+def sma(close, window):
+    return rolling_mean(close, window)
+
+
+def ema(close, span):
+    return ewm_mean(close, 2 / (span + 1), min_periods=span)
+
+
+def rsi(close, window=14):
+    """RSI de Wilder (moyennes exponentielles alpha = 1/window)"""
+    delta = close.diff()
+    gain = ewm_mean(delta.clip(lower=0), 1 / window, min_periods=window)
+    loss = ewm_mean(-delta.clip(upper=0), 1 / window, min_periods=window)
+    rs = gain / loss.where(loss != 0)
+    return (100 - 100 / (1 + rs)).where(loss != 0, 100.0).where(gain.notna())
+
+
+def macd(close, fast=12, slow=26, signal=9, fast_ema=None, slow_ema=None):
+    """Retourne (macd, signal, histogramme); EMA rapide/lente réutilisables si déjà calculées"""
+    fast_ema = ema(close, fast) if fast_ema is None else fast_ema
+    slow_ema = ema(close, slow) if slow_ema is None else slow_ema
+    line = fast_ema - slow_ema
+    signal_line = ewm_mean(line, 2 / (signal + 1), min_periods=signal)
+    return line, signal_line, line - signal_line
+
+
+def atr(high, low, close, window=14):
+    """Average True Range (lissage de Wilder)"""
+    prev_close = close.shift(1)
+    true_range = np.maximum(high - low, np.maximum((high - prev_close).abs(), (low - prev_close).abs()))
+    true_range = true_range.where(prev_close.notna(), high - low)
+    return ewm_mean(true_range, 1 / window, min_periods=window)
+
+
+def bollinger(close, window=20, num_std=2.0):
+    """Retourne (milieu, bande haute, bande basse)"""
+    mid = sma(close, window)
+    std = rolling_std(close, window, ddof=0)
+    return mid, mid + num_std * std, mid - num_std * std
+
+
+def realized_volatility(close, window=20):
+    """Volatilité réalisée annualisée des rendements log (en %)"""
+    log_returns = np.log(close / close.shift(1))
+    return rolling_std(log_returns, window) * np.sqrt(TRADING_DAYS) * 100
+
+
+def drawdown(close):
+    """Drawdown courant depuis le plus haut historique (en %, négatif)"""
+    return (close / close.cummax() - 1) * 100
+
+
+def volume_zscore(volume, window=20):
+    mean = rolling_mean(volume, window)
+    std = rolling_std(volume, window)
+    return (volume - mean) / std.where(std != 0)
+
+
+def trailing_trend(close, months=6):
+    """
+    Variation (%) de chaque ticker sur les `months` mois précédant sa dernière barre
+    (toute la fenêtre si elle est plus courte, ex: intraday)
+    Retourne une Series (index = tickers), NaN si aucune barre
+    """
+    values = close.to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    rows = np.arange(len(values))[:, None]
+    columns = np.arange(values.shape[1])
+    last_row = np.where(valid, rows, -1).max(axis=0)
+    has_data = last_row >= 0
+    since = pd.DatetimeIndex(close.index[np.maximum(last_row, 0)]) - pd.DateOffset(months=months)
+    in_window = valid & (close.index.to_numpy()[:, None] >= since.to_numpy()[None, :])
+    first_row = np.where(in_window, rows, len(values)).min(axis=0)
+    first_row = np.minimum(first_row, np.maximum(last_row, 0))
+    start = values[first_row, columns]
+    end = values[np.maximum(last_row, 0), columns]
+    return pd.Series(np.where(has_data, (end - start) / start * 100, np.nan), index=close.columns)
+
+
+# ==================== CALCUL GROUPÉ ====================
+
+def compute_indicators(panel):
+    """
+    Toutes les séries d'indicateurs pour un panel (voir to_panel)
+    Retourne {nom: DataFrame large}
+    """
+    close = panel['Close']
+    high = panel.get('High', close)
+    low = panel.get('Low', close)
+    volume = panel.get('Volume')
+
+    ema_12, ema_26 = ema(close, 12), ema(close, 26)
+    macd_line, macd_signal, macd_hist = macd(close, fast_ema=ema_12, slow_ema=ema_26)
+    bb_mid, bb_upper, bb_lower = bollinger(close)
+    band_width = bb_upper - bb_lower
+
+    series = {
+        'sma_20': bb_mid,
+        'sma_50': sma(close, 50),
+        'ema_12': ema_12,
+        'ema_26': ema_26,
+        'rsi_14': rsi(close),
+        'macd': macd_line,
+        'macd_signal': macd_signal,
+        'macd_hist': macd_hist,
+        'atr_14': atr(high, low, close),
+        'bb_upper': bb_upper,
+        'bb_lower': bb_lower,
+        'bb_pct': (close - bb_lower) / band_width.where(band_width != 0),
+        'volatility_20': realized_volatility(close),
+        'drawdown': drawdown(close),
+    }
+    if volume is not None:
+        series['volume_z'] = volume_zscore(volume)
+    return series
+
+
+def latest_snapshot(panel, series=None):
+    """
+    Dernière valeur connue de chaque indicateur, par ticker
+    Retourne un DataFrame (index = tickers, colonnes = SNAPSHOT_FIELDS)
+    """
+    if series is None:
+        series = compute_indicators(panel)
+
+    snapshot = pd.DataFrame({
+        name: frame.ffill().iloc[-1]
+        for name, frame in series.items()
+        if name != 'drawdown'
+    })
+    snapshot['max_drawdown'] = series['drawdown'].min()
+    return snapshot.reindex(columns=SNAPSHOT_FIELDS)
+
+
+def snapshot_for_history(df):
+    """Indicateurs résumés d'un seul historique OHLCV -> dict (vide si pas d'historique)"""
+    if df is None or df.empty:
+        return {}
+    row = latest_snapshot(to_panel({'_': df})).iloc[0]
+    return {name: float(value) for name, value in row.items() if pd.notna(value)}
+
+
+def snapshots_for_histories(histories):
+    """Indicateurs résumés de plusieurs historiques en un seul passage -> {ticker: dict}"""
+    panel = to_panel(histories)
+    if not panel:
+        return {}
+    snapshot = latest_snapshot(panel)
+    return {
+        ticker: {name: float(value) for name, value in row.items() if pd.notna(value)}
+        for ticker, row in snapshot.to_dict('index').items()
+    }
+
+
+# ==================== RÉSUMÉS GLISSANTS (BACKTEST) ====================
+# Le direct résume une fenêtre calendaire (ex: 6 mois) finissant à la dernière barre.
+# Ici, ce même résumé est calculé pour chaque date T du panel en un passage:
+# - fenêtres fixes (SMA, Bollinger, volatilité, z-score volume): valeur du panel complet,
+#   tant que leur fenêtre tient dans celle de T
+# - moyennes exponentielles, amorcées au début de la fenêtre de T: valeur du panel complet
+#   moins l'écart d'amorçage, qui décroît en (1 - alpha)^n (forme fermée, y compris le
+#   signal MACD, EMA d'une différence d'EMA)
+# - drawdown max depuis le début de la fenêtre: une boucle sur la position dans la fenêtre,
+#   vectorisée sur toutes les dates et tous les tickers
+
+def window_starts(index, lookback):
+    """Première ligne de la fenêtre [date - lookback, date] de chaque ligne de `index`"""
+    return np.searchsorted(index.to_numpy(), (index - lookback).to_numpy(), side='left')
+
+
+def _next_valid_rows(valid):
+    """Première ligne >= r où la colonne est valide (n_rows si aucune); une ligne sentinelle en plus"""
+    n_rows = len(valid)
+    rows = np.where(valid, np.arange(n_rows)[:, None], n_rows)
+    rows = np.vstack([rows, np.full((1, valid.shape[1]), n_rows)])
+    return np.minimum.accumulate(rows[::-1], axis=0)[::-1]
+
+
+def _window_last(values, start, needed):
+    """
+    Dernière valeur connue à chaque date, si les `needed` lignes qui l'ont produite sont
+    toutes dans la fenêtre (sinon NaN: le direct ne l'aurait pas calculée)
+    """
+    rows = np.arange(len(values))[:, None]
+    last = np.maximum.accumulate(np.where(~np.isnan(values), rows, -1), axis=0)
+    picked = values[np.maximum(last, 0), np.arange(values.shape[1])]
+    return np.where((last >= 0) & (last - needed + 1 >= start[:, None]), picked, np.nan)
+
+
+def _window_ewm(smoothed, seed_row, seed, alpha, min_periods):
+    """
+    EMA amorcée à `seed_row` (valeur `seed`) à partir de l'EMA `smoothed` du panel complet:
+    y[T] = Y[T] - (1 - alpha)^(T - a) * (Y[a] - seed), a = seed_row[T]
+    """
+    n_rows, n_cols = smoothed.shape
+    rows = np.arange(n_rows)[:, None]
+    row = np.minimum(seed_row, n_rows - 1)
+    steps = np.maximum(rows - row, 0)
+    value = smoothed - (1 - alpha) ** steps * (smoothed[row, np.arange(n_cols)] - seed)
+    return np.where((seed_row <= rows) & (rows - seed_row >= min_periods - 1), value, np.nan)
+
+
+def _geometric_weight(r, alpha, n):
+    """Poids total d'une suite r^j (j = 0..n) dans une EMA (alpha) amorcée sur son premier terme"""
+    d = 1 - alpha
+    return d ** n + alpha * r * (r ** n - d ** n) / (r - d)
+
+
+def _join_drawdowns(first, second):
+    """(plus haut, plus bas, drawdown max) de deux segments consécutifs -> ceux du segment joint"""
+    high_a, low_a, worst_a = first
+    high_b, low_b, worst_b = second
+    with np.errstate(invalid='ignore'):
+        bridge = (low_b / high_a - 1) * 100
+    return np.fmax(high_a, high_b), np.fmin(low_a, low_b), np.fmin(np.fmin(worst_a, worst_b), bridge)
+
+
+def _window_max_drawdown(values, start):
+    """
+    Drawdown max (%) de chaque fenêtre [start[T], T]: la fenêtre est découpée en segments de
+    longueur 2^k (écriture binaire de sa longueur), résumés par (plus haut, plus bas, drawdown max)
+    """
+    n_rows = len(values)
+    rows = np.arange(n_rows)
+    level = (values, values, np.where(np.isnan(values), np.nan, 0.0))
+    result = tuple(np.full(values.shape, np.nan) for _ in range(3))
+    lengths = rows - start + 1
+    end = rows + 1
+    size = 1
+    while size <= lengths.max():
+        # Segment de longueur `size` juste avant ceux déjà joints (fin de fenêtre)
+        use = (lengths & size) != 0
+        first = np.clip(end - size, 0, n_rows - 1)
+        joined = _join_drawdowns(tuple(part[first] for part in level), result)
+        result = tuple(np.where(use[:, None], new, old) for new, old in zip(joined, result))
+        end = np.where(use, end - size, end)
+        # Segments de longueur 2 * size (les derniers débordent: jamais utilisés)
+        shifted = tuple(np.vstack([part[size:], np.full((min(size, n_rows), values.shape[1]), np.nan)]) for part in level)
+        level = _join_drawdowns(level, shifted)
+        size *= 2
+    return result[2]
+
+
+def window_snapshots(panel, lookback):
+    """
+    Résumé latest_snapshot de la fenêtre [T - lookback, T], pour chaque date T du panel
+    (calendriers alignés: une barre manquante d'un ticker est une ligne NaN, comme dans to_panel)
+    Retourne {champ de SNAPSHOT_FIELDS: DataFrame large}
+    """
+    close = panel['Close']
+    high = panel.get('High', close)
+    low = panel.get('Low', close)
+    series = compute_indicators(panel)
+    start = window_starts(close.index, lookback)
+    n_rows, n_cols = close.shape
+    columns = np.arange(n_cols)
+    values = close.to_numpy(dtype=float)
+
+    snapshot = {}
+    for name, needed in (('sma_20', 20), ('sma_50', 50), ('bb_upper', 20), ('bb_lower', 20),
+                         ('bb_pct', 20), ('volatility_20', 21), ('volume_z', 20)):
+        if name in series:
+            snapshot[name] = _window_last(series[name].to_numpy(dtype=float), start, needed)
+
+    # EMA du cours, amorcées à la première clôture de la fenêtre
+    seed_row = _next_valid_rows(~np.isnan(values))[start]
+    seed = values[np.minimum(seed_row, n_rows - 1), columns]
+    fast_alpha, slow_alpha, signal_alpha = 2 / 13, 2 / 27, 2 / 10
+    fast_full = ewm_mean(close, fast_alpha).to_numpy()
+    slow_full = ewm_mean(close, slow_alpha).to_numpy()
+    snapshot['ema_12'] = _window_ewm(fast_full, seed_row, seed, fast_alpha, 12)
+    snapshot['ema_26'] = _window_ewm(slow_full, seed_row, seed, slow_alpha, 26)
+
+    # MACD: ligne valide 25 lignes après l'amorce, signal amorcé sur cette première valeur
+    line = snapshot['ema_12'] - snapshot['ema_26']
+    line_full = fast_full - slow_full
+    signal_full = ewm_mean(_like(close, line_full), signal_alpha).to_numpy()
+    line_row = seed_row + 25
+    line_seed_row = np.minimum(line_row, n_rows - 1)
+    line_seed = _window_ewm(signal_full, line_row, line_full[line_seed_row, columns], signal_alpha, 1)
+    steps = np.maximum(np.arange(n_rows)[:, None] - line_row, 0)
+    fast_gap = fast_full[np.minimum(seed_row, n_rows - 1), columns] - seed
+    slow_gap = slow_full[np.minimum(seed_row, n_rows - 1), columns] - seed
+    fast_decay, slow_decay = 1 - fast_alpha, 1 - slow_alpha
+    signal = (line_seed
+              - fast_gap * fast_decay ** 25 * _geometric_weight(fast_decay, signal_alpha, steps)
+              + slow_gap * slow_decay ** 25 * _geometric_weight(slow_decay, signal_alpha, steps))
+    signal = np.where(np.arange(n_rows)[:, None] - line_row >= 8, signal, np.nan)
+    snapshot['macd'] = line
+    snapshot['macd_signal'] = signal
+    snapshot['macd_hist'] = line - signal
+
+    # RSI: variations disponibles à partir de la deuxième ligne de la fenêtre
+    delta = close.diff()
+    gain = delta.clip(lower=0).to_numpy(dtype=float)
+    loss = (-delta.clip(upper=0)).to_numpy(dtype=float)
+    delta_row = _next_valid_rows(~np.isnan(gain))[np.minimum(start + 1, n_rows)]
+    delta_seed_row = np.minimum(delta_row, n_rows - 1)
+    window_gain = _window_ewm(ewm_mean(_like(close, gain), 1 / 14).to_numpy(), delta_row,
+                              gain[delta_seed_row, columns], 1 / 14, 14)
+    window_loss = _window_ewm(ewm_mean(_like(close, loss), 1 / 14).to_numpy(), delta_row,
+                              loss[delta_seed_row, columns], 1 / 14, 14)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rsi_value = np.where(window_loss != 0, 100 - 100 / (1 + window_gain / window_loss), 100.0)
+    snapshot['rsi_14'] = np.where(np.isnan(window_gain), np.nan, rsi_value)
+
+    # ATR: sans clôture précédente, la première ligne de la fenêtre prend high - low
+    prev_close = close.shift(1)
+    range_ = (high - low).to_numpy(dtype=float)
+    true_range = np.maximum(high - low, np.maximum((high - prev_close).abs(), (low - prev_close).abs()))
+    true_range = true_range.where(prev_close.notna(), high - low).to_numpy(dtype=float)
+    first_range = range_[start, :]
+    range_row = np.where(np.isnan(first_range), _next_valid_rows(~np.isnan(true_range))[np.minimum(start + 1, n_rows)],
+                         start[:, None])
+    range_seed = np.where(np.isnan(first_range), true_range[np.minimum(range_row, n_rows - 1), columns], first_range)
+    snapshot['atr_14'] = _window_ewm(ewm_mean(_like(close, true_range), 1 / 14).to_numpy(), range_row,
+                                     range_seed, 1 / 14, 14)
+
+    # Drawdown max depuis le début de la fenêtre (plus haut repris à zéro au début)
+    snapshot['max_drawdown'] = _window_max_drawdown(values, start)
+
+    return {name: _like(close, snapshot[name]) for name in SNAPSHOT_FIELDS if name in snapshot}
+
+
+def window_trend(close, lookback, months=6):
+    """trailing_trend de la fenêtre [T - lookback, T], pour chaque date T (DataFrame large)"""
+    values = close.to_numpy(dtype=float)
+    n_rows, n_cols = values.shape
+    start = np.maximum(window_starts(close.index, lookback), window_starts(close.index, pd.DateOffset(months=months)))
+    first = _next_valid_rows(~np.isnan(values))[start]
+    base = values[np.minimum(first, n_rows - 1), np.arange(n_cols)]
+    trend = np.where(first <= np.arange(n_rows)[:, None], (values - base) / base * 100, np.nan)
+    return _like(close, trend)
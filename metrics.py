@@ -0,0 +1,246 @@
+"""
+Instrumentation: spans de latence, compteurs, export Prometheus
+
+Registre unique par process, thread-safe, sans dépendance externe.
+- span(nom, **labels): durée d'un bloc -> histogramme `ai_hunter_<nom>_seconds`
+  (label `outcome`: ok / error / valeur fixée par l'appelant) + liste des spans récents
+- inc(nom, valeur, **labels): compteur -> `ai_hunter_<nom>_total`
+Export au format texte Prometheus: fichier (textfile collector) et/ou endpoint /metrics.
+"""
+import os
+import re
+import bisect
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "ai_hunter"
+# Bornes des histogrammes (s): des tentatives HTTP de quelques ms aux appels IA de plusieurs s
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Spans gardés pour le panneau de debug
+RECENT_SPANS = 300
+# Durées gardées par série pour les percentiles du panneau (l'histogramme, lui, est complet)
+SAMPLE_SIZE = 256
+
+_NAME_RE = re.compile(r'[^a-zA-Z0-9_]')
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{_NAME_RE.sub("_", key)}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(int(q * len(sorted_values)), len(sorted_values) - 1)]
+
+
+class Registry:
+    """Compteurs et histogrammes indexés par (nom, labels)"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, recent=RECENT_SPANS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}  # (nom, labels) -> valeur
+        self._histograms = {}  # (nom, labels) -> {'buckets', 'sum', 'count', 'samples'}
+        self._help = {}
+        self._recent = deque(maxlen=recent)
+
+    def describe(self, name, help_text):
+        """Texte `# HELP` d'une métrique (nom sans préfixe ni suffixe)"""
+        self._help[name] = help_text
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = {
+                    'buckets': [0] * len(self.buckets),
+                    'sum': 0.0,
+                    'count': 0,
+                    'samples': deque(maxlen=SAMPLE_SIZE),
+                }
+            index = bisect.bisect_left(self.buckets, seconds)
+            if index < len(self.buckets):
+                hist['buckets'][index] += 1
+            hist['sum'] += seconds
+            hist['count'] += 1
+            hist['samples'].append(seconds)
+
+    @contextmanager
+    def span(self, name, **labels):
+        """
+        Mesure la durée du bloc -> histogramme `<nom>_seconds`
+        Produit un dict dont la clé 'outcome' peut être modifiée par l'appelant
+        (ex: 'fail' quand une source renvoie None sans lever d'exception)
+        """
+        info = {'outcome': 'ok'}
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            yield info
+        except BaseException:
+            info['outcome'] = 'error'
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe(f"{name}_seconds", elapsed, outcome=info['outcome'], **labels)
+            with self._lock:
+                self._recent.append({
+                    'name': name,
+                    'labels': labels,
+                    'outcome': info['outcome'],
+                    'started_at': started_at,
+                    'elapsed': elapsed,
+                    'thread': threading.current_thread().name,
+                })
+
+    # ---------- Lecture ----------
+
+    def recent_spans(self, since=None):
+        """Spans terminés (plus récents en dernier), optionnellement depuis un timestamp"""
+        with self._lock:
+            spans = list(self._recent)
+        if since is not None:
+            spans = [s for s in spans if s['started_at'] >= since]
+        return spans
+
+    def summary(self):
+        """Par étape (histogramme): nombre, moyenne, p50, p95, max sur les dernières mesures"""
+        with self._lock:
+            items = [(key, hist['count'], hist['sum'], sorted(hist['samples'])) for key, hist in self._histograms.items()]
+        rows = []
+        for (name, label_key), count, total, samples in sorted(items):
+            rows.append({
+                'metric': name,
+                'labels': ", ".join(f"{k}={v}" for k, v in label_key),
+                'count': count,
+                'mean_ms': round(1000 * total / count, 1) if count else None,
+                'p50_ms': round(1000 * _percentile(samples, 0.5), 1) if samples else None,
+                'p95_ms': round(1000 * _percentile(samples, 0.95), 1) if samples else None,
+                'max_ms': round(1000 * samples[-1], 1) if samples else None,
+            })
+        return rows
+
+    def counters(self):
+        with self._lock:
+            items = sorted(self._counters.items())
+        return [
+            {'metric': name, 'labels': ", ".join(f"{k}={v}" for k, v in label_key), 'value': value}
+            for (name, label_key), value in items
+        ]
+
+    # ---------- Export ----------
+
+    def to_prometheus(self):
+        """Toutes les métriques au format texte Prometheus (exposition 0.0.4)"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                ((key, list(hist['buckets']), hist['sum'], hist['count']) for key, hist in self._histograms.items()),
+                key=lambda item: item[0]
+            )
+
+        lines = []
+        declared = set()
+
+        def declare(metric, name, kind):
+            if metric in declared:
+                return
+            declared.add(metric)
+            if name in self._help:
+                lines.append(f"# HELP {metric} {self._help[name]}")
+            lines.append(f"# TYPE {metric} {kind}")
+
+        for (name, label_key), value in counters:
+            metric = f"{PREFIX}_{_NAME_RE.sub('_', name)}_total"
+            declare(metric, name, 'counter')
+            lines.append(f"{metric}{_format_labels(label_key)} {value}")
+
+        for (name, label_key), buckets, total, count in histograms:
+            metric = f"{PREFIX}_{_NAME_RE.sub('_', name)}"
+            declare(metric, name, 'histogram')
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, buckets):
+                cumulative += bucket_count
+                lines.append(f"{metric}_bucket{_format_labels(label_key, [('le', repr(bound))])} {cumulative}")
+            lines.append(f"{metric}_bucket{_format_labels(label_key, [('le', '+Inf')])} {count}")
+            lines.append(f"{metric}_sum{_format_labels(label_key)} {total}")
+            lines.append(f"{metric}_count{_format_labels(label_key)} {count}")
+
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """Écriture atomique (fichier temporaire + rename) pour le textfile collector de node_exporter"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+
+REGISTRY = Registry()
+
+span = REGISTRY.span
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+describe = REGISTRY.describe
+
+
+# ==================== EXPORTEURS ====================
+
+def serve_http(port, host="0.0.0.0", registry=REGISTRY):
+    """Endpoint /metrics dans un thread daemon. Retourne le serveur"""
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/metrics', '/'):
+                self.send_error(404)
+                return
+            body = registry.to_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def write_periodically(path, interval, registry=REGISTRY):
+    """Réécrit le fichier de métriques toutes les `interval` s dans un thread daemon"""
+    def loop():
+        while True:
+            try:
+                registry.write_textfile(path)
+            except OSError:
+                pass
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="metrics-file", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,200 @@
+"""
+Pré-scoring local déterministe des personas (NumPy / pandas)
+
+Un score 0-100 par persona à partir des champs du dict de données (PE, market cap,
+dette, croissance, tendance) et des indicateurs issus de l'historique. Tout est
+calculé sur un DataFrame de features (index = tickers): un ticker ou des milliers
+en un seul passage, sans appel réseau.
+Usages: filtre avant le LLM (seuls les meilleurs / cas limites lui sont envoyés)
+et verdict de repli instantané (clé OpenAI absente, appel en échec).
+"""
+import numpy as np
+import pandas as pd
+
+# Champs scalaires du dict de données et indicateurs (voir indicators.SNAPSHOT_FIELDS) utilisés
+DATA_FIELDS = ['current_price', 'trend_6m', 'trailing_pe', 'market_cap', 'debt', 'revenue_growth']
+INDICATOR_FIELDS = ['rsi_14', 'macd_hist', 'sma_50', 'volatility_20', 'max_drawdown', 'volume_z']
+# 0 = valeur inconnue pour ces champs (sources dégradées, fondamentaux absents)
+UNKNOWN_IF_ZERO = ['trailing_pe', 'market_cap', 'debt', 'revenue_growth']
+
+# Poids des composantes par persona (somme = 1). Chaque composante est dans [-1, 1]:
+# score = 50 + 50 * somme pondérée, donc toujours entre 0 et 100
+PERSONA_WEIGHTS = {
+    "Warren": {'value': 0.55, 'growth': 0.15, 'momentum': 0.1, 'safety': 0.2},
+    "Cathie": {'value': 0.05, 'growth': 0.6, 'momentum': 0.25, 'safety': 0.1},
+    "Jim": {'value': 0.05, 'growth': 0.15, 'momentum': 0.7, 'safety': 0.1},
+}
+COMPONENTS = ['value', 'growth', 'momentum', 'safety']
+COMPONENT_LABELS = {'value': 'valeur', 'growth': 'croissance', 'momentum': 'momentum', 'safety': 'risque'}
+
+# Mêmes seuils que les prompts IA (VERDICT_LOGIC): < 45 SELL, > 66 BUY, HOLD entre les deux
+SELL_BELOW = 45
+BUY_ABOVE = 66
+# Volatilité 20j annualisée (%) au-delà de laquelle le risque passe MEDIUM / HIGH
+RISK_MEDIUM_VOL = 25
+RISK_HIGH_VOL = 45
+
+
+# ==================== FEATURES ====================
+
+def features_frame(records):
+    """
+    {ticker: dict de données (ou QuoteSnapshot)} -> DataFrame (index = tickers)
+    Champs absents ou inconnus: NaN (composante neutre)
+    """
+    rows = []
+    for data in records.values():
+        ind = data.get('indicators') or {}
+        rows.append([data.get(field) for field in DATA_FIELDS] + [ind.get(field) for field in INDICATOR_FIELDS])
+    features = pd.DataFrame(
+        np.array(rows, dtype=float).reshape(len(rows), len(DATA_FIELDS) + len(INDICATOR_FIELDS)),
+        index=list(records), columns=DATA_FIELDS + INDICATOR_FIELDS
+    )
+    return mark_unknown(features)
+
+
+def mark_unknown(features):
+    """Features déjà en colonnes (ex: backtest): 0 -> NaN pour les champs où 0 signifie inconnu"""
+    features[UNKNOWN_IF_ZERO] = features[UNKNOWN_IF_ZERO].where(features[UNKNOWN_IF_ZERO] != 0)
+    return features
+
+
+def _unit(values):
+    """Borne à [-1, 1], NaN -> 0 (neutre)"""
+    return np.nan_to_num(np.clip(values, -1.0, 1.0), nan=0.0)
+
+
+def _mean(*parts):
+    """Moyenne des sous-scores disponibles (NaN ignorés), 0 si aucun"""
+    stacked = np.vstack(parts)
+    available = ~np.isnan(stacked)
+    count = available.sum(axis=0)
+    total = np.where(available, stacked, 0.0).sum(axis=0)
+    return np.where(count > 0, total / np.maximum(count, 1), 0.0)
+
+
+def component_scores(features):
+    """
+    Composantes dans [-1, 1] par ticker:
+    - value: PE bas, endettement faible par rapport à la capitalisation
+    - growth: croissance du chiffre d'affaires, tendance 6 mois
+    - momentum: tendance, RSI (surachat pénalisé), MACD, prix vs SMA50, volume
+    - safety: volatilité et drawdown faibles
+    """
+    f = {column: features[column].to_numpy(dtype=float) for column in features.columns}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pe = np.where(f['trailing_pe'] > 0, f['trailing_pe'], np.nan)
+        leverage = f['debt'] / f['market_cap']
+        above_sma = (f['current_price'] / f['sma_50'] - 1) * 100
+        macd_pct = f['macd_hist'] / f['current_price'] * 100
+    rsi = f['rsi_14']
+
+    value = _mean(
+        np.clip((25 - pe) / 15, -1, 1),
+        np.clip((0.5 - leverage) / 0.5, -1, 1),
+    )
+    growth = _mean(
+        np.clip(f['revenue_growth'] / 0.25, -1, 1),
+        np.clip(f['trend_6m'] / 40, -1, 1),
+    )
+    momentum = _mean(
+        np.clip(f['trend_6m'] / 30, -1, 1),
+        np.clip((rsi - 50) / 20, -1, 1) - np.clip((rsi - 75) / 10, 0, 1),
+        np.clip(macd_pct / 1.0, -1, 1),
+        np.clip(above_sma / 10, -1, 1),
+        np.clip(f['volume_z'] / 3, -1, 1) * np.sign(np.nan_to_num(f['trend_6m'])),
+    )
+    safety = _mean(
+        np.clip((35 - f['volatility_20']) / 25, -1, 1),
+        np.clip((f['max_drawdown'] + 25) / 25, -1, 1),
+    )
+    return pd.DataFrame(
+        {'value': _unit(value), 'growth': _unit(growth), 'momentum': _unit(momentum), 'safety': _unit(safety)},
+        index=features.index
+    )
+
+
+# ==================== SCORES ====================
+
+def persona_scores(components, personas=None):
+    """Scores 0-100 (index = tickers, colonnes = personas): un produit matriciel"""
+    personas = list(personas or PERSONA_WEIGHTS)
+    weights = np.array([[PERSONA_WEIGHTS[p][c] for p in personas] for c in COMPONENTS])
+    scores = 50 + 50 * components[COMPONENTS].to_numpy() @ weights
+    return pd.DataFrame(np.round(scores, 1), index=components.index, columns=personas)
+
+
+def verdict_labels(scores):
+    """BUY / HOLD / SELL selon les seuils des prompts IA"""
+    values = scores.to_numpy()
+    labels = np.select([values < SELL_BELOW, values > BUY_ABOVE], ['SELL', 'BUY'], 'HOLD')
+    return pd.DataFrame(labels, index=scores.index, columns=scores.columns)
+
+
+def risk_labels(features):
+    """LOW / MEDIUM / HIGH selon la volatilité 20j (MEDIUM si inconnue)"""
+    vol = features['volatility_20'].to_numpy(dtype=float)
+    labels = np.select([vol < RISK_MEDIUM_VOL, vol >= RISK_HIGH_VOL], ['LOW', 'HIGH'], 'MEDIUM')
+    return pd.Series(labels, index=features.index)
+
+
+def score_records(records, personas=None):
+    """
+    Tout le pipeline pour {ticker: données}
+    Retourne (features, composantes, scores par persona)
+    """
+    features = features_frame(records)
+    components = component_scores(features)
+    return features, components, persona_scores(components, personas)
+
+
+# ==================== FILTRE AVANT LLM ====================
+
+def select_for_llm(scores, top_n=0, margin=5.0):
+    """
+    Masque (tickers x personas) des analyses à confier au LLM:
+    - les `top_n` meilleurs scores de chaque persona (0 = aucun filtre: tout est envoyé)
+    - les cas limites, à moins de `margin` points d'un seuil de verdict
+    """
+    if not top_n:
+        return pd.DataFrame(True, index=scores.index, columns=scores.columns)
+    values = scores.to_numpy()
+    # Rang par persona (0 = meilleur score), égalités départagées par ordre des tickers
+    ranks = np.argsort(np.argsort(-values, axis=0, kind='stable'), axis=0)
+    borderline = (np.abs(values - SELL_BELOW) <= margin) | (np.abs(values - BUY_ABOVE) <= margin)
+    return pd.DataFrame((ranks < top_n) | borderline, index=scores.index, columns=scores.columns)
+
+
+# ==================== VERDICTS LOCAUX ====================
+
+def local_verdicts(records, personas=None):
+    """
+    Verdicts au format de l'analyse IA, calculés localement
+    Retourne {ticker: {persona: {verdict, score, thesis, risk, source}}}
+    """
+    if not records:
+        return {}
+    features, components, scores = score_records(records, personas)
+    personas = list(scores.columns)
+    # Tableaux NumPy -> listes Python: pas d'accès cellule par cellule au DataFrame
+    verdicts = verdict_labels(scores).to_numpy().tolist()
+    rounded = np.rint(scores.to_numpy()).astype(int).tolist()
+    risks = risk_labels(features).tolist()
+    parts = components[COMPONENTS].to_numpy().tolist()
+
+    results = {}
+    for i, ticker in enumerate(scores.index):
+        thesis = "Score local: " + ", ".join(
+            f"{COMPONENT_LABELS[c]} {value:+.2f}" for c, value in zip(COMPONENTS, parts[i])
+        )
+        results[ticker] = {
+            persona: {
+                'verdict': verdicts[i][j],
+                'score': rounded[i][j],
+                'thesis': thesis,
+                'risk': risks[i],
+                'source': 'local',
+            }
+            for j, persona in enumerate(personas)
+        }
+    return results
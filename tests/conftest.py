@@ -0,0 +1,17 @@
+"""Configuration commune: moteur importé depuis la racine, stockage local dans un dossier temporaire"""
+import os
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# À fixer avant l'import du moteur (lu à l'import)
+os.environ.setdefault('AI_HUNTER_DATA_DIR', tempfile.mkdtemp(prefix="ai-hunter-tests-"))
+os.environ['AI_HUNTER_METRICS_PORT'] = "0"
+sys.path.insert(0, ROOT_DIR)
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return f.read()
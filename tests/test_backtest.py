@@ -0,0 +1,123 @@
+"""Backtest: features identiques au direct, archive des verdicts IA sans expiration"""
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtest
+import engine
+import indicators
+import scoring
+
+
+def make_histories(days=400, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range('2020-01-01', periods=days)
+    histories = {}
+    for ticker in ['AAA', 'BBB', 'CCC']:
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, days)))
+        histories[ticker] = pd.DataFrame({
+            'Open': close,
+            'High': close * (1 + rng.uniform(0, 0.02, days)),
+            'Low': close * (1 - rng.uniform(0, 0.02, days)),
+            'Close': close,
+            'Volume': rng.integers(100_000, 1_000_000, days).astype(float),
+        }, index=index)
+    # Coté en cours de route: fenêtres partielles au début
+    histories['CCC'] = histories['CCC'].iloc[150:]
+    return histories
+
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    cache = engine.VerdictCache(ttl=60, disk_path=str(tmp_path / "verdicts.sqlite"))
+    archive = engine.VerdictArchive(disk_path=str(tmp_path / "archive.sqlite"))
+    monkeypatch.setattr(engine, 'get_verdict_cache', lambda: cache)
+    monkeypatch.setattr(engine, 'get_verdict_archive', lambda: archive)
+    return cache, archive
+
+
+def test_features_match_live_stock_data():
+    histories = make_histories()
+    panel = indicators.to_panel(histories)
+    lookback = engine.period_offset(engine.DEFAULT_HISTORY_PERIOD)
+    dates = panel['Close'].index[[130, 160, 200, 250, 399]]
+    features = backtest.feature_frame(panel, dates, lookback=lookback)
+
+    checked = 0
+    for date in dates:
+        for ticker, df in histories.items():
+            if date not in df.index:
+                assert (date, ticker) not in features.index
+                continue
+            # Ce que le direct charge à `date`: fetch_history_incremental -> store.load(start=period_start)
+            window = df[df.index >= engine.period_start(engine.DEFAULT_HISTORY_PERIOD, now=date)].loc[:date]
+            live = engine.build_stock_data(ticker, window, {}, 'API YFINANCE')
+            row = features.loc[(date, ticker)]
+            assert row['current_price'] == pytest.approx(live['current_price'])
+            assert row['trend_6m'] == pytest.approx(live['trend_6m'])
+            for field in indicators.SNAPSHOT_FIELDS:
+                if field in live['indicators']:
+                    assert row[field] == pytest.approx(live['indicators'][field], rel=1e-9), (date, ticker, field)
+                else:
+                    assert np.isnan(row[field]), (date, ticker, field)
+            checked += 1
+    assert checked == 14
+
+
+def test_archive_never_expires(tmp_path, monkeypatch):
+    archive = engine.VerdictArchive(disk_path=str(tmp_path / "archive.sqlite"))
+    archive.put('key', {'verdict': 'BUY', 'score': 80})
+    monkeypatch.setattr(engine.time, 'time', lambda: 1e12)
+    reopened = engine.VerdictArchive(disk_path=str(tmp_path / "archive.sqlite"))
+    assert reopened.get('key') == {'verdict': 'BUY', 'score': 80}
+
+
+def test_cache_hit_is_copied_to_archive(stores):
+    cache, archive = stores
+    data = backtest.to_data('AAA', {'current_price': 100.0, 'trend_6m': 5.0})
+    system_prompt, user_message = engine.persona_prompt('Warren', data)
+    key = engine.verdict_cache_key(system_prompt, engine.AI_MODEL, user_message)
+    cache.put(key, {'verdict': 'HOLD', 'score': 50})
+
+    assert engine.cached_ai_verdict('Warren', data) == {'verdict': 'HOLD', 'score': 50}
+    assert archive.get(key) == {'verdict': 'HOLD', 'score': 50}
+
+
+def test_live_misses_are_concurrent_and_bounded():
+    panel = indicators.to_panel(make_histories())
+    dates = backtest.rebalance_dates(panel['Close'])
+    features = backtest.feature_frame(panel, dates)
+    threads = set()
+
+    def miss_fn(persona, data):
+        threads.add(threading.current_thread().name)
+        return {'verdict': 'BUY', 'score': 70}
+
+    verdicts, scores, calls = backtest.verdict_frame_from(
+        features, ['Warren', 'Jim'], lambda persona, data: None, miss_fn, workers=4, max_calls=5
+    )
+    assert calls == 5
+    assert (verdicts.to_numpy() == 'BUY').sum() == 5
+    assert all(name.startswith('backtest-ai') for name in threads)
+
+
+def test_replay_from_archive(stores):
+    _, archive = stores
+    panel = indicators.to_panel(make_histories())
+    local = backtest.run(panel)
+
+    # Verdicts "IA" archivés pour chaque ligne = verdicts du scorer local
+    features = backtest.feature_frame(panel, local['dates'])
+    features = scoring.mark_unknown(features)
+    for (date, ticker), row in features.iterrows():
+        data = backtest.to_data(ticker, row.to_dict())
+        for persona in local['hit_rates'].index:
+            system_prompt, user_message = engine.persona_prompt(persona, data)
+            key = engine.verdict_cache_key(system_prompt, engine.AI_MODEL, user_message)
+            archive.put(key, {'verdict': local['verdicts'].loc[(date, ticker), persona], 'score': 50})
+
+    replay = backtest.run(panel, verdict_fn=engine.cached_ai_verdict)
+    assert replay['calls'] == 0
+    pd.testing.assert_frame_equal(replay['hit_rates'], local['hit_rates'])
@@ -0,0 +1,54 @@
+"""Cache journalier des fondamentaux: résultats positifs et négatifs"""
+import sys
+import types
+
+import pytest
+
+import engine
+
+
+@pytest.fixture
+def yahoo(monkeypatch, tmp_path):
+    infos = {'AAPL': {'longName': 'Apple Inc.', 'marketCap': 3e12, 'trailingPE': 30.0}}
+    calls = []
+
+    class Ticker:
+        def __init__(self, symbol, session=None):
+            self.symbol = symbol
+
+        @property
+        def info(self):
+            calls.append(self.symbol)
+            if self.symbol == 'DOWN':
+                raise ConnectionError("timeout")
+            return infos.get(self.symbol, {})
+
+    cache = engine.FundamentalsCache(disk_path=str(tmp_path / "fundamentals.sqlite"), negative_ttl=60)
+    monkeypatch.setitem(sys.modules, 'yfinance', types.SimpleNamespace(Ticker=Ticker))
+    monkeypatch.setattr(engine, 'get_fundamentals_cache', lambda: cache)
+    monkeypatch.setattr(engine, 'get_http_session', lambda: None)
+    return calls, cache
+
+
+def test_positive_result_is_cached(yahoo):
+    calls, _ = yahoo
+    assert engine.get_fundamentals('AAPL')['trailing_pe'] == 30.0
+    assert engine.get_fundamentals('AAPL')['name'] == 'Apple Inc.'
+    assert calls == ['AAPL']
+
+
+@pytest.mark.parametrize('ticker', ['NOFUND', 'DOWN'])
+def test_negative_result_is_cached(yahoo, ticker):
+    calls, _ = yahoo
+    assert engine.get_fundamentals(ticker) is None
+    assert engine.get_fundamentals(ticker) is None
+    assert engine.get_fundamentals_batch([ticker]) == {}
+    assert calls == [ticker]
+
+
+def test_negative_result_expires(yahoo):
+    calls, cache = yahoo
+    engine.get_fundamentals('NOFUND')
+    cache._unavailable['NOFUND'] = 0   # TTL écoulé
+    engine.get_fundamentals('NOFUND')
+    assert calls == ['NOFUND', 'NOFUND']
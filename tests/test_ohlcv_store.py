@@ -0,0 +1,94 @@
+"""Stockage local OHLCV: delta incrémental et changement de base d'ajustement"""
+import sys
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import engine
+
+
+class FakeYahoo:
+    """fetch_range(period=... | start=..., interval=...) sur une série journalière ajustée par `factor`"""
+
+    def __init__(self, days=200):
+        self.index = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=days)
+        self.close = pd.Series(np.linspace(100, 120, days), index=self.index)
+        self.factor = 1.0
+        self.calls = []
+
+    def __call__(self, period=None, start=None, interval='1d'):
+        self.calls.append('period' if period else 'start')
+        begin = engine.period_start(period) if period else pd.Timestamp(start)
+        close = self.close[self.close.index >= begin] * self.factor
+        return pd.DataFrame({'Open': close, 'High': close, 'Low': close, 'Close': close, 'Volume': 1000.0})
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = engine.OHLCVStore(str(tmp_path / "ohlcv.sqlite"))
+    monkeypatch.setattr(engine, 'get_ohlcv_store', lambda: store)
+    return store
+
+
+def test_delta_fetch_when_store_covers_window(store):
+    yahoo = FakeYahoo()
+    first = engine.fetch_history_incremental("AAA", yahoo, period="6mo")
+    again = engine.fetch_history_incremental("AAA", yahoo, period="6mo")
+    assert yahoo.calls == ['period', 'start']
+    pd.testing.assert_frame_equal(first, again)
+
+
+def test_dividend_adjustment_triggers_full_refetch(store):
+    yahoo = FakeYahoo()
+    engine.fetch_history_incremental("AAA", yahoo, period="6mo")
+    # Dividende: Yahoo réajuste tout l'historique (-1 %)
+    yahoo.factor = 0.99
+    df = engine.fetch_history_incremental("AAA", yahoo, period="6mo")
+    assert yahoo.calls == ['period', 'start', 'period']
+    expected = yahoo.close[yahoo.close.index >= df.index[0]] * 0.99
+    np.testing.assert_allclose(df['Close'].to_numpy(), expected.to_numpy())
+
+
+def test_same_basis_ignores_partial_last_bar(store):
+    yahoo = FakeYahoo()
+    store.append("AAA", '1d', yahoo(period="1mo"))
+    fresh = yahoo(period="1mo")
+    fresh.iloc[-1, fresh.columns.get_loc('Close')] *= 1.05   # dernière barre finalisée depuis
+    assert store.same_basis("AAA", '1d', fresh)
+    fresh.iloc[-2, fresh.columns.get_loc('Close')] *= 1.05
+    assert not store.same_basis("AAA", '1d', fresh)
+
+
+@pytest.mark.parametrize('failure', [None, pd.DataFrame()])
+def test_failed_download_does_not_serve_stored_bars(store, failure):
+    yahoo = FakeYahoo()
+    stored = engine.fetch_history_incremental("AAA", yahoo, period="6mo")
+    # Réseau en échec: le stock local ne doit pas passer pour une donnée fraîche
+    assert engine.fetch_history_incremental("AAA", lambda **kwargs: failure, period="6mo") is None
+    offline = engine.fetch_history_incremental("AAA", lambda **kwargs: failure, period="6mo", allow_stale=True)
+    pd.testing.assert_frame_equal(offline, stored)
+
+
+def test_failed_rebase_download_returns_none(store):
+    yahoo = FakeYahoo()
+    engine.fetch_history_incremental("AAA", yahoo, period="6mo")
+    yahoo.factor = 0.99
+
+    def delta_only(period=None, start=None, interval='1d'):
+        return yahoo(start=start, interval=interval) if start else None
+
+    assert engine.fetch_history_incremental("AAA", delta_only, period="6mo") is None
+
+
+def test_failed_batch_download_omits_stored_tickers(store, monkeypatch):
+    engine.fetch_history_incremental("AAA", FakeYahoo(), period="6mo")
+
+    def download(*args, **kwargs):
+        raise ConnectionError("timeout")
+
+    monkeypatch.setitem(sys.modules, 'yfinance', types.SimpleNamespace(download=download))
+    monkeypatch.setattr(engine, 'get_http_session', lambda: None)
+    assert engine.fetch_histories_batch(["AAA"], period="6mo") == {}
+    assert list(engine.fetch_histories_batch(["AAA"], period="6mo", allow_stale=True)) == ["AAA"]
@@ -0,0 +1,59 @@
+"""JSON incrémental: objet partiel d'une réponse IA en cours de streaming"""
+import json
+
+import pytest
+
+import engine
+
+RESPONSE = '{"verdict": "BUY", "score": 75, "thesis": "Marges \\"solides\\" \\u00e9lev\\u00e9es", "risk": "Valorisation", "flags": [true, null, -1.5e2]}'
+
+
+def test_complete_document_matches_json_loads():
+    assert engine.parse_partial_json(RESPONSE) == json.loads(RESPONSE)
+
+
+@pytest.mark.parametrize('cut', range(len(RESPONSE) + 1))
+def test_every_prefix_is_a_consistent_partial(cut):
+    partial = engine.parse_partial_json(RESPONSE[:cut])
+    expected = json.loads(RESPONSE)
+    if partial is None:
+        return
+    assert isinstance(partial, dict)
+    for key, value in partial.items():
+        if isinstance(value, engine.PartialString):
+            assert expected[key].startswith(value)
+        elif isinstance(value, list):
+            assert expected[key][:len(value)] == value
+        else:
+            assert value == expected[key]
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('', None),
+    ('{', {}),
+    ('{"verdict": "BU', {'verdict': 'BU'}),
+    ('{"verdict": "BUY", "sco', {'verdict': 'BUY'}),
+    ('{"verdict": "BUY", "score"', {'verdict': 'BUY'}),
+    ('{"score": 7', {}),                      # nombre peut-être incomplet (75)
+    ('{"score": 75,', {'score': 75}),
+    ('{"ok": tr', {}),
+    ('{"ok": true', {'ok': True}),
+    ('{"thesis": "a\\', {'thesis': 'a'}),     # échappement coupé
+    ('{"thesis": "\\u00e', {'thesis': ''}),
+])
+def test_prefixes(text, expected):
+    assert engine.parse_partial_json(text) == expected
+
+
+def test_open_strings_are_flagged():
+    partial = engine.parse_partial_json('{"verdict": "BUY", "thesis": "Croiss')
+    assert not isinstance(partial['verdict'], engine.PartialString)
+    assert isinstance(partial['thesis'], engine.PartialString)
+    assert engine.partial_verdict(partial) == {'verdict': 'BUY', 'thesis': 'Croiss'}
+    assert engine.partial_verdict(engine.parse_partial_json('{"verdict": "BU')) == {}
+
+
+@pytest.mark.parametrize('text', ['{"a" 1}', '{"a": 1 "b": 2}', '{1: 2}', '{"a": x}', '{"a": "\\q"}', '{"a": 1.2.3}'])
+def test_invalid_prefix_raises(text):
+    with pytest.raises(ValueError):
+        engine.parse_partial_json(text)
@@ -0,0 +1,148 @@
+"""Suivi de santé des sources: circuit breaker et classement des échecs"""
+import pytest
+
+import engine
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(engine.time, 'monotonic', clock)
+    return clock
+
+
+@pytest.fixture
+def health(clock):
+    return engine.ProviderHealth(failure_threshold=3, cooldown=60, probe_timeout=30)
+
+
+def trip(health, name="yahoo"):
+    for _ in range(health.failure_threshold):
+        health.record(name, False, 0.1)
+
+
+def test_opens_after_consecutive_failures(health):
+    health.record("yahoo", False, 0.1)
+    health.record("yahoo", False, 0.1)
+    assert health.circuit("yahoo") == 'closed'
+    health.record("yahoo", False, 0.1)
+    assert health.circuit("yahoo") == 'open'
+    assert not health.acquire("yahoo")
+
+
+def test_success_resets_failure_count(health):
+    health.record("yahoo", False, 0.1)
+    health.record("yahoo", False, 0.1)
+    health.record("yahoo", True, 0.1)
+    health.record("yahoo", False, 0.1)
+    assert health.circuit("yahoo") == 'closed'
+
+
+def test_empty_result_is_not_a_failure(health):
+    for _ in range(10):
+        health.record("yahoo", None, 0.1)
+    assert health.circuit("yahoo") == 'closed'
+    assert health.expected_latency("yahoo") == 0.0
+
+
+def test_half_open_lets_a_single_probe_through(health, clock):
+    trip(health)
+    clock.now += 61
+    assert health.circuit("yahoo") == 'half-open'
+    assert health.acquire("yahoo")
+    # Essai en cours: les autres appelants voient la source ouverte
+    assert not any(health.acquire("yahoo") for _ in range(10))
+    health.record("yahoo", True, 0.1)
+    assert health.circuit("yahoo") == 'closed'
+    assert health.acquire("yahoo")
+
+
+def test_failed_probe_reopens(health, clock):
+    trip(health)
+    clock.now += 61
+    assert health.acquire("yahoo")
+    health.record("yahoo", False, 0.1)
+    assert health.circuit("yahoo") == 'open'
+    assert not health.acquire("yahoo")
+    assert health.snapshot()[0]['Coupures'] == 1
+
+
+def test_unused_or_stale_probe_is_released(health, clock):
+    trip(health)
+    clock.now += 61
+    assert health.acquire("yahoo")
+    health.release("yahoo")
+    assert health.acquire("yahoo")
+    # Essai jamais terminé: un autre est autorisé après probe_timeout
+    clock.now += 31
+    assert health.acquire("yahoo")
+
+
+def test_plan_skips_open_sources(health):
+    trip(health, "scraping")
+    methods = [("scraping", None), ("yahoo", None)]
+    available, skipped = health.plan(methods)
+    assert [name for name, _ in available] == ["yahoo"]
+    assert skipped == ["scraping"]
+
+
+class FakeSession:
+    def __init__(self):
+        self.errors = 0
+
+    def provider_errors(self):
+        return self.errors
+
+
+@pytest.fixture
+def session(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(engine, 'get_http_session', lambda: session)
+    return session
+
+
+def test_timed_call_unknown_ticker_does_not_count(health, session):
+    for _ in range(5):
+        engine._timed_call("yahoo", lambda ticker: None, "TYPO", health)
+    assert health.circuit("yahoo") == 'closed'
+
+
+def test_timed_call_transport_error_counts(health, session):
+    def failing(ticker):
+        session.errors += 1   # ex: timeout avalé par la méthode de fetch
+        return None
+
+    for _ in range(3):
+        engine._timed_call("yahoo", failing, "AAPL", health)
+    assert health.circuit("yahoo") == 'open'
+
+
+def test_timed_call_exception_counts(health, session):
+    def raising(ticker):
+        raise RuntimeError("boom")
+
+    for _ in range(3):
+        result, _ = engine._timed_call("yahoo", raising, "AAPL", health)
+        assert result is None
+    assert health.circuit("yahoo") == 'open'
+
+
+def test_session_counts_server_errors_per_thread(monkeypatch):
+    class Response:
+        def __init__(self, status_code):
+            self.status_code = status_code
+
+    statuses = iter([200, 404, 503, 429])
+    monkeypatch.setattr(engine.requests.Session, 'request', lambda self, *a, **k: Response(next(statuses)))
+    session = engine.PooledSession()
+    for _ in range(4):
+        session.request('GET', 'https://finance.yahoo.com/quote/X')
+    assert session.provider_errors() == 2
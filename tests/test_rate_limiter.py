@@ -0,0 +1,54 @@
+"""Limiteur de débit: un jeton par appel logique, poignée de main yfinance jamais comptée"""
+import threading
+
+import engine
+
+
+def make_limiter():
+    return engine.RateLimiter({'yahoo': (1.0, 10), 'alphavantage': (1.0, 10)})
+
+
+def acquired(limiter, provider='yahoo'):
+    return limiter.buckets[provider].stats['acquired']
+
+
+def test_each_request_is_charged_outside_a_call():
+    limiter = make_limiter()
+    limiter.acquire_for_url("https://query1.finance.yahoo.com/v8/finance/chart/AAPL")
+    limiter.acquire_for_url("https://query2.finance.yahoo.com/v10/finance/quoteSummary/AAPL")
+    limiter.acquire_for_url("https://example.com/")
+    assert acquired(limiter) == 2
+
+
+def test_handshake_is_never_charged():
+    limiter = make_limiter()
+    limiter.acquire_for_url("https://fc.yahoo.com/")
+    limiter.acquire_for_url("https://query1.finance.yahoo.com/v1/test/getcrumb")
+    limiter.acquire_for_url("https://guce.yahoo.com/consent")
+    assert acquired(limiter) == 0
+
+
+def test_logical_call_takes_one_token():
+    limiter = make_limiter()
+    with limiter.call('yahoo'):
+        for path in ("/v8/finance/chart/AAPL", "/v10/finance/quoteSummary/AAPL", "/v7/finance/quote"):
+            limiter.acquire_for_url("https://query1.finance.yahoo.com" + path)
+        with limiter.call('yahoo'):
+            limiter.acquire_for_url("https://finance.yahoo.com/quote/AAPL")
+        # Autre fournisseur: toujours compté à la requête
+        limiter.acquire_for_url("https://www.alphavantage.co/query")
+    assert acquired(limiter) == 1
+    assert acquired(limiter, 'alphavantage') == 1
+    limiter.acquire_for_url("https://query1.finance.yahoo.com/v8/finance/chart/AAPL")
+    assert acquired(limiter) == 2
+
+
+def test_call_scope_is_per_thread():
+    limiter = make_limiter()
+    with limiter.call('yahoo'):
+        worker = threading.Thread(
+            target=limiter.acquire_for_url, args=("https://query1.finance.yahoo.com/v8/finance/chart/AAPL",)
+        )
+        worker.start()
+        worker.join()
+    assert acquired(limiter) == 2
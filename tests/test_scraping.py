@@ -0,0 +1,52 @@
+"""Extraction de la cotation depuis une page Yahoo Finance enregistrée"""
+from conftest import read_fixture
+
+import engine
+
+
+def chunks(html, size):
+    for i in range(0, len(html), size):
+        yield html[i:i + size]
+
+
+def test_extract_quote_saved_page():
+    fields = engine.extract_quote(chunks(read_fixture("yahoo_quote_AAPL.html"), engine.SCRAPING_CHUNK_SIZE), "AAPL")
+    assert fields == {'price': 148.28, 'change': -1.25, 'name': 'Apple Inc.', 'market_cap': 2950000000000.0}
+
+
+def test_extract_quote_small_chunks():
+    # Motifs coupés aux frontières des morceaux
+    fields = engine.extract_quote(chunks(read_fixture("yahoo_quote_AAPL.html"), 97), "AAPL")
+    assert fields['price'] == 148.28
+    assert fields['market_cap'] == 2950000000000.0
+
+
+def test_extract_quote_ignores_other_tickers():
+    fields = engine.extract_quote(chunks(read_fixture("yahoo_quote_AAPL.html"), 4096), "MSFT")
+    assert fields['price'] == 441.58
+    assert fields['name'] == 'Microsoft Corporation'
+
+
+def test_fetch_via_scraping(monkeypatch):
+    html = read_fixture("yahoo_quote_AAPL.html")
+
+    class Response:
+        status_code = 200
+        encoding = 'utf-8'
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def iter_content(self, chunk_size, decode_unicode):
+            return chunks(html, chunk_size)
+
+    class Session:
+        def get(self, url, timeout, stream):
+            return Response()
+
+    monkeypatch.setattr(engine, 'get_http_session', lambda: Session())
+    data = engine.fetch_via_scraping("AAPL")
+    assert (data['current_price'], data['name'], data['market_cap']) == (148.28, 'Apple Inc.', 2950000000000.0)
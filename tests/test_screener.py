@@ -0,0 +1,93 @@
+"""Criblage: places libérées par les timeouts, registre borné des criblages"""
+import threading
+import time
+
+import pytest
+
+import engine
+
+
+class DirectCache:
+    def get_or_fetch(self, key, fetch):
+        return fetch()
+
+
+@pytest.fixture
+def fake_fetch(monkeypatch):
+    release = threading.Event()
+
+    def fetch_stock_data(ticker):
+        if ticker.startswith("SLOW"):
+            release.wait(5)
+        return {'ticker': ticker, 'name': ticker, 'current_price': 10.0, 'trend_6m': 5.0,
+                'indicators': {}, 'source': 'test'}
+
+    monkeypatch.setattr(engine, 'get_quote_cache', lambda: DirectCache())
+    monkeypatch.setattr(engine, 'fetch_stock_data', fetch_stock_data)
+    yield release
+    release.set()
+
+
+def wait_done(run, timeout=5):
+    deadline = time.time() + timeout
+    while not run.done and time.time() < deadline:
+        time.sleep(0.02)
+    return run.done
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+def test_timed_out_ticker_frees_its_slot(fake_fetch):
+    # Une seule place: sans remplacement, FAST attendrait la fin de SLOW
+    run = engine.ScreenerRun(["SLOW", "FAST"], max_workers=1, ticker_timeout=0.2)
+    assert wait_done(run, timeout=2)
+    assert run.failures() == {"SLOW": "timeout (0.2s)"}
+    assert list(run.ranking()['Ticker']) == ["FAST"]
+
+
+def test_ticker_waits_for_a_free_thread(fake_fetch):
+    # 1 place + 1 thread de réserve, tous deux bloqués par des tickers en timeout
+    run = engine.ScreenerRun(["SLOW1", "SLOW2", "FAST"], max_workers=1, ticker_timeout=0.1)
+    assert wait_for(lambda: run.progress()['failed'] == 2)
+    time.sleep(0.3)
+    # FAST n'a pas pu démarrer: il attend un thread libre au lieu d'expirer sans avoir tourné
+    assert "FAST" not in run.failures()
+    assert run.progress()['running'] == 0
+    fake_fetch.set()
+    assert wait_done(run)
+    assert run.failures() == {"SLOW1": "timeout (0.1s)", "SLOW2": "timeout (0.1s)"}
+    assert list(run.ranking()['Ticker']) == ["FAST"]
+
+
+def test_registry_drops_old_finished_runs(fake_fetch):
+    runs = engine.ScreenerRuns(max_runs=2, ttl=3600)
+    ids = []
+    for i in range(4):
+        ids.append(runs.start([f"T{i}"]))
+        assert wait_done(runs.get(ids[-1]))
+    assert len(runs) == 2
+    assert runs.get(ids[0]) is None and runs.get(ids[1]) is None
+    assert runs.get(ids[3]) is not None
+
+
+def test_registry_expires_finished_runs(fake_fetch):
+    runs = engine.ScreenerRuns(max_runs=10, ttl=0.1)
+    run_id = runs.start(["A", "B"])
+    assert wait_done(runs.get(run_id))
+    time.sleep(0.15)
+    assert runs.get(run_id) is None
+
+
+def test_identical_running_screen_is_reused(fake_fetch):
+    runs = engine.ScreenerRuns()
+    first = runs.start(["SLOW1"])
+    run = runs.get(first)
+    # Démarré avant la fin du test (sinon il appellerait le vrai fetch_stock_data)
+    assert wait_for(lambda: run.progress()['running'] == 1)
+    assert runs.start(["SLOW1"]) == first
+    assert runs.get(first) is run
@@ -0,0 +1,97 @@
+"""Single-flight: un seul appel réel par clé, résultat et exception partagés"""
+import threading
+
+import pytest
+
+import engine
+
+
+def run_concurrently(flight, fn, callers=5):
+    """
+    Un appelant meneur puis `callers - 1` suiveurs sur la même clé, pendant que `fn` est en cours
+    Les suiveurs se signalent via on_partial (dernier partiel rejoué à l'abonnement, avant l'attente)
+    Retourne les résultats (ou exceptions) de chaque appelant
+    """
+    joined = threading.Semaphore(0)
+    started = threading.Event()
+    release = threading.Event()
+    outcomes = []
+    lock = threading.Lock()
+
+    def leader_fn():
+        flight.publish('key', 'started')
+        started.set()
+        release.wait(5)
+        return fn()
+
+    def call(work, on_partial=None):
+        try:
+            outcome = flight.do('key', work, on_partial)
+        except Exception as e:
+            outcome = e
+        with lock:
+            outcomes.append(outcome)
+
+    threads = [threading.Thread(target=call, args=(leader_fn,))]
+    threads[0].start()
+    assert started.wait(5)
+    for _ in range(callers - 1):
+        threads.append(threading.Thread(target=call, args=(fn, lambda partial: joined.release())))
+        threads[-1].start()
+    for _ in range(callers - 1):
+        assert joined.acquire(timeout=5)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return outcomes
+
+
+def test_concurrent_callers_share_one_call():
+    flight = engine.SingleFlight('test')
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return {'price': 42.0}
+
+    outcomes = run_concurrently(flight, fn)
+    assert len(calls) == 1
+    assert outcomes == [{'price': 42.0}] * 5
+    assert flight.in_flight() == 0
+
+
+def test_exception_reaches_every_caller():
+    flight = engine.SingleFlight('test')
+    error = ConnectionError("timeout")
+
+    def fn():
+        raise error
+
+    outcomes = run_concurrently(flight, fn)
+    assert len(outcomes) == 5
+    assert all(outcome is error for outcome in outcomes)
+    assert flight.in_flight() == 0
+
+
+def test_nothing_is_remembered_after_the_call():
+    flight = engine.SingleFlight('test')
+    assert flight.do('key', lambda: 1) == 1
+    assert flight.do('key', lambda: 2) == 2
+    with pytest.raises(ValueError):
+        flight.do('key', lambda: int('x'))
+    assert flight.do('key', lambda: 3) == 3
+
+
+def test_partials_reach_late_subscribers():
+    flight = engine.SingleFlight('test')
+    received = []
+
+    def fn():
+        flight.publish('key', {'verdict': 'BUY'})
+        # Abonné arrivé après la publication: reçoit d'abord le dernier partiel
+        flight._flights['key'].subscribe(received.append)
+        flight.publish('key', {'verdict': 'BUY', 'score': 80})
+        return 'done'
+
+    assert flight.do('key', fn) == 'done'
+    assert received == [{'verdict': 'BUY'}, {'verdict': 'BUY', 'score': 80}]